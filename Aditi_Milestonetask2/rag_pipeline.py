@@ -1,5 +1,6 @@
 from src.query_engine import VisaRAG
 from src.gemini_client import ask_gemini
+import re
 import numpy as np
 
 rag = VisaRAG()
@@ -21,18 +22,22 @@ def calculate_confidence(scores):
     return avg, label
 
 
+# Country aliases compiled once into word-boundary patterns, checked in priority order.
+# Plain substring checks made "us" fire on "business" and "status".
+COUNTRY_PATTERNS = [
+    ("india", re.compile(r"\b(?i:india|indian)\b")),
+    ("uk", re.compile(r"\b(?i:uk|u\.k\.|united kingdom|britain|british)(?!\w)")),
+    ("ireland", re.compile(r"\b(?i:ireland|irish)\b")),
+    ("schengen", re.compile(r"\b(?i:schengen|europe|european)\b")),
+    # "US" only counts in capitals; lower-case "us" is usually the pronoun
+    ("us", re.compile(r"\bUS\b|\b(?i:usa|u\.s\.(?:a\.)?|america|american|united states)(?!\w)")),
+]
+
+
 def detect_country(question):
-    q = question.lower()
-    if "india" in q or "indian" in q:
-        return "india"
-    if "uk" in q or "united kingdom" in q or "britain" in q:
-        return "uk"
-    if "ireland" in q:
-        return "ireland"
-    if "schengen" in q or "europe" in q:
-        return "schengen"
-    if "us" in q or "usa" in q or "america" in q:
-        return "us"
+    for country, pattern in COUNTRY_PATTERNS:
+        if pattern.search(question):
+            return country
     return None
 
 
@@ -0,0 +1,130 @@
+# context_packer_report.py
+# Before/after prompt size for rag/prompt_builder.pack_context over user_queries.json.
+# For every question the serving index retrieves top-5 chunks once; the prompt is then built
+#   - before: the 3000-character cut (build_prompt(max_chars=3000))
+#   - after:  the token-budgeted sentence packer at each budget in BUDGETS
+# and reports prompt tokens (utils/token_count.py: SWIFTVISA_TOKENIZER, or the chars/4
+# estimate), how many of the 5 chunks reach the prompt, chunks cut mid-sentence, and packing
+# time (first run encodes the sentences, repeats hit the embedding cache).
+# --llm N also sends the first N profile-free prompts to the LLM router, before and after at
+# SWIFTVISA_CONTEXT_TOKENS (450 while it is unset: the pipeline default is 0, packing off),
+# and compares decisions, input tokens and latency.
+#   python Test_Debug/context_packer_report.py [user_queries.json] [--llm 10]
+
+import re
+import sys
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.pipeline import get_serving, get_embedding, extract_info, _sentence_encoder, CONTEXT_TOKENS
+from rag.prompt_builder import build_prompt, pack_context, split_sentences, _chunk_text
+from rag.semantic_cache import is_profile_specific
+from utils.token_count import count_tokens, tokenizer_id
+
+TOP_K = 5
+BUDGETS = [300, 450, 600, 800]
+LLM_BUDGET = CONTEXT_TOKENS or 450
+_ENDS_SENTENCE = re.compile(r"[.!?:;\"')\]]\s*$")
+
+
+def context_of(prompt):
+    return prompt.split("**DOCUMENT CONTEXT:**", 1)[1].split("**USER QUESTION:**", 1)[0]
+
+
+def chunks_in(context):
+    return len(re.findall(r"^\[\d+\] Source:", context, re.MULTILINE))
+
+
+def cut_mid_sentence(context):
+    """The old cut keeps the start of the last chunk that did not fit: does it stop mid-sentence?"""
+    last = context.strip().split("\n---\n")[-1]
+    return not _ENDS_SENTENCE.search(last)
+
+
+def prepare(queries):
+    _, retriever, encoder = get_serving()
+    out = []
+    for q in queries:
+        vec = get_embedding(q, encoder)
+        out.append((q, vec, retriever.retrieve(q, top_k=TOP_K, query_embedding=vec)))
+    return out, _sentence_encoder(encoder)
+
+
+def summarize(label, tokens, chunks, cuts, ms=None):
+    tokens = np.asarray(tokens)
+    extra = f"   pack p50 {np.median(ms):6.1f} ms" if ms is not None else ""
+    print(f"{label:<16}{np.mean(tokens):>8.0f}{np.median(tokens):>8.0f}{np.percentile(tokens, 95):>8.0f}"
+          f"{np.mean(chunks):>10.1f} / {TOP_K}{cuts:>10}{extra}")
+
+
+def compare_llm(prepared, embed, n):
+    from rag.llm_router import get_router
+    router = get_router()
+    picked = [p for p in prepared if not is_profile_specific(p[0])][:n]
+    print(f"\nLLM ({router.cache_id}), {len(picked)} profile-free questions, budget {LLM_BUDGET}:")
+    same, rows = 0, []
+    for q, vec, retrieved in picked:
+        results = []
+        for prompt in (build_prompt(q, retrieved, max_chars=3000),
+                       build_prompt(q, retrieved, max_tokens=LLM_BUDGET, query_embedding=vec, embed=embed)):
+            t0 = time.perf_counter()
+            try:
+                decision = extract_info(router.generate(prompt)).get("decision")
+            except Exception as e:
+                decision = f"error: {e}"
+            results.append((decision, count_tokens(prompt), 1000 * (time.perf_counter() - t0)))
+        same += results[0][0] == results[1][0]
+        rows.append(results)
+        print(f"  {results[0][0]!s:>18} -> {results[1][0]!s:<18} {q}")
+    before, after = np.array([[r[1], r[2]] for r, _ in rows]), np.array([[r[1], r[2]] for _, r in rows])
+    print(f"  same decision {same}/{len(rows)}; input tokens {before[:, 0].mean():.0f} -> {after[:, 0].mean():.0f}; "
+          f"latency p50 {np.median(before[:, 1]):.0f} -> {np.median(after[:, 1]):.0f} ms")
+
+
+def main(query_file, llm_n):
+    with open(query_file, "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+    prepared, embed = prepare(queries)
+    sentences = [len(split_sentences(_chunk_text(r))) for _, _, ret in prepared for r in ret]
+    chunk_tok = [count_tokens(_chunk_text(r)) for _, _, ret in prepared for r in ret]
+    print(f"{len(queries)} questions, top-{TOP_K} chunks each; token counter: {tokenizer_id()}")
+    print(f"retrieved chunk: {np.mean(chunk_tok):.0f} tokens, {np.mean(sentences):.0f} sentences on average; "
+          f"all {TOP_K} whole would be {TOP_K * np.mean(chunk_tok):.0f} tokens of context\n")
+
+    print(f"{'prompt':<16}{'mean':>8}{'p50':>8}{'p95':>8}{'chunks':>14}{'mid-cut':>10}   (prompt tokens)")
+    before = [build_prompt(q, ret, max_chars=3000) for q, _, ret in prepared]
+    contexts = [context_of(p) for p in before]
+    summarize("3000 chars", [count_tokens(p) for p in before], [chunks_in(c) for c in contexts],
+              sum(cut_mid_sentence(c) for c in contexts))
+
+    # First pass encodes every sentence; after that they come from the embedding cache
+    cold = []
+    for _, vec, ret in prepared:
+        t0 = time.perf_counter()
+        pack_context(ret, BUDGETS[0], vec, embed)
+        cold.append(1000 * (time.perf_counter() - t0))
+    for budget in BUDGETS:
+        tokens, chunks, ms = [], [], []
+        for q, vec, ret in prepared:
+            t0 = time.perf_counter()
+            packed = pack_context(ret, budget, vec, embed)
+            ms.append(1000 * (time.perf_counter() - t0))
+            tokens.append(count_tokens(build_prompt(q, ret, max_tokens=budget, query_embedding=vec, embed=embed)))
+            chunks.append(packed.chunks)
+        summarize(f"{budget} tokens", tokens, chunks, 0, ms)
+    print(f"(pack p50 is with cached sentence vectors; first pass, encoding them: p50 {np.median(cold):.1f} ms)")
+
+    if llm_n:
+        compare_llm(prepared, embed, llm_n)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    llm_n = int(args[args.index("--llm") + 1]) if "--llm" in args else 0
+    files = [a for a in args if a.endswith(".json")]
+    main(files[0] if files else "user_queries.json", llm_n)
@@ -0,0 +1,69 @@
+# embedding_cache_check.py
+# Several processes write to and read from one utils/embedding_cache.py directory at the same
+# time (like Streamlit, main.py and migrate_index.py sharing Data/embedding_cache). Every
+# vector is a deterministic function of its text, so any row that was overwritten or read
+# through a stale row map shows up as a mismatch. max_rows is kept small so rows are recycled.
+# Uses a temporary directory; no model needed.
+#   python Test_Debug/embedding_cache_check.py [processes]
+
+import sys
+import hashlib
+import tempfile
+import multiprocessing as mp
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.embedding_cache import EmbeddingCache, encode_with_cache
+
+DIM = 16
+MAX_ROWS = 300
+ROUNDS = 40
+
+
+def fake_encode(texts):
+    out = []
+    for t in texts:
+        seed = int.from_bytes(hashlib.sha256(t.encode()).digest()[:8], "little")
+        out.append(np.random.default_rng(seed).standard_normal(DIM))
+    return np.asarray(out, dtype="float32")
+
+
+def worker(cache_dir, worker_id, errors):
+    cache = EmbeddingCache("check-model", revision="r1", cache_dir=Path(cache_dir), max_rows=MAX_ROWS)
+    rng = np.random.default_rng(worker_id)
+    bad = 0
+    for _ in range(ROUNDS):
+        # Overlapping text sets: each process reads rows the others wrote
+        texts = [f"chunk {int(i)}" for i in rng.integers(0, 600, size=25)]
+        got = encode_with_cache(texts, fake_encode, cache)
+        bad += int((np.abs(got - fake_encode(texts)).max(axis=1) > 1e-6).sum())
+    errors.put(bad)
+
+
+def main(processes):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        errors = mp.Queue()
+        procs = [mp.Process(target=worker, args=(cache_dir, i, errors)) for i in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        bad = sum(errors.get() for _ in procs)
+
+        # A fresh reader must see consistent keys and vectors on disk
+        cache = EmbeddingCache("check-model", revision="r1", cache_dir=Path(cache_dir), max_rows=MAX_ROWS)
+        texts = [f"chunk {i}" for i in range(600)]
+        vectors, missing = cache.get_many(texts)
+        present = [i for i in range(600) if i not in set(missing)]
+        stale = int((np.abs(vectors[present] - fake_encode([texts[i] for i in present])).max(axis=1) > 1e-6).sum())
+    print(f"{processes} processes x {ROUNDS} rounds, {MAX_ROWS} rows (recycled): "
+          f"{bad} wrong vectors returned, {stale} of {len(present)} stored rows inconsistent")
+    return bad + stale == 0
+
+
+if __name__ == "__main__":
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
+    sys.exit(0 if ok else 1)
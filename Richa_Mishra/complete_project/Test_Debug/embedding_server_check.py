@@ -0,0 +1,104 @@
+# embedding_server_check.py
+# Checks that the local embedding server returns the same vectors as in-process encoding and
+# measures per-query latency and concurrent throughput through the daemon.
+# It first checks, against a stub daemon, that an encode slower than the 0.5 s health-check
+# timeout still goes through the daemon on the kept-alive connection (no in-process fallback).
+# Also compares the daemon's 512-token ingestion endpoint with in-process AutoModel encoding.
+# Start the server first (python -m utils.embedding_server), then from the project root:
+#     python Test_Debug/embedding_server_check.py [concurrency]
+
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.embedding_client import SharedEncoder, CONNECT_TIMEOUT
+from utils.encoders import get_encoder
+
+SLOW_ENCODE_S = 1.0
+
+
+class SlowStub(BaseHTTPRequestHandler):
+    """Daemon stand-in: /health answers at once, /encode takes SLOW_ENCODE_S."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._send(json.dumps({"model": "stub", "backend": "stub", "cache_id": "stub",
+                                "backends": {"stub": "stub"}}).encode(), {})
+
+    def do_POST(self):
+        texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["texts"]
+        time.sleep(SLOW_ENCODE_S)
+        self._send(np.ones((len(texts), 4), dtype="<f4").tobytes(), {"X-Rows": len(texts), "X-Dim": 4})
+
+    def _send(self, body, headers):
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def check_slow_encode():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = SharedEncoder("stub", port=server.server_address[1], lazy=True)
+    assert client.available(), "stub daemon not detected"
+    t0 = time.perf_counter()
+    out = client.encode(["a slow batch", "of chunks"])
+    elapsed = time.perf_counter() - t0
+    assert client.remote and client._local is None and out.shape == (2, 4), "fell back to in-process encoding"
+    print(f"Slow encode ({SLOW_ENCODE_S:.1f} s, health-check timeout {CONNECT_TIMEOUT} s): "
+          f"served by the daemon in {elapsed:.2f} s on the kept-alive connection")
+    server.shutdown()
+
+
+def main(concurrency):
+    with open(ROOT / "user_queries.json", "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+
+    check_slow_encode()
+
+    client = SharedEncoder(lazy=True)
+    if not client.available():
+        print("❌ No embedding server is serving this backend. Start it with: python -m utils.embedding_server")
+        return
+
+    remote = client.encode(queries)
+    local = get_encoder(client.backend).encode(queries)
+    print(f"Backend: {client.backend} | max |daemon - in-process|: {np.abs(remote - local).max():.2e}")
+
+    ingest = SharedEncoder("automodel", lazy=True)
+    assert ingest.available(), "daemon does not serve the automodel ingestion endpoint"
+    remote = ingest.encode(queries)
+    local = get_encoder("automodel").encode(queries)
+    print(f"Ingestion: automodel ({ingest.cache_id}) | max |daemon - in-process|: {np.abs(remote - local).max():.2e}")
+
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        client.encode([q])
+        lat.append(1000 * (time.perf_counter() - t0))
+    print(f"Single query via daemon: p50 {np.percentile(lat, 50):.2f} ms, p95 {np.percentile(lat, 95):.2f} ms")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda q: client.encode([q]), queries * 4))
+    elapsed = time.perf_counter() - t0
+    print(f"{concurrency} concurrent clients: {4 * len(queries) / elapsed:.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8)
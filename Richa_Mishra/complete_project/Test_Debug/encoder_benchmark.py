@@ -0,0 +1,67 @@
+# encoder_benchmark.py
+# Startup time, single-query latency and batch throughput for each encoder backend.
+# Startup is measured in a fresh interpreter so library imports (torch, onnxruntime) are counted.
+# Run from the project root: python Test_Debug/encoder_benchmark.py
+
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.encoders import load_encoder, export_onnx
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+STARTUP_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from utils.encoders import load_encoder
+enc = load_encoder({backend!r})
+enc.encode(["warm up"])
+print(time.perf_counter() - t0)
+"""
+
+
+def startup_seconds(backend):
+    out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(backend=backend)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    with open(ROOT / "user_queries.json", "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+    with open(ROOT / "Data" / "visa_chunks.json", "r", encoding="utf-8") as f:
+        chunks = list(json.load(f).values())
+
+    # Export once up front so startup numbers measure loading, not exporting
+    export_onnx(quantize=True)
+
+    print(f"{'backend':<11}{'startup s':>10}{'p50 ms':>9}{'p95 ms':>9}{'chunks/s':>10}")
+    for backend in BACKENDS:
+        startup = startup_seconds(backend)
+        enc = load_encoder(backend)
+        enc.encode(queries[:4])
+
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            enc.encode([q])
+            lat.append(1000 * (time.perf_counter() - t0))
+
+        t0 = time.perf_counter()
+        enc.encode(chunks, batch_size=32)
+        throughput = len(chunks) / (time.perf_counter() - t0)
+
+        print(f"{backend:<11}{startup:>10.2f}{np.percentile(lat, 50):>9.2f}{np.percentile(lat, 95):>9.2f}"
+              f"{throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# encoder_parity.py
+# Checks that the ONNX encoders reproduce the vectors of the encoder that built the index:
+# utils/embedding.py's AutoModel path (512-token truncation, mean pooling), not the 256-token
+# sentence-transformers query encoder. Every chunk must reach cosine >= 0.99 against it, with
+# the ONNX tokenizer truncating at the same 512 tokens. Also reports how closely that reference
+# reproduces the stored Data/visa_embeddings.npy rows, and how many chunks are longer than the
+# 256 tokens the ONNX query encoder keeps by default.
+# Run from the project root: python Test_Debug/encoder_parity.py [max_chunks]
+
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.embedding import _encode_automodel, INGEST_MAX_LENGTH, MODEL_NAME
+from utils.encoders import OnnxEncoder, MAX_SEQ_LENGTH
+
+MIN_COSINE = 0.99
+BATCH_SIZE = 32
+
+
+def main(max_chunks=None):
+    with open("Data/visa_chunks.json", "r", encoding="utf-8") as f:
+        chunk_store = json.load(f)
+    keys = list(chunk_store)[:max_chunks] if max_chunks else list(chunk_store)
+    chunks = [chunk_store[k] for k in keys]
+
+    reference = np.vstack([_encode_automodel(chunks[i:i + BATCH_SIZE])
+                           for i in range(0, len(chunks), BATCH_SIZE)])
+    failed = False
+
+    try:
+        ids = np.load("Data/visa_ids.npy")
+        stored = np.load("Data/visa_embeddings.npy", mmap_mode="r")
+        row_of = {int(rid): row for row, rid in enumerate(ids)}
+        rows = [row_of.get(int(k)) for k in keys]
+        have = [i for i, r in enumerate(rows) if r is not None]
+        cos = (reference[have] * stored[[rows[i] for i in have]]).sum(axis=1)
+        print(f"{'index':<10} chunks={len(have)}  mean cos={cos.mean():.5f}  min cos={cos.min():.5f} "
+              f"(reference vs stored vectors)")
+    except (OSError, ValueError) as e:
+        print(f"[encoder_parity] Stored vectors not compared: {e}")
+
+    for quantize in (False, True):
+        encoder = OnnxEncoder(MODEL_NAME, quantize=quantize, max_length=INGEST_MAX_LENGTH)
+        vecs = encoder.encode(chunks, batch_size=BATCH_SIZE)
+        cos = (reference * vecs).sum(axis=1)  # both sides are L2-normalized
+        worst = int(np.argmin(cos))
+        ok = cos.min() >= MIN_COSINE
+        failed |= not ok
+        print(f"{encoder.backend:<10} chunks={len(chunks)}  mean cos={cos.mean():.5f}  min cos={cos.min():.5f} "
+              f"(chunk #{worst})  {'PASS' if ok else 'FAIL'}")
+
+    long_chunks = sum(len(e.ids) > MAX_SEQ_LENGTH for e in encoder.tokenizer.encode_batch(chunks))
+    print(f"{long_chunks} of {len(chunks)} chunks exceed {MAX_SEQ_LENGTH} tokens "
+          f"(truncated differently by the default {MAX_SEQ_LENGTH}-token ONNX encoder)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,42 @@
+# federated_search.py
+# Queries all of the team's FAISS artifacts concurrently and compares the federated latency
+# with the sum and max of the individual corpus searches.
+# Run from the project root: python Test_Debug/federated_search.py ["your question"]
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.federated import build_team_retriever
+
+
+def main(queries):
+    fed = build_team_retriever()
+    print(f"Registered corpora: {', '.join(fed.corpora)}\n")
+
+    # Warm-up so model loading is not counted
+    fed.search("visa requirements", top_k=1)
+
+    for query in queries:
+        results = fed.search(query, top_k=5)
+        t = fed.last_timings
+        searches = {name: t[name] for name in fed.corpora}
+
+        print(f"Query: {query}")
+        for r in results:
+            print(f"  {r['score']:.3f}  [{r['corpus']}] {r['meta']['source']}  {r['text'][:80]!r}")
+        print(f"  encode {1000 * t['encode']:.1f} ms | searches sum {1000 * sum(searches.values()):.1f} ms, "
+              f"max {1000 * max(searches.values()):.1f} ms | federated total {1000 * t['total']:.1f} ms\n")
+
+    fed.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        qs = sys.argv[1:]
+    else:
+        with open("user_queries.json", "r", encoding="utf-8") as f:
+            qs = [q["query"] for q in json.load(f)][:10]
+    main(qs)
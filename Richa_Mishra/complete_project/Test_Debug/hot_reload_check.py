@@ -0,0 +1,105 @@
+# hot_reload_check.py
+# Hot index reload under concurrent load: worker threads keep running retrieval while CURRENT
+# is flipped between two bundles. Reports reload time, per-query latency (p50/p99/max) in
+# steady state vs while a reload is in progress, errors, and which versions answered.
+# Needs at least two bundles (python migrate_index.py build ...). Run from the project root:
+#     python Test_Debug/hot_reload_check.py [threads] [flips]
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("SWIFTVISA_RELOAD_INTERVAL", "0.5")
+
+from utils import bundles
+from rag import pipeline
+
+
+def main(n_threads, flips):
+    versions = bundles.list_versions()
+    if len(versions) < 2:
+        print("❌ Need at least two bundles in Data/bundles (python migrate_index.py build ...)")
+        return
+    original = bundles.current_version()
+    a, b = versions[-2:]
+
+    with open(ROOT / "user_queries.json", "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+
+    stop = threading.Event()
+    reloading = threading.Event()
+    samples = []          # (latency ms, during_reload)
+    answered_by = Counter()
+    errors = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        i = offset
+        while not stop.is_set():
+            query = queries[i % len(queries)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                snap = pipeline.get_serving()  # one snapshot for the whole query
+                qv = pipeline.get_embedding(query, snap.encoder)
+                snap.retriever.retrieve(query, top_k=5, query_embedding=qv)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            with lock:
+                samples.append((1000 * (time.perf_counter() - t0), reloading.is_set()))
+                answered_by[snap.version] += 1
+
+    threads = [threading.Thread(target=worker, args=(k,), daemon=True) for k in range(n_threads)]
+    for t in threads:
+        t.start()
+
+    reload_times = []
+    try:
+        time.sleep(2)
+        for k in range(flips):
+            target = a if k % 2 == 0 else b
+            if pipeline.get_serving().version == target:
+                target = b if target == a else a
+            reloading.set()
+            t0 = time.perf_counter()
+            bundles.set_current(target)
+            while pipeline.get_serving().version != target:
+                time.sleep(0.01)
+            reload_times.append(time.perf_counter() - t0)
+            reloading.clear()
+            time.sleep(2)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        if original:
+            bundles.set_current(original)
+
+    def summary(values):
+        if not values:
+            return "n/a"
+        return (f"n={len(values)}  p50 {np.percentile(values, 50):.1f}  p99 {np.percentile(values, 99):.1f}"
+                f"  max {max(values):.1f} ms")
+
+    print(f"{n_threads} query threads, {flips} bundle switches between {a} and {b}\n")
+    print(f"switch -> visible (incl. load): {', '.join(f'{t:.2f}s' for t in reload_times)}")
+    print(f"pipeline.last_reload_seconds  : {pipeline.last_reload_seconds}")
+    print(f"steady-state queries          : {summary([l for l, r in samples if not r])}")
+    print(f"queries during reload         : {summary([l for l, r in samples if r])}")
+    print(f"answered by version           : {dict(answered_by)}")
+    print(f"errors                        : {len(errors)} {errors[:3]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,164 @@
+# json_stream_check.py
+# Checks rag/json_stream.py and measures what it saves on a streamed decision.
+#   1. correctness: sample answers (fenced, pretty-printed, escapes, nested lists, trailing text)
+#      are fed in random-sized pieces; the fields must equal json.loads and the string deltas
+#      must add up to the full strings
+#   2. latency: a stub Ollama streams a decision answer one token every TOKEN_S. Reports when
+#      eligibility_status is known vs. the full answer, and how many tokens the stub generated
+#      when the stream is cancelled in decision-only mode
+# No external service is contacted.
+#   python Test_Debug/json_stream_check.py [questions]
+#   python Test_Debug/json_stream_check.py 3 --pipeline   # also stream_rag(decision_only=True)
+# --pipeline needs the query encoder and index.
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.json_stream import JSONFieldStream, DECISION_FIELDS, parse_partial
+from rag.llm_router import LLMRouter, GenerateConfig
+from rag.ollama_client import OllamaBackend
+
+TOKEN_S = 0.02
+ANSWER = json.dumps({
+    "eligibility_status": "not eligible",
+    "confidence": 0.74,
+    "reason": "The applicant's savings of £1,200 are below the £1,334 per month required for "
+              "study in London, and the funds have not been held for 28 consecutive days.",
+    "future_steps": ["Hold at least £12,006 for 28 consecutive days",
+                     "Obtain a bank letter dated within 31 days of applying",
+                     "Reapply once the maintenance requirement is met"],
+}, ensure_ascii=False)
+
+
+# ------------------------------------------------------------
+# 1. CORRECTNESS
+# ------------------------------------------------------------
+def check_parser(rounds=300):
+    samples = [json.loads(ANSWER),
+               {"eligibility_status": "eligible", "confidence": 1, "reason": 'Quote \" slash \\\\ tab \t ✓ \\u00e9',
+                "future_steps": [{"step": "a]}", "n": [1, 2]}], "extra": None, "flag": True}]
+    rng = random.Random(0)
+    checked = 0
+    for sample in samples:
+        text = json.dumps(sample)
+        for variant in (text, json.dumps(sample, indent=2, ensure_ascii=False),
+                        "```json\n" + text + "\n```", "Here is the answer: " + text + " Hope it helps {"):
+            for _ in range(rounds):
+                parser, deltas, i = JSONFieldStream(), {}, 0
+                while i < len(variant):
+                    n = rng.randint(1, 12)
+                    for kind, name, value in parser.feed(variant[i:i + n]):
+                        if kind == "delta":
+                            deltas[name] = deltas.get(name, "") + value
+                    i += n
+                assert parser.done and parser.fields == sample, (parser.fields, sample)
+                for name, value in sample.items():
+                    if isinstance(value, str):
+                        assert deltas[name] == value, (name, deltas.get(name), value)
+                checked += 1
+    cut = parse_partial(ANSWER[:ANSWER.index('"reason"') + 20])
+    assert cut == {"eligibility_status": "not eligible", "confidence": 0.74}, cut
+    print(f"parser: {checked} random splits match json.loads; truncated answer keeps {sorted(cut)}")
+
+
+# ------------------------------------------------------------
+# 2. LATENCY (stub Ollama)
+# ------------------------------------------------------------
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.generated = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = [ANSWER[i:i + 4] for i in range(0, len(ANSWER), 4)]
+        try:
+            for token in tokens + [None]:
+                line = json.dumps({"model": body["model"], "response": token or "", "done": token is None})
+                data = (line + "\n").encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                if token:
+                    self.server.generated += 1
+                    time.sleep(TOKEN_S)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client cancelled: generation stops here, like Ollama
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(label, router, n, decision_only, server):
+    decision, total, tokens = [], [], []
+    for i in range(n):
+        server.generated = 0
+        parser = JSONFieldStream()
+        stream = router.stream(f"question {i}", GenerateConfig(max_output_tokens=256))
+        t0 = time.perf_counter()
+        seen = None
+        for piece in stream:
+            parser.feed(piece)
+            if seen is None and parser.has("eligibility_status"):
+                seen = time.perf_counter() - t0
+            if decision_only and parser.has(*DECISION_FIELDS):
+                stream.close()
+                break
+        total.append(time.perf_counter() - t0)
+        decision.append(seen)
+        time.sleep(2 * TOKEN_S)   # let the stub notice a cancelled stream
+        tokens.append(server.generated)
+        assert parser.fields["eligibility_status"] == "not eligible"
+    print(f"{label:<26}decision known p50 {1000 * np.median(decision):>5.0f} ms   call ends p50 "
+          f"{1000 * np.median(total):>5.0f} ms   tokens generated {np.mean(tokens):>4.0f}")
+
+
+def main(n, pipeline):
+    check_parser()
+
+    server = StubOllama()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    router = LLMRouter([OllamaBackend("stub", base, format="json")])
+    print(f"\nstub Ollama {base}: one token every {1000 * TOKEN_S:.0f} ms, {n} questions\n")
+    measure("full answer", router, n, False, server)
+    measure("decision-only", router, n, True, server)
+
+    if pipeline:
+        os.environ["SWIFTVISA_LLM_BACKENDS"] = "ollama"
+        os.environ["OLLAMA_HOST"] = base
+        from rag.pipeline import stream_rag
+        print("\nstream_rag(decision_only=True) with SWIFTVISA_LLM_BACKENDS=ollama:")
+        for query in ["Can I study in London with £1,200 in savings?"] * n:
+            for event in stream_rag(query, decision_only=True):
+                if event["type"] == "final":
+                    answer, timing = event["answer"], event["answer"]["timing"]
+            print(f"  decision={answer['parsed']['decision']} confidence={answer['parsed']['confidence']:.2f}  "
+                  f"decision after {timing['decision_ms']:.0f} ms, returned after {timing['total_ms']:.0f} ms, "
+                  f"stopped early: {timing['stopped_early']}")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(int(args[0]) if args else 10, "--pipeline" in sys.argv)
@@ -1,31 +1,31 @@
-import requests
-import json
+import sys
+from pathlib import Path
 
-def ask_local_llm(query):
-    url = "http://localhost:11434/api/generate"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-    payload = {
-        "model": "llama3.2",
-        "prompt": query
-    }
+from rag.llm_router import GenerateConfig
+from rag.ollama_client import OllamaBackend
 
-    response = requests.post(url, json=payload, stream=True)
+# One backend for the whole session: its connection and the loaded model are reused
+backend = OllamaBackend(format="")
 
-    final_text = ""
-    for line in response.iter_lines():
-        if line:
-            data = json.loads(line.decode('utf-8'))
-            if "response" in data:
-                final_text += data["response"]
 
+def ask_local_llm(query, on_token=None):
+    """Streams the answer from the local model; on_token(piece) is called as each piece arrives."""
+    final_text = ""
+    for piece in backend.stream(query, GenerateConfig(max_output_tokens=512, temperature=0.2)):
+        final_text += piece
+        if on_token:
+            on_token(piece)
     return final_text
 
 
 if __name__ == "__main__":
+    backend.preload()
     question = input("Ask your question: ")
-    answer = ask_local_llm(question)
     print("\n=== Answer ===\n")
-    print(answer)
+    ask_local_llm(question, on_token=lambda piece: print(piece, end="", flush=True))
+    print()
 
 
 
@@ -0,0 +1,42 @@
+# llm_overhead.py
+# Client-side overhead of rag/llm_client.call_gemini: time spent outside the provider's own
+# request latency (SDK init, model handle lookup, response extraction), per call and on average.
+# Also times building a fresh GenerativeModel, the per-call cost the cached handles remove.
+# Needs GEMINI_API_KEY. Run from the project root: python Test_Debug/llm_overhead.py [calls]
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag import llm_client
+
+PROMPT = 'Reply with the JSON object {"ok": true} and nothing else.'
+
+
+def main(calls):
+    print(f"{'call':>4}{'init ms':>10}{'handle ms':>11}{'request ms':>12}{'total ms':>10}{'overhead ms':>13}")
+    for i in range(calls):
+        text = llm_client.call_gemini(PROMPT, max_output_tokens=32, retry_on_empty=False)
+        t = llm_client.get_last_call_timing()
+        if text.startswith("ERROR: GEMINI_API_KEY"):
+            print("❌ GEMINI_API_KEY is not set")
+            return
+        print(f"{i + 1:>4}{t['init_ms']:>10.2f}{t['handle_ms']:>11.3f}{t['request_ms']:>12.1f}"
+              f"{t['total_ms']:>10.1f}{t['overhead_ms']:>13.3f}")
+
+    stats = llm_client.get_call_stats()
+    print(f"\nmean over {stats['calls']} calls: total {stats['mean_total_ms']:.1f} ms, "
+          f"provider {stats['mean_request_ms']:.1f} ms, client overhead {stats['mean_overhead_ms']:.3f} ms")
+
+    genai = llm_client._client()
+    t0 = time.perf_counter()
+    for _ in range(100):
+        genai.GenerativeModel(llm_client.DEFAULT_MODEL,
+                              generation_config={"max_output_tokens": 32, "temperature": 0.0})
+    print(f"fresh GenerativeModel per call (old behaviour): {10 * (time.perf_counter() - t0):.3f} ms each")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,178 @@
+# llm_router_check.py
+# rag/llm_router.py against local stub LLM servers with skewed latencies:
+#   fast-tail  chat completions, ~80 ms but 2% of requests take 1.2 s
+#   flaky      chat completions, ~50 ms but 35% of requests fail with HTTP 503
+#   steady     Ollama /api/generate, ~250 ms every time
+# Runs the same sequential queries through the fast-tail backend alone, the router without
+# hedging and the router with hedging; reports end-to-end p50/p95/p99, which backend answered,
+# failovers and errors that reached the caller. Hedging at p95 only helps tails rarer than 5%:
+# when slow requests are more common, the p95 itself is slow and the hedge fires too late.
+# First checks the kept-alive connection itself: a longer timeout on a reused socket is
+# honoured, and a socket the server closed between requests is replaced transparently.
+# No API keys needed.
+# Run from the project root: python Test_Debug/llm_router_check.py [queries]
+
+import sys
+import json
+import time
+import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.llm_router import LLMRouter, ChatCompletionsBackend, GenerateConfig
+from rag.ollama_client import OllamaBackend
+
+PROFILES = {
+    "fast-tail": {"latency": 0.08, "tail_p": 0.02, "tail": 1.2, "error_p": 0.0},
+    "flaky":     {"latency": 0.05, "tail_p": 0.0,  "tail": 0.0, "error_p": 0.35},
+    "steady":    {"latency": 0.25, "tail_p": 0.0,  "tail": 0.0, "error_p": 0.0},
+}
+
+
+class StubLLM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, profile, seed, handler=None):
+        super().__init__(("127.0.0.1", 0), handler or StubHandler)
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        p = self.profile
+        with self.lock:
+            fail = self.rng.random() < p["error_p"]
+            slow = self.rng.random() < p["tail_p"]
+            jitter = self.rng.uniform(0.9, 1.1)
+        return fail, (p["tail"] if slow else p["latency"]) * jitter
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real APIs
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        fail, delay = self.server.draw()
+        time.sleep(delay)
+        text = '{"eligibility_status": "eligible", "confidence": 0.8}'
+        if fail:
+            status, payload = 503, {"error": {"message": "overloaded"}}
+        elif self.path.endswith("/api/generate"):
+            status, payload = 200, {"response": text, "done": True}
+        else:
+            status, payload = 200, {"choices": [{"message": {"role": "assistant", "content": text}}]}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ScriptedLLM(StubLLM):
+    """Answers every request, sleeping the next of `delays` seconds (0 once they run out)."""
+
+    def __init__(self, delays, handler=None):
+        super().__init__(PROFILES["steady"], 0, handler)
+        self.delays = list(delays)
+
+    def draw(self):
+        with self.lock:
+            return False, self.delays.pop(0) if self.delays else 0.0
+
+
+class ClosingHandler(StubHandler):
+    """Closes the socket after each answer without saying so, like an idle keep-alive timeout."""
+
+    def do_POST(self):
+        super().do_POST()
+        self.close_connection = True
+
+
+def start(name, seed, server=None):
+    server = server or StubLLM(PROFILES[name], seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def check_connection_reuse():
+    ok = True
+    # A short-timeout request opens the socket; the next one allows 5 s for a 1 s answer
+    backend = ChatCompletionsBackend("slow", start(None, 0, ScriptedLLM([0.0, 1.0])), "stub")
+    try:
+        backend.generate("warm up", GenerateConfig(max_output_tokens=8, timeout=0.3))
+        t0 = time.perf_counter()
+        backend.generate("slow answer", GenerateConfig(max_output_tokens=8, timeout=5))
+        print(f"reused socket, 1 s answer, 5 s timeout: answered in {time.perf_counter() - t0:.2f} s")
+    except Exception as e:
+        print(f"reused socket, 1 s answer, 5 s timeout: FAILED ({e})")
+        ok = False
+
+    backend = ChatCompletionsBackend("closing", start(None, 0, ScriptedLLM([], ClosingHandler)), "stub")
+    failed = 0
+    for i in range(5):
+        try:
+            backend.generate(f"question {i}", GenerateConfig(max_output_tokens=8, timeout=5))
+        except Exception:
+            failed += 1
+    print(f"server closes the socket after every answer: {failed} of 5 requests failed\n")
+    return ok and failed == 0
+
+
+def run(label, router, n):
+    latencies, answered_by, failovers, hedged, errors = [], Counter(), 0, 0, 0
+    config = GenerateConfig(max_output_tokens=64, timeout=10)
+    for i in range(n):
+        t0 = time.perf_counter()
+        try:
+            router.generate(f"question {i}", config)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(1000 * (time.perf_counter() - t0))
+        route = router.get_last_route()
+        answered_by[route["backend"]] += 1
+        failovers += route["failovers"]
+        hedged += route["hedged"]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0, 0, 0)
+    print(f"{label:<22}p50 {p50:>6.0f}  p95 {p95:>6.0f}  p99 {p99:>6.0f} ms   "
+          f"errors {errors:>3}  failovers {failovers:>3}  hedged {hedged:>3}  answered by {dict(answered_by)}")
+
+
+def main(n):
+    urls = {name: start(name, seed) for seed, name in enumerate(PROFILES)}
+
+    def backends():
+        # Fresh backends (and so fresh stats) for every scenario
+        return [ChatCompletionsBackend("fast-tail", urls["fast-tail"], "stub"),
+                ChatCompletionsBackend("flaky", urls["flaky"], "stub"),
+                OllamaBackend("stub", urls["steady"], name="steady")]
+
+    if not check_connection_reuse():
+        sys.exit(1)
+    print(f"{n} sequential queries per scenario\n")
+    run("fast-tail only", LLMRouter(backends()[:1]), n)
+    run("router", LLMRouter(backends()), n)
+    router = LLMRouter(backends(), hedge=True)
+    run("router + hedging", router, n)
+
+    print("\nrolling stats after the hedged run:")
+    for name, s in router.snapshot().items():
+        p50 = f"{s['p50_ms']:.0f}" if s["p50_ms"] is not None else "-"
+        p95 = f"{s['p95_ms']:.0f}" if s["p95_ms"] is not None else "-"
+        print(f"  {name:<10} samples {s['samples']:>4}  p50 {p50:>5} ms  p95 {p95:>5} ms  "
+              f"error rate {s['error_rate']:.2f}  healthy {s['healthy']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
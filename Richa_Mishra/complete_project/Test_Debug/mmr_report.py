@@ -0,0 +1,74 @@
+# mmr_report.py
+# Distinct-source coverage, near-duplicate pairs and prompt size of the top-k context
+# with plain relevance ranking vs MMR re-selection, over user_queries.json.
+# Run from the project root: python Test_Debug/mmr_report.py
+# Prompt tokens are estimated as characters / 4 (no LLM call is made).
+
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.retriever import Retriever
+from rag.prompt_builder import build_prompt
+
+TOP_K = 5
+LAMBDAS = [None, 0.9, 0.7, 0.5]
+DUPLICATE_SIM = 0.95
+
+
+def estimate_tokens(text):
+    return len(text) / 4.0
+
+
+def redundancy(retriever, retrieved):
+    """(near-duplicate pairs, tokens spent on chunks that near-duplicate a higher-ranked one)"""
+    kept = [(r, retriever._row_of.get(int(r["uid"]))) for r in retrieved]
+    kept = [(r, row) for r, row in kept if row is not None]
+    if len(kept) < 2:
+        return 0, 0.0
+    vecs = retriever.vectors[[row for _, row in kept]]
+    sim = np.triu(vecs @ vecs.T, k=1) > DUPLICATE_SIM
+    redundant = sim.any(axis=0)
+    wasted = sum(estimate_tokens(r.get("text") or "") for (r, _), dup in zip(kept, redundant) if dup)
+    return int(sim.sum()), wasted
+
+
+def main(query_file="user_queries.json"):
+    with open(query_file, "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+
+    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    retriever = Retriever()
+    embeddings = model.encode(queries, convert_to_numpy=True, batch_size=32)
+
+    print(f"{len(queries)} queries, top_k={TOP_K}\n")
+    print(f"{'lambda':<8}{'sources':>9}{'dup pairs':>11}{'prompt tok':>12}{'redundant tok':>15}{'saved':>8}")
+
+    baseline_wasted = None
+    for lam in LAMBDAS:
+        sources = dups = tokens = wasted = 0.0
+        for query, emb in zip(queries, embeddings):
+            retrieved = retriever.retrieve(query, top_k=TOP_K, query_embedding=emb, mmr_lambda=lam)
+            sources += len({r.get("meta", {}).get("source") for r in retrieved})
+            pairs, waste = redundancy(retriever, retrieved)
+            dups += pairs
+            wasted += waste
+            # Prompt without the char cap, i.e. what the chunks would cost if all were sent
+            tokens += estimate_tokens(build_prompt(query, retrieved, max_chars=10 ** 9))
+
+        n = len(queries)
+        if baseline_wasted is None:
+            baseline_wasted = wasted
+        label = "off" if lam is None else f"{lam:.1f}"
+        # tokens per query no longer spent on repeated passages, relative to plain ranking
+        saved = (baseline_wasted - wasted) / n
+        print(f"{label:<8}{sources / n:>9.2f}{dups / n:>11.2f}{tokens / n:>12.0f}{wasted / n:>15.0f}{saved:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
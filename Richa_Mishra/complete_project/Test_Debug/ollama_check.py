@@ -0,0 +1,193 @@
+# ollama_check.py
+# Benchmarks rag/ollama_client.OllamaBackend against a stub Ollama server, compared with the old
+# Test_Debug/llm_local.py pattern (new connection per question, no keep_alive, answer returned
+# only once generation ends). The stub behaves like a small local model:
+#   - loading the model takes LOAD_S; without keep_alive it is unloaded after IDLE_UNLOAD_S idle
+#     (stand-ins for the real multi-second load and Ollama's default 5 minutes)
+#   - PROMPT_S to read the prompt, then one NDJSON line per token every TOKEN_S
+# Questions arrive GAP_S apart (longer than the idle unload). Reports time to first visible
+# token, total time and TCP connections opened.
+#   python Test_Debug/ollama_check.py [questions]
+#   python Test_Debug/ollama_check.py 3 --pipeline   # also run_rag end to end against the stub
+# --pipeline needs the query encoder and index; no external service is contacted.
+
+import os
+import sys
+import json
+import time
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.llm_router import GenerateConfig
+from rag.ollama_client import OllamaBackend
+
+LOAD_S = 1.0
+IDLE_UNLOAD_S = 0.5
+PROMPT_S = 0.15
+TOKEN_S = 0.01
+GAP_S = 0.8
+ANSWER = ('{"eligibility_status": "eligible", "reason": "The applicant meets the funds and '
+          'accommodation requirements.", "future_steps": ["Book a VFS appointment"], "confidence": 0.82}')
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.loaded_until = 0.0
+        self.connections = 0
+        self.loads = 0
+        self.requests = []
+
+    def ensure_loaded(self, keep_alive):
+        """Sleeps for a load if the model is not resident, then extends its residency."""
+        with self.lock:
+            now = time.monotonic()
+            cold = now >= self.loaded_until
+            if cold:
+                self.loads += 1
+        if cold:
+            time.sleep(LOAD_S)
+        with self.lock:
+            self.loaded_until = time.monotonic() + (parse_duration(keep_alive) if keep_alive is not None
+                                                    else IDLE_UNLOAD_S)
+
+
+def parse_duration(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"s": 1, "m": 60, "h": 3600}
+    return float(value[:-1]) * units[value[-1]] if value[-1] in units else float(value)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        self.server.ensure_loaded(body.get("keep_alive"))
+        if "prompt" not in body:   # preload request
+            return self.send_json({"model": body["model"], "response": "", "done": True})
+        time.sleep(PROMPT_S)
+        tokens = [ANSWER[i:i + 4] for i in range(0, len(ANSWER), 4)]
+        if not body.get("stream", True):
+            time.sleep(TOKEN_S * len(tokens))
+            return self.send_json({"model": body["model"], "response": ANSWER, "done": True})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens + [None]:
+            line = json.dumps({"model": body["model"], "response": token or "", "done": token is None})
+            data = (line + "\n").encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            if token:
+                time.sleep(TOKEN_S)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def old_ask(base, query):
+    """The previous llm_local.ask_local_llm: fresh connection, default keep_alive, concatenate."""
+    req = urllib.request.Request(f"{base}/api/generate",
+                                 data=json.dumps({"model": "llama3.2", "prompt": query}).encode(),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    text = ""
+    with urllib.request.urlopen(req) as resp:
+        for line in resp:
+            if line.strip():
+                text += json.loads(line).get("response", "")
+    return text
+
+
+def measure(label, server, n, ask):
+    server.connections, server.loads = 0, 0
+    first, total = [], []
+    for i in range(n):
+        time.sleep(GAP_S)
+        t0 = time.perf_counter()
+        marks = []
+        text = ask(f"question {i}", lambda piece: marks or marks.append(time.perf_counter() - t0))
+        total.append(time.perf_counter() - t0)
+        first.append(marks[0] if marks else total[-1])
+        assert json.loads(text)["eligibility_status"] == "eligible"
+    print(f"{label:<38}first token p50 {1000 * np.median(first):>6.0f} ms   total p50 "
+          f"{1000 * np.median(total):>6.0f} ms   model loads {server.loads:>2}   new connections {server.connections:>2}")
+
+
+def main(n, pipeline):
+    server = StubOllama()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    config = GenerateConfig(max_output_tokens=256)
+    print(f"stub Ollama {base}: load {LOAD_S}s, idle unload {IDLE_UNLOAD_S}s, "
+          f"{n} questions {GAP_S}s apart\n")
+
+    def old(query, on_first):
+        text = old_ask(base, query)
+        on_first(text)   # nothing is visible before the full answer
+        return text
+
+    measure("old llm_local (per-call connection)", server, n, old)
+
+    backend = OllamaBackend("llama3.2", base, keep_alive="30m", format="json")
+    backend.preload()
+
+    def streamed(query, on_first):
+        text = ""
+        for piece in backend.stream(query, config):
+            on_first(piece)
+            text += piece
+        return text
+
+    measure("OllamaBackend.stream (keep_alive)", server, n, streamed)
+    measure("OllamaBackend.generate (keep_alive)", server, n,
+            lambda q, on_first: backend.generate(q, config))
+
+    sent = server.requests[-1]
+    print(f"\nrequest body sent: keep_alive={sent.get('keep_alive')} format={sent.get('format')} "
+          f"options={sent.get('options')}")
+
+    if pipeline:
+        os.environ["SWIFTVISA_LLM_BACKENDS"] = "ollama"
+        os.environ["OLLAMA_HOST"] = base
+        from rag.pipeline import run_rag
+        print("\nrun_rag with SWIFTVISA_LLM_BACKENDS=ollama:")
+        for query in ["Am I eligible for a UK student visa with an unconditional offer?",
+                      "Can I visit France for 10 days on a tourist visa?"][:n]:
+            t0 = time.perf_counter()
+            result = run_rag(query)
+            print(f"  {time.perf_counter() - t0:.2f}s  decision={result['parsed']['decision']} "
+                  f"confidence={result['final_confidence']:.2f}  {query}")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(int(args[0]) if args else 10, "--pipeline" in sys.argv)
@@ -0,0 +1,88 @@
+# projection_report.py
+# Memory, search latency and recall@k of projected (PCA / whitened) indexes at 64-192 dims,
+# against exact search over the full 384-dim vectors, for the queries in user_queries.json.
+# "serve KB" is what a loaded rag.retriever.Retriever holds: the FAISS index plus the stored
+# vectors it keeps for document routing and MMR (projected too when the index is).
+# Run from the project root: python Test_Debug/projection_report.py [k]
+
+import io
+import sys
+import json
+import time
+import tempfile
+import contextlib
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.encoders import get_encoder
+from utils.projection import fit_projection
+from utils.vector_store import build_faiss_index
+from rag.retriever import Retriever
+
+TARGET_DIMS = [64, 96, 128, 192]
+METHODS = ["pca", "whiten"]
+REPEATS = 50
+
+
+def search_ms(index, queries, k):
+    index.search(queries, k)
+    t0 = time.perf_counter()
+    for _ in range(REPEATS):
+        for q in queries:
+            index.search(q.reshape(1, -1), k)
+    return 1000 * (time.perf_counter() - t0) / (REPEATS * len(queries))
+
+
+def serving_bytes(vectors, dim=None, method="pca"):
+    """Builds a bundle in a temporary directory and measures the Retriever that loads it."""
+    entries = [{"unique_id": i, "chunk_id": i, "source": "report", "embedding": v}
+               for i, v in enumerate(vectors)]
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        tmp = Path(tmp)
+        build_faiss_index(entries, tmp / "r.index", tmp / "r_metadata.json", tmp / "r.npy", tmp / "r_ids.npy",
+                          projection_dim=dim, projection_method=method)
+        r = Retriever(tmp / "r.index", tmp / "r.npy", tmp / "r_ids.npy", tmp / "r_metadata.json",
+                      tmp / "r_chunks.json")
+        return r.index.ntotal * r.index.d * 4 + (r.vectors.nbytes if r.vectors is not None else 0)
+
+
+def recall(reference, candidate):
+    return float(np.mean([len(set(r) & set(c)) / len(r) for r, c in zip(reference, candidate)]))
+
+
+def main(k):
+    vectors = np.load(ROOT / "Data" / "visa_embeddings.npy").astype("float32")
+    with open(ROOT / "user_queries.json", "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+    qv = get_encoder().encode(queries)
+
+    full = faiss.IndexFlatIP(vectors.shape[1])
+    full.add(vectors)
+    _, reference = full.search(qv, k)
+    full_bytes = serving_bytes(vectors)
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, recall@{k} vs exact {vectors.shape[1]}-dim search\n")
+    print(f"{'method':<8}{'dim':>5}{'index KB':>10}{'serve KB':>10}{'memory':>9}{'search µs':>11}{'recall':>8}")
+    print(f"{'full':<8}{vectors.shape[1]:>5}{vectors.nbytes / 1024:>10.1f}{full_bytes / 1024:>10.1f}{1.0:>9.2f}"
+          f"{1000 * search_ms(full, qv, k):>11.1f}{1.0:>8.3f}")
+
+    for method in METHODS:
+        for dim in TARGET_DIMS:
+            proj = fit_projection(vectors, dim, method)
+            pv = proj.apply(vectors)
+            index = faiss.IndexFlatIP(dim)
+            index.add(pv)
+            pq = proj.apply(qv)
+            _, ids = index.search(pq, k)
+            served = serving_bytes(vectors, dim, method)
+            print(f"{method:<8}{dim:>5}{pv.nbytes / 1024:>10.1f}{served / 1024:>10.1f}{served / full_bytes:>9.2f}"
+                  f"{1000 * search_ms(index, pq, k):>11.1f}{recall(reference, ids):>8.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
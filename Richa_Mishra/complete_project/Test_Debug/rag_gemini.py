@@ -64,9 +64,13 @@ QUESTION:
 Answer with citations like [1].
 """
 
+gemini_model = None
+
 def call_gemini(prompt):
-    model = genai.GenerativeModel("models/gemini-2.5-flash")
-    out = model.generate_content(prompt)
+    global gemini_model
+    if gemini_model is None:
+        gemini_model = genai.GenerativeModel("models/gemini-2.5-flash")
+    out = gemini_model.generate_content(prompt)
     return out.text
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+# rate_limit_check.py
+# Exercises rag/rate_limiter.py against a local fake generateContent endpoint that answers like
+# the Gemini API: 429 RESOURCE_EXHAUSTED with "Please retry in Ns" / retryDelay once a rolling
+# per-window request limit is hit, a per-day quota after which every call is a 429, and a
+# SAFETY block for prompts containing BLOCKME. Time is scaled: WINDOW seconds stand in for
+# a minute. Compares the old behaviour (fire, then immediately re-fire a simplified prompt)
+# with the scheduler, then checks fail-fast on an exhausted quota and that blocks are not retried.
+# Also checks that an idle scheduler at the real 10 RPM sends a short burst of calls at once.
+# No API key needed. Run from the project root: python Test_Debug/rate_limit_check.py [requests]
+
+import sys
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.rate_limiter import RequestScheduler, CircuitOpenError
+
+MODEL = "models/gemini-2.5-flash"
+WINDOW = 6.0        # seconds that stand in for one minute
+PER_WINDOW = 10     # requests allowed per window (the free-tier 10 RPM)
+
+
+# ------------------------------------------------------------
+# FAKE ENDPOINT
+# ------------------------------------------------------------
+class FakeGemini(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.daily_limit = None
+        self.served = 0
+        self.hits = Counter()
+
+    def decide(self, prompt):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > WINDOW:
+                self.recent.popleft()
+            if "BLOCKME" in prompt:
+                self.hits["blocked"] += 1
+                return "blocked", 0
+            if self.daily_limit is not None and self.served >= self.daily_limit:
+                self.hits["429 daily"] += 1
+                return "daily", 3600
+            if len(self.recent) >= PER_WINDOW:
+                self.hits["429 rate"] += 1
+                return "rate", WINDOW - (now - self.recent[0])
+            self.recent.append(now)
+            self.served += 1
+            self.hits["200"] += 1
+            return "ok", 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["contents"][0]["parts"][0]["text"]
+        outcome, retry = self.server.decide(prompt)
+        if outcome in ("rate", "daily"):
+            quota_id = ("GenerateRequestsPerDayPerProjectPerModel-FreeTier" if outcome == "daily"
+                        else "GenerateRequestsPerMinutePerProjectPerModel-FreeTier")
+            status, payload = 429, {"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED",
+                "message": f"You exceeded your current quota. Quota id: {quota_id}. Please retry in {retry:.3f}s.",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{int(retry)}s"}],
+            }}
+        elif outcome == "blocked":
+            status, payload = 200, {"promptFeedback": {"blockReason": "SAFETY"}}
+        else:
+            status, payload = 200, {"candidates": [{"content": {"parts": [{"text": '{"ok": true}'}]}}]}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class BlockedPromptException(Exception):
+    pass
+
+
+def generate(base, prompt):
+    """Minimal REST generateContent; errors carry the code and message like the SDK's."""
+    req = urllib.request.Request(
+        f"{base}/v1beta/{MODEL}:generateContent",
+        data=json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode(),
+        headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            data = json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise ApiError(e.code, json.loads(e.read())["error"]["message"])
+    if data.get("promptFeedback", {}).get("blockReason"):
+        raise BlockedPromptException(f"block_reason: {data['promptFeedback']['blockReason']}")
+    return data["candidates"][0]["content"]["parts"][0]["text"]
+
+
+# ------------------------------------------------------------
+# SCENARIOS
+# ------------------------------------------------------------
+def run(label, server, n, call, threads=4):
+    server.hits.clear()
+    outcomes = Counter()
+
+    def one(i):
+        try:
+            call(f"question {i}")
+            outcomes["answered"] += 1
+        except CircuitOpenError:
+            outcomes["failed fast"] += 1
+        except Exception as e:
+            outcomes[f"failed ({type(e).__name__})"] += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(n)))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<26}{elapsed:>7.1f}s  server saw {dict(server.hits)}  callers: {dict(outcomes)}")
+
+
+def main(n):
+    server = FakeGemini()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"fake endpoint {base}: {PER_WINDOW} requests per {WINDOW:.0f}s window, {n} requests, 4 threads\n")
+
+    def naive(prompt):
+        # What call_gemini used to do: any failure -> immediately send a simplified prompt
+        try:
+            return generate(base, prompt)
+        except Exception:
+            return generate(base, "simplified " + prompt)
+
+    run("old: retry immediately", server, n, naive)
+    time.sleep(WINDOW)
+
+    # The same quota expressed per real minute
+    rpm = PER_WINDOW * 60.0 / WINDOW
+    scheduler = RequestScheduler(rpm=rpm, tpm=1e9, max_wait=WINDOW * 2, breaker_cooldown=WINDOW * 2)
+    run("scheduler", server, n, lambda p: scheduler.call(MODEL, 10, lambda: generate(base, p)))
+    print(f"{'':<26}scheduler stats: {scheduler.stats()[MODEL]}\n")
+    time.sleep(WINDOW)
+
+    # Configured limit twice the real one: 429s happen, and are retried after the server's delay
+    scheduler = RequestScheduler(rpm=2 * rpm, tpm=1e9, max_wait=WINDOW * 2, breaker_cooldown=WINDOW * 2)
+    run("scheduler, limit too high", server, n, lambda p: scheduler.call(MODEL, 10, lambda: generate(base, p)))
+    stats = scheduler.stats()[MODEL]
+    print(f"{'':<26}retries {stats['retries']}, backoff {stats['backoff_s']:.1f}s, breaker {stats['breaker']}\n")
+
+    # Daily quota used up: the first 429 opens the breaker, later calls never reach the server
+    server.daily_limit = server.served
+    scheduler = RequestScheduler(rpm=rpm, tpm=1e9, max_wait=WINDOW * 2, breaker_cooldown=WINDOW * 2)
+    run("exhausted daily quota", server, n, lambda p: scheduler.call(MODEL, 10, lambda: generate(base, p)))
+    print(f"{'':<26}breaker: {scheduler.lane(MODEL).breaker.state}\n")
+    server.daily_limit = None
+
+    # Idle process at the real 10 RPM: a few interactive calls go out without pacing
+    time.sleep(WINDOW)
+    scheduler = RequestScheduler(rpm=10, tpm=1e9)
+    t0 = time.perf_counter()
+    for i in range(int(scheduler.burst)):
+        scheduler.call(MODEL, 10, lambda: generate(base, f"interactive {i}"))
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 1.0, f"idle burst was paced ({elapsed:.1f}s)"
+    print(f"{'idle burst at 10 RPM':<26}{elapsed:>7.1f}s  {int(scheduler.burst)} calls, "
+          f"throttled {scheduler.stats()[MODEL]['throttled_s']:.1f}s\n")
+    time.sleep(WINDOW)
+
+    # Safety blocks are final: one request each, no retries
+    scheduler = RequestScheduler(rpm=rpm, tpm=1e9)
+    run("safety blocks", server, 5, lambda p: scheduler.call(MODEL, 10, lambda: generate(base, "BLOCKME " + p)))
+    print(f"{'':<26}retries: {scheduler.stats()[MODEL]['retries']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,93 @@
+# routing_report.py
+# Per-country accuracy and latency of the two-stage (document -> chunk) router vs exhaustive search.
+# Probes are the questions in user_queries.json, encoded with the query encoder (utils/encoders.py)
+# and grouped by the first country they name ("none" when they name none). Route acc is the share
+# of probes whose routed documents include one of the named countries' documents; recall@5 is
+# against exact search over the same stored vectors.
+# Run from the project root: python Test_Debug/routing_report.py [top_docs] [user_queries.json]
+
+import sys
+import time
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.router import DocumentRouter
+from rag.entity_matcher import default_matcher
+from utils.encoders import get_encoder
+
+DATA_DIR = Path("Data")
+TOP_K = 5
+
+
+def main(top_docs=3, query_file="user_queries.json"):
+    vectors = np.load(DATA_DIR / "visa_embeddings.npy").astype("float32")
+    ids = np.load(DATA_DIR / "visa_ids.npy").astype("int64")
+    with open(DATA_DIR / "visa_metadata.json", "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    with open(query_file, "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+
+    # Exact search over the stored vectors (the serving index may be projected)
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+    index.add_with_ids(vectors, ids)
+    router = DocumentRouter(vectors, ids, metadata)
+    print(f"Router: {router.num_documents} documents, {len(router.centroids)} section centroids, top_docs={top_docs}")
+
+    probes = get_encoder().encode(queries).astype("float32")
+    faiss.normalize_L2(probes)
+    matcher = default_matcher()
+    print(f"Probes: {len(queries)} encoded questions from {query_file}\n")
+
+    stats = defaultdict(lambda: {"n": 0, "routed_ok": 0, "recall": 0.0, "t_full": 0.0, "t_routed": 0.0, "scanned": 0})
+
+    for query, qv in zip(queries, probes):
+        countries = matcher.countries(query)
+        qv = qv.reshape(1, -1)
+
+        t0 = time.perf_counter()
+        _, full_ids = index.search(qv, TOP_K)
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        routed = router.route(qv[0], top_docs=top_docs)
+        _, routed_ids = router.search(qv[0], TOP_K, top_docs=top_docs)
+        t_routed = time.perf_counter() - t0
+
+        s = stats[countries[0] if countries else "none"]
+        s["n"] += 1
+        s["routed_ok"] += int(any(router.doc_countries[d] in countries for d, _ in routed))
+        s["recall"] += len(set(full_ids[0]) & set(routed_ids[0])) / TOP_K
+        s["t_full"] += t_full
+        s["t_routed"] += t_routed
+        s["scanned"] += sum(len(router.doc_ids[d]) for d, _ in routed)
+
+    print(f"{'country':<10}{'probes':>8}{'route acc':>11}{'recall@5':>10}{'scanned':>9}{'full ms':>9}{'routed ms':>11}")
+    for country, s in sorted(stats.items()):
+        n = s["n"]
+        acc = f"{s['routed_ok'] / n:>11.3f}" if country != "none" else f"{'-':>11}"
+        print(f"{country:<10}{n:>8}{acc}{s['recall'] / n:>10.3f}"
+              f"{s['scanned'] / n:>9.1f}{1000 * s['t_full'] / n:>9.3f}{1000 * s['t_routed'] / n:>11.3f}")
+
+    n = len(queries)
+    t_full = 1000 * sum(s["t_full"] for s in stats.values()) / n
+    t_routed = 1000 * sum(s["t_routed"] for s in stats.values()) / n
+    print(f"\nCorpus size: {len(ids)} chunks")
+    if t_routed >= t_full:
+        print(f"Routed search ({t_routed:.3f} ms) is slower than exhaustive search ({t_full:.3f} ms) at this "
+              f"corpus size: scoring the centroids costs more than the chunks it skips.")
+    else:
+        print(f"Routed search ({t_routed:.3f} ms) vs exhaustive search ({t_full:.3f} ms): "
+              f"{t_full / t_routed:.1f}x faster.")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    files = [a for a in args if a.endswith(".json")]
+    docs = [a for a in args if not a.endswith(".json")]
+    main(top_docs=int(docs[0]) if docs else 3, query_file=files[0] if files else "user_queries.json")
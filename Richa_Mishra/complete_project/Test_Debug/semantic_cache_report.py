@@ -0,0 +1,151 @@
+# semantic_cache_report.py
+# Hit-rate and false-hit study for rag/semantic_cache.py, to choose its thresholds.
+#   1. The questions in user_queries.json are all different, so they are fed to a fresh cache
+#      one after another: every hit among them is a false hit (someone else's answer).
+#   2. Hand-written paraphrases of some of them (and of one extra question) are then looked
+#      up: a hit on the paraphrased question is a true hit, a hit on any other is a false hit.
+# Swept over similarity thresholds and chunk-overlap minimums. Uses the serving encoder and
+# index (rag.pipeline) for query vectors and retrieved chunk ids; no LLM calls.
+# Run from the project root: python Test_Debug/semantic_cache_report.py [user_queries.json]
+
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.pipeline import get_serving, get_embedding
+from rag.semantic_cache import SemanticCache, is_profile_specific, chunk_overlap
+
+TOP_K = 5
+THRESHOLDS = [0.70, 0.75, 0.80, 0.85, 0.88, 0.90, 0.92, 0.95]
+OVERLAPS = [0.0, 0.4, 0.6, 0.8]
+
+# Question -> paraphrases a user might type instead (questions without the asker's own facts)
+PARAPHRASES = {
+    "Can I stay longer by extending my visitor visa?": [
+        "Is it possible to extend a visitor visa to stay longer?",
+        "How do I extend my stay as a visitor?"],
+    "Can I travel all Schengen countries with single-country visa?": [
+        "Does a Schengen visa issued by one country let me visit all Schengen states?",
+        "Can I visit other Schengen countries on a visa from one member state?"],
+    "Can I apply without confirmed bookings?": [
+        "Do I need confirmed bookings before applying?",
+        "Is a confirmed flight or hotel booking required to apply?"],
+    "Can I switch from tourist visa to work visa?": [
+        "Is it possible to change a tourist visa into a work visa?",
+        "Can I convert my visitor visa to a work visa without leaving?"],
+    "Can I apply for Schengen visa with sponsorship from friend?": [
+        "Can a friend sponsor a Schengen visa application?",
+        "Is sponsorship by a friend accepted for a Schengen visa?"],
+    "Do I need a job offer from a licensed sponsor for a Skilled Worker Visa?": [
+        "Is a job offer from a licensed sponsor mandatory for the Skilled Worker visa?",
+        "Must Skilled Worker visa applicants have an offer from an approved sponsor?"],
+    "Do I need medical exam for visitor visa?": [
+        "Is a medical examination required for a visitor visa?",
+        "Do visitors have to take a medical test?"],
+    "Can I travel to UK with Ireland visa?": [
+        "Does an Irish visa allow entry to the UK?",
+        "Can I visit Britain using an Ireland visa?"],
+    "Can I apply for F1 Visa with IELTS score instead of TOEFL?": [
+        "Is IELTS accepted instead of TOEFL for an F1 student visa?",
+        "Can I use IELTS rather than TOEFL for an F-1 visa?"],
+    "Can I apply for Schengen without travel insurance?": [
+        "Is travel insurance mandatory for a Schengen visa?",
+        "Can I get a Schengen visa without travel medical insurance?"],
+    "Can I apply for work permit without LMIA?": [
+        "Is an LMIA required for a Canadian work permit?",
+        "Can I get a work permit that is LMIA-exempt?"],
+    "Am I eligible for Canada visitor visa with no travel history?": [
+        "Can someone who has never travelled abroad get a Canadian visitor visa?",
+        "Does having no travel history stop me getting a Canada visitor visa?"],
+    # Not in user_queries.json: stored before the paraphrase lookups
+    "What documents do I need for a US tourist visa?": [
+        "documents for US tourist visa",
+        "what papers do I need for a B2 visa"],
+}
+
+
+def prepare(queries):
+    """Query vector and retrieved chunk ids per question, with the serving encoder and index."""
+    _, retriever, encoder = get_serving()
+    out = {}
+    for q in queries:
+        vec = np.asarray(get_embedding(q, encoder), dtype="float32")
+        ids = [r.get("uid") for r in retriever.retrieve(q, top_k=TOP_K, query_embedding=vec)]
+        out[q] = (vec, ids)
+    return out
+
+
+def run(threshold, overlap, stored, paraphrases, prepared):
+    cache = SemanticCache(threshold=threshold, min_overlap=overlap)
+    false_pairs = []
+    for q in stored:
+        vec, ids = prepared[q]
+        hit = cache.lookup(q, vec, ids, "study")
+        if hit is not None:
+            false_pairs.append((q, hit.matched_query, hit.similarity, hit.overlap))
+        else:
+            cache.add(q, vec, ids, q, "study")     # the "answer" names the question it belongs to
+    looked_up = cache.hits + cache.misses
+
+    true_hits, wrong = 0, []
+    for original, variants in paraphrases.items():
+        for p in variants:
+            vec, ids = prepared[p]
+            hit = cache.lookup(p, vec, ids, "study")
+            if hit is None:
+                continue
+            if hit.answer == original:
+                true_hits += 1
+            else:
+                wrong.append((p, hit.matched_query, hit.similarity, hit.overlap))
+    return looked_up, false_pairs, true_hits, wrong
+
+
+def main(query_file):
+    with open(query_file, "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+    stored = queries + [q for q in PARAPHRASES if q not in queries]
+    paraphrases = {q: [p for p in ps if not is_profile_specific(p)] for q, ps in PARAPHRASES.items()}
+    n_para = sum(len(ps) for ps in paraphrases.values())
+    prepared = prepare(stored + [p for ps in paraphrases.values() for p in ps])
+
+    generic = [q for q in queries if not is_profile_specific(q)]
+    print(f"{len(queries)} questions in {query_file}: {len(queries) - len(generic)} profile-specific "
+          f"(never cached), {len(generic)} cacheable; {n_para} paraphrases of {len(paraphrases)} questions\n")
+
+    # Where the similarities fall: paraphrase vs its question, and nearest different question
+    def sim(a, b):
+        va, vb = prepared[a][0], prepared[b][0]
+        return float(va @ vb / (np.linalg.norm(va) * np.linalg.norm(vb) + 1e-12))
+    para_sims = [sim(p, q) for q, ps in paraphrases.items() for p in ps]
+    para_overlaps = [chunk_overlap(prepared[p][1], prepared[q][1]) for q, ps in paraphrases.items() for p in ps]
+    cacheable = generic + [q for q in PARAPHRASES if q not in queries]
+    nearest = [max(sim(a, b) for b in cacheable if b != a) for a in cacheable]
+    print(f"paraphrase -> its question   similarity p10/p50/p90 "
+          f"{np.percentile(para_sims, 10):.3f} / {np.median(para_sims):.3f} / {np.percentile(para_sims, 90):.3f}"
+          f"   chunk overlap p50 {np.median(para_overlaps):.2f}")
+    print(f"question -> nearest other    similarity p50/p90/max "
+          f"{np.median(nearest):.3f} / {np.percentile(nearest, 90):.3f} / {max(nearest):.3f}\n")
+
+    print(f"{'threshold':>9}{'overlap':>9}{'false hits (distinct)':>24}{'paraphrase hits':>17}{'wrong answer':>14}")
+    report = {}
+    for threshold in THRESHOLDS:
+        for overlap in OVERLAPS:
+            looked_up, false_pairs, true_hits, wrong = run(threshold, overlap, stored, paraphrases, prepared)
+            report[(threshold, overlap)] = (false_pairs, wrong)
+            print(f"{threshold:>9.2f}{overlap:>9.1f}{len(false_pairs):>12} / {looked_up:<11}"
+                  f"{true_hits:>8} / {n_para:<8}{len(wrong):>10}")
+
+    # Examples at the defaults
+    false_pairs, wrong = report[(0.92, 0.6)]
+    print("\nfalse hits at the defaults (threshold 0.92, overlap 0.6):")
+    for q, matched, s, o in (false_pairs + wrong)[:10] or [("none", "", 0, 0)]:
+        print(f"  {q}" + (f"\n      served from: {matched}  (similarity {s:.3f}, overlap {o:.2f})" if matched else ""))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "user_queries.json")
@@ -0,0 +1,315 @@
+# single_flight_check.py
+# Checks rag/single_flight.py under thread-pool and asyncio concurrency:
+#   1. threads: 32 workers ask 4 different questions at once; each question must run exactly
+#      once, every caller must get its question's result (as its own copy), and a failing call
+#      must raise in every caller that joined it
+#   2. asyncio: the same with tasks, a cancelled leader (its followers must retry and still
+#      get an answer), a cancelled follower (the shared call must carry on) and threads
+#      following an asyncio leader
+#   3. streams (do_stream): threads reading event streams, where followers replay the leader's
+#      result; a reader that stops early (followers retry); stream followers of an asyncio
+#      leader and asyncio followers of a stream leader
+#   4. --pipeline: run_rag and stream_rag from a thread pool, run_rag_async and stream_rag
+#      (on executor threads) from tasks, 5 questions asked 8 times each against a stub Ollama;
+#      reports LLM requests with and without coalescing
+# No external service is contacted.
+#   python Test_Debug/single_flight_check.py
+#   python Test_Debug/single_flight_check.py --pipeline   # needs the query encoder and index
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rag.single_flight import SingleFlight, flight_key
+
+WORK_S = 0.2
+QUESTIONS = ["Can I extend my visitor visa?", "Do I need a medical exam for a visitor visa?",
+             "Is travel insurance mandatory for Schengen?", "Can I work on a student visa?"]
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {}
+
+    def hit(self, key):
+        with self.lock:
+            self.runs[key] = self.runs.get(key, 0) + 1
+
+
+# ------------------------------------------------------------
+# 1. THREADS
+# ------------------------------------------------------------
+def check_threads():
+    flight, counter = SingleFlight(), Counter()
+
+    def work(q):
+        counter.hit(q)
+        time.sleep(WORK_S)
+        return {"question": q, "steps": [q.upper()]}
+
+    def call(i):
+        q = QUESTIONS[i % len(QUESTIONS)]
+        return q, flight.do(flight_key(q), lambda: work(q))
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(call, range(32)))
+    assert all(n == 1 for n in counter.runs.values()) and len(counter.runs) == len(QUESTIONS), counter.runs
+    assert all(r == {"question": q, "steps": [q.upper()]} for q, r in results)
+    assert len({id(r) for _, r in results}) == len(results), "callers must not share one dict"
+
+    def fail():
+        counter.hit("fail")
+        time.sleep(WORK_S)
+        raise ValueError("boom")
+
+    def call_fail(_):
+        try:
+            flight.do("fail", fail)
+        except ValueError as e:
+            return str(e)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        errors = list(pool.map(call_fail, range(8)))
+    assert errors == ["boom"] * 8 and counter.runs["fail"] == 1, (errors, counter.runs)
+
+    # Profile and filters are part of the key
+    assert flight_key("q", {"age": 30}) != flight_key("q", {"age": 31}) != flight_key("q")
+    assert flight_key("q", top_k=5) != flight_key("q", top_k=3)
+    print(f"threads: 32 callers, {len(QUESTIONS)} executions; failure raised in all 8 callers   {flight.stats()}")
+
+
+# ------------------------------------------------------------
+# 2. ASYNCIO
+# ------------------------------------------------------------
+async def check_asyncio():
+    flight, counter = SingleFlight(), Counter()
+
+    async def work(q):
+        counter.hit(q)
+        await asyncio.sleep(WORK_S)
+        return {"question": q}
+
+    async def call(i):
+        q = QUESTIONS[i % len(QUESTIONS)]
+        return q, await flight.do_async(flight_key(q), lambda: work(q))
+
+    results = await asyncio.gather(*(call(i) for i in range(32)))
+    assert all(n == 1 for n in counter.runs.values()) and len(counter.runs) == len(QUESTIONS), counter.runs
+    assert all(r == {"question": q} for q, r in results)
+
+    # Cancelled leader: followers retry, one of them becomes the new leader
+    leader = asyncio.ensure_future(flight.do_async("cancel", lambda: work("cancel")))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.ensure_future(flight.do_async("cancel", lambda: work("cancel"))) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    answers = await asyncio.gather(*followers)
+    assert leader.cancelled() and answers == [{"question": "cancel"}] * 5, answers
+    assert counter.runs["cancel"] == 2, counter.runs
+
+    # Cancelled follower: the shared call and the other callers are unaffected
+    calls = [asyncio.ensure_future(flight.do_async("follower", lambda: work("follower"))) for _ in range(4)]
+    await asyncio.sleep(0.01)
+    calls[1].cancel()
+    done = await asyncio.gather(*calls, return_exceptions=True)
+    assert isinstance(done[1], asyncio.CancelledError) and done[0] == done[2] == done[3] == {"question": "follower"}
+    assert counter.runs["follower"] == 1, counter.runs
+
+    # Threads following an asyncio leader
+    loop = asyncio.get_running_loop()
+    leader = asyncio.ensure_future(flight.do_async("mixed", lambda: work("mixed")))
+    await asyncio.sleep(0.01)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        threads = [loop.run_in_executor(pool, flight.do, "mixed", lambda: counter.hit("mixed-thread"))
+                   for _ in range(4)]
+        answers = await asyncio.gather(leader, *threads)
+    assert answers == [{"question": "mixed"}] * 5 and "mixed-thread" not in counter.runs, (answers, counter.runs)
+    print(f"asyncio: 32 tasks, {len(QUESTIONS)} executions; cancelled leader -> followers retried once; "
+          f"cancelled follower ignored; 4 threads joined an asyncio leader   {flight.stats()}")
+
+
+# ------------------------------------------------------------
+# 3. STREAMS
+# ------------------------------------------------------------
+def events_of(q, counter):
+    counter.hit(q)
+    for i in range(4):
+        time.sleep(WORK_S / 4)
+        yield {"type": "token", "text": f"{q}:{i}"}
+    yield {"type": "final", "answer": {"question": q}}
+
+
+def final_of(event):
+    return event["answer"] if event["type"] == "final" else None
+
+
+def replay(answer):
+    return [{"type": "replayed", "answer": answer}]
+
+
+def check_streams():
+    flight, counter = SingleFlight(), Counter()
+
+    def read(i):
+        q = QUESTIONS[i % len(QUESTIONS)]
+        return q, list(flight.do_stream(flight_key(q), lambda: events_of(q, counter), final_of, replay))
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(read, range(32)))
+    assert all(n == 1 for n in counter.runs.values()) and len(counter.runs) == len(QUESTIONS), counter.runs
+    led = [events for _, events in results if events[0]["type"] == "token"]
+    assert len(led) == len(QUESTIONS) and all(len(events) == 5 for events in led)
+    assert all(events[-1]["answer"] == {"question": q} for q, events in results)
+
+    # A leader whose reader stops after the first token: followers retry, one of them leads
+    early = flight.do_stream("early", lambda: events_of("early", counter), final_of, replay)
+    next(early)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        followers = [pool.submit(lambda: list(flight.do_stream(
+            "early", lambda: events_of("early", counter), final_of, replay))) for _ in range(4)]
+        time.sleep(0.02)
+        early.close()
+        answers = [f.result()[-1]["answer"] for f in followers]
+    assert answers == [{"question": "early"}] * 4 and counter.runs["early"] == 2, (answers, counter.runs)
+    print(f"streams: 32 readers, {len(QUESTIONS)} executions; early-closed leader -> followers retried once   "
+          f"{flight.stats()}")
+
+
+async def check_streams_asyncio():
+    flight, counter = SingleFlight(), Counter()
+    loop = asyncio.get_running_loop()
+
+    async def work(q):
+        counter.hit(q)
+        await asyncio.sleep(WORK_S)
+        return {"question": q}
+
+    def read(q):
+        return list(flight.do_stream(q, lambda: events_of(q, counter), final_of, replay))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        # Stream readers following an asyncio leader
+        leader = asyncio.ensure_future(flight.do_async("a", lambda: work("a")))
+        await asyncio.sleep(0.01)
+        streams = [loop.run_in_executor(pool, read, "a") for _ in range(3)]
+        answer, *replays = await asyncio.gather(leader, *streams)
+        assert answer == {"question": "a"} and replays == [replay({"question": "a"})] * 3, replays
+
+        # Tasks following a stream leader on a worker thread
+        stream = loop.run_in_executor(pool, read, "b")
+        await asyncio.sleep(0.01)
+        events, *answers = await asyncio.gather(stream, *(flight.do_async("b", lambda: work("b"))
+                                                          for _ in range(3)))
+        assert events[-1]["answer"] == {"question": "b"} and answers == [{"question": "b"}] * 3, answers
+    assert counter.runs == {"a": 1, "b": 1}, counter.runs
+    print(f"streams + asyncio: 3 stream readers joined an asyncio leader, 3 tasks joined a stream leader   "
+          f"{flight.stats()}")
+
+
+# ------------------------------------------------------------
+# 4. PIPELINE (stub Ollama)
+# ------------------------------------------------------------
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # 40 callers connect at once with coalescing off
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(WORK_S)
+        answer = json.dumps({"eligibility_status": "eligible", "confidence": 0.8,
+                             "reason": "stub", "future_steps": []})
+        data = json.dumps({"model": body["model"], "response": answer, "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def check_pipeline():
+    server = StubOllama()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["SWIFTVISA_LLM_BACKENDS"] = "ollama"
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["SWIFTVISA_RESPONSE_CACHE"] = "off"     # count LLM calls, not cache hits
+    from rag import pipeline
+
+    questions = [q + suffix for q in QUESTIONS + ["What is a Skilled Worker visa?"]
+                 for suffix in ("", "  ", " (case 2)", " (case 3)", "", "", "", "")]
+    print(f"\npipeline: {len(questions)} calls, {len(set(map(pipeline.normalize_query, questions)))} "
+          f"distinct questions, stub Ollama {WORK_S * 1000:.0f} ms per answer")
+    for enabled in (False, True):
+        flight = pipeline.get_single_flight()
+        flight.enabled = enabled
+        server.requests = 0
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            answers = list(pool.map(pipeline.run_rag, questions))
+        threaded = time.perf_counter() - t0, server.requests
+
+        server.requests = 0
+        t0 = time.perf_counter()
+
+        async def batch():
+            return await asyncio.gather(*(pipeline.run_rag_async(q) for q in questions))
+        answers += asyncio.run(batch())
+        tasks = time.perf_counter() - t0, server.requests
+
+        # Streaming callers (Streamlit sessions, query_cli): threads, and tasks mixing
+        # stream_rag on executor threads with run_rag_async
+        def stream(q):
+            return [e for e in pipeline.stream_rag(q) if e["type"] == "final"][0]["answer"]
+
+        server.requests = 0
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+            answers += list(pool.map(stream, questions))
+        streamed = time.perf_counter() - t0, server.requests
+
+        server.requests = 0
+        t0 = time.perf_counter()
+
+        async def mixed():
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+                return await asyncio.gather(*(loop.run_in_executor(pool, stream, q) if i % 2
+                                              else pipeline.run_rag_async(q) for i, q in enumerate(questions)))
+        answers += asyncio.run(mixed())
+        mixed_run = time.perf_counter() - t0, server.requests
+        assert all(a["parsed"]["decision"] == "eligible" for a in answers)
+        print(f"  coalescing {'on ' if enabled else 'off'}  thread pool: {threaded[1]:>3} LLM requests "
+              f"in {threaded[0]:.2f}s   asyncio: {tasks[1]:>3} LLM requests in {tasks[0]:.2f}s")
+        print(f"                 stream_rag threads: {streamed[1]:>3} LLM requests in {streamed[0]:.2f}s   "
+              f"stream_rag + run_rag_async: {mixed_run[1]:>3} LLM requests in {mixed_run[0]:.2f}s")
+    print(f"  {pipeline.get_single_flight_stats()}")
+
+
+if __name__ == "__main__":
+    check_threads()
+    asyncio.run(check_asyncio())
+    check_streams()
+    asyncio.run(check_streams_asyncio())
+    if "--pipeline" in sys.argv:
+        check_pipeline()
@@ -0,0 +1,92 @@
+# static_encoder_report.py
+# Recall@5 of the distilled static encoder against the full MiniLM model on user_queries.json,
+# plus startup and per-query latency for both. The full model's top-5 over
+# Data/visa_embeddings.index is the reference. Builds the static table/index if missing,
+# from the chunks only: the queries are held out, so their words outside the corpus vocabulary
+# are dropped exactly as they would be for a new user question.
+# Run from the project root: python Test_Debug/static_encoder_report.py
+
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.encoders import load_encoder
+from utils.static_encoder import STATIC_DIR, TABLE_NPY, STATIC_INDEX, distill, build_static_index
+
+TOP_K = 5
+
+STARTUP_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from utils.encoders import load_encoder
+enc = load_encoder({backend!r})
+enc.encode(["warm up"])
+print(time.perf_counter() - t0)
+"""
+
+
+def startup_seconds(backend):
+    out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(backend=backend)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def latencies_ms(enc, queries):
+    enc.encode(queries[:4])
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        enc.encode([q])
+        lat.append(1000 * (time.perf_counter() - t0))
+    return np.percentile(lat, 50), np.percentile(lat, 95)
+
+
+def recall_at_k(reference, candidate):
+    return float(np.mean([len(set(r) & set(c)) / len(r) for r, c in zip(reference, candidate)]))
+
+
+def main():
+    with open(ROOT / "user_queries.json", "r", encoding="utf-8") as f:
+        queries = [q["query"] for q in json.load(f)]
+    with open(ROOT / "Data" / "visa_chunks.json", "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    static_dir = ROOT / STATIC_DIR
+    if not (static_dir / TABLE_NPY).exists():
+        distill(list(chunks.values()), out_dir=static_dir)
+    if not (static_dir / STATIC_INDEX).exists():
+        build_static_index(chunks, out_dir=static_dir)
+
+    full_index = faiss.read_index(str(ROOT / "Data" / "visa_embeddings.index"))
+    static_index = faiss.read_index(str(static_dir / STATIC_INDEX))
+
+    full = load_encoder("torch")
+    static = load_encoder("static")
+    full_q = full.encode(queries)
+    static_q = static.encode(queries)
+
+    _, reference = full_index.search(full_q, TOP_K)
+    _, same_space = full_index.search(static_q, TOP_K)
+    _, shipped = static_index.search(static_q, TOP_K)
+
+    print(f"Queries: {len(queries)} | table: {(static_dir / TABLE_NPY).stat().st_size / 1e6:.1f} MB\n")
+    print(f"recall@{TOP_K} static query -> MiniLM index : {recall_at_k(reference, same_space):.3f}")
+    print(f"recall@{TOP_K} static query -> static index : {recall_at_k(reference, shipped):.3f}")
+    print(f"mean cosine(static, MiniLM) per query      : {float(np.mean(np.sum(full_q * static_q, axis=1))):.3f}\n")
+
+    print(f"{'backend':<9}{'startup s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, enc in (("torch", full), ("static", static)):
+        p50, p95 = latencies_ms(enc, queries)
+        print(f"{name:<9}{startup_seconds(name):>10.2f}{p50:>9.3f}{p95:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
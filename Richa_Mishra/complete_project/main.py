@@ -7,8 +7,9 @@ from pathlib import Path
 from utils.nltk_setup import ensure_nltk_resources
 from utils.pdf_utils import extract_text_from_pdf, read_text_file, clean_text
 from utils.chunking import sentence_chunking
-from utils.embedding import get_embedding, print_embedding_info
+from utils.embedding import get_embeddings, embedding_cache, print_embedding_info, MODEL_NAME
 from utils.vector_store import build_faiss_index
+from utils.token_count import count_tokens, tokenizer_id
 
 ensure_nltk_resources()
 
@@ -16,6 +17,10 @@ ensure_nltk_resources()
 DATA_DIR = Path("Data")
 PDF_DIR = DATA_DIR / "pdfs"
 
+# Optional learned projection for the index (e.g. 128); 0 keeps full 384-dim vectors
+PROJECTION_DIM = int(os.getenv("SWIFTVISA_PROJECTION_DIM", "0"))
+PROJECTION_METHOD = os.getenv("SWIFTVISA_PROJECTION_METHOD", "pca")
+
 
 # ---------------------------------------------------------
 # PROCESS DOCUMENTS → Extract text → Chunk → Embed
@@ -25,7 +30,7 @@ def process_documents():
     Reads all PDFs/TXT files inside Data/pdfs/
     → extracts clean text
     → splits into sentence chunks
-    → embeds with SentenceTransformer
+    → embeds with MiniLM (cached chunks are not re-embedded)
     → returns list of embeddings + saves chunks JSON
     """
     all_embeddings = []
@@ -53,9 +58,10 @@ def process_documents():
         # Sentence-level chunking
         chunks = sentence_chunking(text)
 
-        for chunk in chunks:
-            emb = get_embedding(chunk)
+        # One batched, cache-aware encode per document
+        vectors = get_embeddings(chunks)
 
+        for chunk, emb in zip(chunks, vectors):
             # Save chunk text for retrieval
             chunks_json[str(uid)] = chunk
 
@@ -63,6 +69,8 @@ def process_documents():
                 "unique_id": uid,
                 "chunk_id": uid,
                 "source": file.name,
+                "tokens": count_tokens(chunk),
+                "tokenizer": tokenizer_id(),
                 "embedding": emb
             })
 
@@ -73,6 +81,8 @@ def process_documents():
         json.dump(chunks_json, f, indent=2, ensure_ascii=False)
 
     print(f"✅ Total Chunks Saved: {len(chunks_json)}")
+    stats = embedding_cache.stats()
+    print(f"🗃️ Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['rows']} rows stored")
     return all_embeddings
 
 
@@ -95,6 +105,9 @@ if __name__ == "__main__":
         metadata_path=DATA_DIR / "visa_metadata.json",
         vectors_npy=DATA_DIR / "visa_embeddings.npy",
         ids_npy=DATA_DIR / "visa_ids.npy",
+        model_name=MODEL_NAME,
+        projection_dim=PROJECTION_DIM or None,
+        projection_method=PROJECTION_METHOD,
     )
 
     print(f"\n🎉 Stored {vecs.shape[0]} embeddings.")
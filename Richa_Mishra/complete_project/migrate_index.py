@@ -0,0 +1,222 @@
+# migrate_index.py
+#
+# Zero-downtime re-embedding: builds a new index bundle from the existing chunk store
+# (Data/bundles/<version>/, see utils/bundles.py), validates it and atomically switches the
+# serving pointer. Running apps pick the new version up on their next query; the old bundle
+# stays on disk for rollback.
+#
+#   python migrate_index.py migrate --model sentence-transformers/all-mpnet-base-v2 --detach
+#   python migrate_index.py build --projection-dim 128      # build + validate only
+#   python migrate_index.py switch <version>
+#   python migrate_index.py rollback
+#   python migrate_index.py list
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def _threads_arg(argv) -> str:
+    """Value of --threads in a build/migrate command line (default 1)."""
+    for i, arg in enumerate(argv):
+        if arg.startswith("--threads="):
+            return arg.split("=", 1)[1]
+        if arg == "--threads" and i + 1 < len(argv):
+            return argv[i + 1]
+    return "1"
+
+
+# BLAS/OpenMP pools are sized when numpy loads, so the thread cap must be in the environment
+# before the imports below; lower_priority() can only cap torch after the fact.
+if __name__ == "__main__" and sys.argv[1:2] in (["build"], ["migrate"]):
+    for _var in THREAD_VARS:
+        os.environ[_var] = _threads_arg(sys.argv)
+
+import numpy as np
+
+from utils import bundles
+from utils.embedding_cache import shared_cache, encode_with_cache
+from utils.token_count import count_tokens, tokenizer_id
+
+LOG_DIR = Path("logs")
+
+
+# ---------------------------------------------------------
+# LOW-PRIORITY RESOURCES
+# ---------------------------------------------------------
+def lower_priority(threads: int):
+    """Nice the process and cap torch threads so serving processes keep the CPU."""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass  # Windows: no os.nice; thread cap and throttling still apply
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+# ---------------------------------------------------------
+# BUILD
+# ---------------------------------------------------------
+def load_chunk_store():
+    """Chunk texts + metadata of the serving bundle (or the legacy Data/ files)."""
+    paths = bundles.serving_paths()
+    with open(paths["chunks_path"], "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    with open(paths["metadata_path"], "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    return chunks, metadata
+
+
+def build(model_name=None, backend=None, version=None, projection_dim=None, projection_method="pca",
+          threads=1, batch_size=32, pause=0.05):
+    from utils.encoders import load_encoder, MODEL_NAME
+    from utils.vector_store import build_faiss_index
+
+    model_name = model_name or MODEL_NAME
+    lower_priority(threads)
+    chunks, metadata = load_chunk_store()
+    uids = sorted(chunks, key=int)
+    texts = [chunks[u] for u in uids]
+
+    encoder = load_encoder(backend, model_name)
+    version = version or bundles.new_version_name(encoder.cache_id)
+    final_dir = bundles.bundle_dir(version)
+    if final_dir.exists():
+        raise FileExistsError(f"Bundle {final_dir} already exists")
+    # Build under a hidden name; the directory only appears under its version once complete
+    work_dir = bundles.BUNDLES_DIR / f".building-{version}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+
+    print(f"🔨 Building bundle {version}: {len(texts)} chunks with {encoder.cache_id} "
+          f"({threads} thread(s), batch {batch_size}, pause {pause}s)")
+    cache = shared_cache(encoder.cache_id)
+    t0 = time.perf_counter()
+    parts = []
+    for i in range(0, len(texts), batch_size):
+        parts.append(encode_with_cache(texts[i:i + batch_size], encoder.encode, cache))
+        time.sleep(pause)  # throttle: leave gaps for the serving processes
+    vectors = np.vstack(parts) if parts else np.zeros((0, 0), dtype="float32")
+    print(f"🧠 Encoded in {time.perf_counter() - t0:.1f}s")
+
+    tokenizer = tokenizer_id()
+    embeddings = [
+        {"unique_id": int(u), "chunk_id": metadata.get(u, {}).get("chunk_id", int(u)),
+         "source": metadata.get(u, {}).get("source", "unknown"), "embedding": vec,
+         "tokens": count_tokens(text), "tokenizer": tokenizer}
+        for u, text, vec in zip(uids, texts, vectors)
+    ]
+    build_faiss_index(
+        embeddings,
+        index_path=work_dir / bundles.INDEX_FILE,
+        metadata_path=work_dir / bundles.METADATA_FILE,
+        vectors_npy=work_dir / bundles.VECTORS_FILE,
+        ids_npy=work_dir / bundles.IDS_FILE,
+        model_name=encoder.model_name,
+        projection_dim=projection_dim,
+        projection_method=projection_method,
+        # Serving processes use these to load the matching query encoder
+        manifest_extra={"version": version, "backend": encoder.backend, "cache_id": encoder.cache_id},
+    )
+    with open(work_dir / bundles.CHUNKS_FILE, "w", encoding="utf-8") as f:
+        json.dump(chunks, f, indent=2, ensure_ascii=False)
+
+    os.replace(work_dir, final_dir)
+    print(f"📦 Bundle ready → {final_dir}")
+    return version
+
+
+def validate(version):
+    problems = bundles.validate_bundle(bundles.bundle_dir(version))
+    if problems:
+        print(f"❌ Bundle {version} failed validation:")
+        for p in problems:
+            print(f"   - {p}")
+        return False
+    print(f"✅ Bundle {version} passed validation")
+    return True
+
+
+def switch(version):
+    previous = bundles.current_version()
+    bundles.set_current(version)
+    print(f"🔀 Serving {version} (was {previous or 'legacy Data/ files'})")
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned index bundles: build, validate, switch, rollback")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("build", "migrate"):
+        p = sub.add_parser(name)
+        p.add_argument("--model", help="sentence-transformers model (default all-MiniLM-L6-v2)")
+        p.add_argument("--backend", help="encoder backend (torch / onnx / onnx-int8 / static)")
+        p.add_argument("--version", help="bundle name (default: timestamp + model)")
+        p.add_argument("--projection-dim", type=int)
+        p.add_argument("--projection-method", default="pca")
+        p.add_argument("--threads", type=int, default=1)
+        p.add_argument("--batch-size", type=int, default=32)
+        p.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+        p.add_argument("--detach", action="store_true", help="run in the background, log to logs/")
+
+    sub.add_parser("validate").add_argument("version")
+    sub.add_parser("switch").add_argument("version")
+    sub.add_parser("rollback")
+    sub.add_parser("list")
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "migrate"):
+        if args.detach:
+            LOG_DIR.mkdir(exist_ok=True)
+            log_path = LOG_DIR / f"migrate_{time.strftime('%Y%m%d-%H%M%S')}.log"
+            cmd = [sys.executable, __file__] + [a for a in (argv or sys.argv[1:]) if a != "--detach"]
+            with open(log_path, "w", encoding="utf-8") as log:
+                env = dict(os.environ, **{var: str(args.threads) for var in THREAD_VARS})
+                proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, start_new_session=True, env=env)
+            print(f"🕒 Migration running in background (pid {proc.pid}), log → {log_path}")
+            return 0
+
+        version = build(args.model, args.backend, args.version, args.projection_dim,
+                        args.projection_method, args.threads, args.batch_size, args.pause)
+        if not validate(version):
+            return 1
+        if args.command == "migrate":
+            switch(version)
+        return 0
+
+    if args.command == "validate":
+        return 0 if validate(args.version) else 1
+    if args.command == "switch":
+        if not validate(args.version):
+            return 1
+        switch(args.version)
+        return 0
+    if args.command == "rollback":
+        try:
+            print(f"⏪ Rolled back to {bundles.rollback() or 'the legacy Data/ index'}")
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        return 0
+
+    current = bundles.current_version()
+    for v in bundles.list_versions():
+        print(f"{'*' if v == current else ' '} {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
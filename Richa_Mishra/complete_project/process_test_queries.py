@@ -1,6 +1,10 @@
 import json
 import os
-from rag.pipeline import run_rag
+import time
+import asyncio
+import argparse
+from rag.pipeline import (run_rag, run_rag_async, RETRIEVAL_THREADS, get_response_cache_stats,
+                          get_single_flight_stats)
 from dotenv import load_dotenv
 
 # Load environment variables (API keys, etc.)
@@ -37,5 +41,78 @@ def process_queries(query_file="user_queries.json", output_file="query_results.j
         json.dump(results, f, indent=2, ensure_ascii=False)
     print(f"Finished processing queries. Results saved to {output_file}")
 
+
+async def process_queries_async(query_file="user_queries.json", output_file="query_results.jsonl",
+                                concurrency=4):
+    """
+    Concurrent version of process_queries: up to `concurrency` LLM calls in flight, retrieval
+    for the next queries overlapping them. Each result is appended to `output_file` (JSONL, with
+    the query's position as "index") as soon as it completes, so lines arrive out of order.
+    """
+    if not os.path.exists(query_file):
+        print(f"Error: Query file '{query_file}' not found.")
+        return
+
+    with open(query_file, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    pending = asyncio.Queue()
+    for i, q_data in enumerate(queries):
+        pending.put_nowait((i, q_data))
+    llm_limit = asyncio.Semaphore(concurrency)
+    done = 0
+    t_start = time.perf_counter()
+
+    print(f"Processing {len(queries)} queries with {concurrency} concurrent LLM calls...")
+    with open(output_file, "w", encoding="utf-8") as out:
+
+        async def worker():
+            nonlocal done
+            while not pending.empty():
+                i, q_data = pending.get_nowait()
+                query = q_data["query"]
+                user_profile = q_data.get("user_profile", {})
+                t0 = time.perf_counter()
+                try:
+                    result = await run_rag_async(query, llm_limit=llm_limit)
+                except Exception as e:
+                    print(f"Error processing query '{query}': {e}")
+                    result = {"error": str(e)}
+                record = {"index": i, "query": query, "user_profile": user_profile, "response": result}
+                # Only the event loop thread writes, so lines never interleave
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                done += 1
+                print(f"[{done}/{len(queries)}] #{i+1} done in {time.perf_counter() - t0:.1f}s: {query}")
+
+        # A few workers beyond the LLM limit keep retrieval running ahead of the LLM calls
+        await asyncio.gather(*(worker() for _ in range(concurrency + RETRIEVAL_THREADS)))
+
+    elapsed = time.perf_counter() - t_start
+    print(f"Finished {len(queries)} queries in {elapsed:.1f}s "
+          f"({len(queries) / elapsed if elapsed else 0:.2f} queries/s). Results saved to {output_file}")
+
+
 if __name__ == "__main__":
-    process_queries()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run every query in a JSON file through the RAG pipeline")
+    parser.add_argument("--queries", default="user_queries.json")
+    parser.add_argument("--output", help="default query_results.jsonl (query_results.json with --concurrency 0)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="max in-flight LLM calls; 0 = the original sequential run with one JSON file")
+    args = parser.parse_args()
+
+    if args.concurrency <= 0:
+        process_queries(args.queries, args.output or "query_results.json")
+    else:
+        asyncio.run(process_queries_async(args.queries, args.output or "query_results.jsonl",
+                                          args.concurrency))
+
+    cache = get_response_cache_stats()
+    if cache:
+        print(f"Response cache: {cache['hits']} hits / {cache['misses']} misses "
+              f"({100 * cache['hit_ratio']:.0f}%), {cache['saved_ms'] / 1000:.1f}s of generation saved, "
+              f"{cache['entries']} entries / {cache['bytes'] / 1024:.0f} KiB on disk")
+    flights = get_single_flight_stats()
+    if flights["coalesced"]:
+        print(f"Coalesced: {flights['coalesced']} queries shared an identical in-flight query "
+              f"({flights['executions']} executions)")
@@ -1,5 +1,5 @@
 import json
-from rag.pipeline import run_rag
+from rag.pipeline import stream_rag
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -44,6 +44,35 @@ def format_llm_response(parsed: dict) -> str:
     return "\n".join(lines)
 
 
+# Labels for the fields of the JSON answer, printed as soon as each one can be read
+LIVE_LABELS = {
+    "eligibility_status": "Eligibility Status",
+    "confidence": "Confidence Score",
+    "reason": "Reason for Decision",
+    "future_steps": "Actions to Improve",
+}
+
+
+def print_live_field(event: dict, started: set):
+    """Prints a field / field_delta event from stream_rag: strings grow in place, others print whole."""
+    name = event["name"]
+    if name not in LIVE_LABELS:
+        return
+    if event["type"] == "field_delta":
+        if name not in started:
+            started.add(name)
+            print(f"**{LIVE_LABELS[name]}:** ", end="")
+        print(event["text"], end="", flush=True)
+    elif name in started:
+        print()  # the string was printed by its deltas
+    else:
+        started.add(name)
+        value = event["value"]
+        if isinstance(value, list):
+            value = "\n    - " + "\n    - ".join(str(v) for v in value) if value else "None"
+        print(f"**{LIVE_LABELS[name]}:** {value}", flush=True)
+
+
 def main():
     print("SwiftVisa — RAG + Gemini query CLI (Stateless, fallback-safe)\n")
 
@@ -53,13 +82,21 @@ def main():
             break
         q_clean = " ".join(q.split())
 
-        # --- Run the RAG pipeline ---
-        result = run_rag(q_clean, top_k=TOP_K_DISPLAY)
+        # --- Run the RAG pipeline, printing each answer field as soon as it is generated ---
+        result, shown = {}, set()
+        for event in stream_rag(q_clean, top_k=TOP_K_DISPLAY):
+            if event["type"] == "retrieval":
+                print(f"\n--- 🗣️ SwiftVisa Assistant (retrieved {len(event['retrieved'])} chunks "
+                      f"in {event['retrieval_ms']:.0f} ms) ---")
+            elif event["type"] in ("field", "field_delta"):
+                print_live_field(event, shown)
+            elif event["type"] == "final":
+                result = event["answer"]
         parsed = result.get("parsed", {})
 
-        # --- Display structured answer ---
-        print("\n--- 🗣️ SwiftVisa Assistant ---")
-        print(format_llm_response(parsed))
+        # --- Not a JSON answer (plain text, error): display it as parsed ---
+        if not shown:
+            print(format_llm_response(parsed))
 
         # --- Display top relevant chunks ---
         print("\n--- 📑 RELEVANT CHUNK UIDs ---")
@@ -72,6 +109,10 @@ def main():
 
         # --- Display final blended confidence ---
         print(f"\n**Final blended confidence (retrieval+LLM):** {result.get('final_confidence', 0.0):.3f}")
+        timing = result.get("timing", {})
+        if timing.get("ttft_ms") is not None:
+            decision = f", decision after {timing['decision_ms']:.0f} ms" if timing.get("decision_ms") else ""
+            print(f"First token after {timing['ttft_ms']:.0f} ms{decision}, full answer after {timing['total_ms']:.0f} ms")
         print("-----------------------------------")
 
     print("Goodbye.")
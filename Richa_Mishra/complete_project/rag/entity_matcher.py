@@ -0,0 +1,158 @@
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Optional, Set
+
+# ---------------------------------------------------------
+# GAZETTEER: category -> canonical term -> surface forms
+# Surface forms written in upper case ("US") only match that exact casing,
+# so the pronoun "us" in "help us" is not read as a country.
+# ---------------------------------------------------------
+GAZETTEER: Dict[str, Dict[str, List[str]]] = {
+    "country": {
+        "us": ["US", "usa", "u.s.", "u.s.a.", "united states", "united states of america",
+               "america", "american"],
+        "uk": ["uk", "u.k.", "united kingdom", "britain", "great britain", "british", "england"],
+        "canada": ["canada", "canadian"],
+        "ireland": ["ireland", "irish"],
+        "schengen": ["schengen", "europe", "european union", "eu", "france", "germany", "italy",
+                     "spain", "netherlands", "switzerland"],
+        "india": ["india", "indian"],
+    },
+    "visa_type": {
+        "f1": ["f1", "f-1", "f‑1", "f1 visa", "student visa"],
+        "b1/b2": ["b1/b2", "b-1/b-2", "b1", "b2", "b-1", "b-2", "visitor visa", "tourist visa"],
+        "h1b": ["h1b", "h-1b", "h1-b"],
+        "schengen_c": ["schengen c", "type c", "c visa", "short-stay visa", "short stay visa"],
+        "study_permit": ["study permit"],
+        "skilled_worker": ["skilled worker", "skilled worker visa"],
+        "spouse": ["spouse visa", "partner visa"],
+    },
+    "financial": {kw: [kw] for kw in [
+        "salary", "income", "annual", "eur", "€", "usd", "rupee", "dollar", "pound",
+        "tuition", "fees", "funds", "bank", "savings", "scholarship", "loan", "financial"
+    ]},
+    "sponsorship": {kw: [kw] for kw in [
+        "sponsor", "sponsorship", "company", "employer", "job offer", "offer", "parents", "guardian", "host"
+    ]},
+    "study": {kw: [kw] for kw in [
+        "visa", "f1", "f‑1", "study permit", "acceptance letter", "admission", "program", "university",
+        "college", "school"
+    ]},
+}
+
+# Categories whose canonical terms feed the retriever's keyword score
+KEYWORD_CATEGORIES = ("financial", "sponsorship", "study")
+
+
+@dataclass(frozen=True)
+class EntityMatch:
+    category: str
+    canonical: str
+    start: int
+    end: int
+    text: str
+
+
+class EntityMatcher:
+    """
+    Aho-Corasick automaton compiled once from a gazetteer.
+    `find` walks the text a single time and reports every gazetteer hit that sits on
+    word boundaries (so "us" never fires inside "business" or "status").
+    """
+
+    def __init__(self, gazetteer: Dict[str, Dict[str, List[str]]] = None):
+        gazetteer = gazetteer if gazetteer is not None else GAZETTEER
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # node -> [(pattern_length, category, canonical, case_sensitive_form or None)]
+        self._out: List[List[tuple]] = [[]]
+
+        for category, terms in gazetteer.items():
+            for canonical, forms in terms.items():
+                for form in forms:
+                    self._add(form, category, canonical)
+        self._build_failure_links()
+
+    def _add(self, form: str, category: str, canonical: str):
+        node = 0
+        for ch in form.lower():
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        exact = form if form.isupper() else None
+        self._out[node].append((len(form), category, canonical, exact))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    @staticmethod
+    def _on_boundary(text: str, start: int, end: int) -> bool:
+        # Only enforce a boundary on sides where the pattern itself ends in a word character
+        if text[start].isalnum() and start > 0 and text[start - 1].isalnum():
+            return False
+        if text[end - 1].isalnum() and end < len(text) and text[end].isalnum():
+            return False
+        return True
+
+    def find(self, text: str, categories: Optional[Set[str]] = None) -> List[EntityMatch]:
+        """Returns all boundary-respecting matches in order of their end position."""
+        matches = []
+        if not text:
+            return matches
+        lowered = text.lower()
+        # str.lower() can change length for a few exotic characters; fall back to the original then
+        if len(lowered) != len(text):
+            lowered = text
+
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, category, canonical, exact in self._out[node]:
+                if categories is not None and category not in categories:
+                    continue
+                start, end = i + 1 - length, i + 1
+                if exact is not None and text[start:end] != exact:
+                    continue
+                if self._on_boundary(text, start, end):
+                    matches.append(EntityMatch(category, canonical, start, end, text[start:end]))
+        return matches
+
+    def terms(self, text: str, categories=None) -> Set[str]:
+        """Set of canonical terms found in `text` (optionally restricted to some categories)."""
+        cats = set(categories) if categories is not None else None
+        return {m.canonical for m in self.find(text, cats)}
+
+    def countries(self, text: str) -> List[str]:
+        """Countries mentioned in `text`, in order of first mention."""
+        seen = []
+        for m in self.find(text, {"country"}):
+            if m.canonical not in seen:
+                seen.append(m.canonical)
+        return seen
+
+    def detect_country(self, text: str) -> Optional[str]:
+        found = self.countries(text)
+        return found[0] if found else None
+
+
+@lru_cache(maxsize=1)
+def default_matcher() -> EntityMatcher:
+    """Process-wide matcher compiled from GAZETTEER on first use."""
+    return EntityMatcher(GAZETTEER)
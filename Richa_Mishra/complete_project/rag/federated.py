@@ -0,0 +1,219 @@
+import json
+import os
+import pickle
+import time
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional
+
+import faiss
+import numpy as np
+
+from utils.projection import load_projection
+
+# rag/ -> complete_project/ -> Richa_Mishra/ -> repository root
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+@dataclass
+class Corpus:
+    """
+    One independently built index and everything needed to query it.
+    `metric` is "ip" (inner product on normalized vectors) or "l2" (squared L2, as
+    returned by IndexFlatL2). `load_texts` returns the chunk mapping as a list of
+    {"text", "source", ...} dicts aligned with the index ids.
+    """
+    name: str
+    index_path: Path
+    model_name: str
+    metric: str
+    load_texts: Callable[[], List[Dict[str, Any]]]
+    index: Any = None
+    texts: List[Dict[str, Any]] = field(default_factory=list)
+    projection: Any = None
+
+    def load(self):
+        if self.index is None:
+            self.index = faiss.read_index(str(self.index_path))
+            self.projection = load_projection(self.index_path)
+            self.texts = self.load_texts()
+
+
+def to_similarity(raw: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Maps raw FAISS scores onto a common cosine scale.
+    All team corpora store unit-length vectors (the MiniLM/mpnet sentence-transformers
+    models end in a Normalize layer, or the builder normalized explicitly), so for squared
+    L2 distances cos = 1 - d / 2.
+    """
+    raw = np.asarray(raw, dtype="float32")
+    if metric == "l2":
+        return 1.0 - raw / 2.0
+    return raw
+
+
+class FederatedRetriever:
+    """
+    Searches several corpora concurrently and merges their results.
+
+    Query encoding runs once per distinct model (in parallel), then every corpus is
+    searched on the thread pool. FAISS and torch release the GIL, so total latency stays
+    close to the slowest single search rather than the sum.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.corpora: Dict[str, Corpus] = {}
+        self._encoders: Dict[str, Any] = {}
+        self._encoder_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="federated")
+        self.last_timings: Dict[str, float] = {}
+
+    def register(self, corpus: Corpus, encoder: Any = None):
+        """Adds a corpus. `encoder` (anything with .encode) overrides loading corpus.model_name."""
+        corpus.load()
+        self.corpora[corpus.name] = corpus
+        if encoder is not None:
+            self._encoders[corpus.model_name] = encoder
+
+    def _encoder(self, model_name: str):
+        with self._encoder_lock:
+            enc = self._encoders.get(model_name)
+            if enc is None:
+                from sentence_transformers import SentenceTransformer
+                enc = SentenceTransformer(model_name)
+                self._encoders[model_name] = enc
+            return enc
+
+    def _encode(self, model_name: str, query: str) -> np.ndarray:
+        qv = self._encoder(model_name).encode([query], convert_to_numpy=True).astype("float32")
+        faiss.normalize_L2(qv)
+        return qv
+
+    def _search_one(self, corpus: Corpus, qv: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        t0 = time.perf_counter()
+        if corpus.projection is not None:
+            qv = corpus.projection.apply(qv)
+        raw, ids = corpus.index.search(qv, top_k)
+        sims = to_similarity(raw[0], corpus.metric)
+        hits = []
+        for sim, rid, score in zip(sims, ids[0], raw[0]):
+            if int(rid) < 0:
+                continue
+            entry = corpus.texts[int(rid)] if int(rid) < len(corpus.texts) else {}
+            hits.append({
+                "uid": f"{corpus.name}:{int(rid)}",
+                "corpus": corpus.name,
+                "score": float(sim),
+                "raw_score": float(score),
+                "meta": {"source": entry.get("source", "unknown"), "chunk_id": int(rid)},
+                "text": entry.get("text", ""),
+            })
+        self.last_timings[corpus.name] = time.perf_counter() - t0
+        return hits
+
+    def search(self, query: str, top_k: int = 5, per_corpus_k: int = None,
+               fusion: str = "score") -> List[Dict[str, Any]]:
+        """
+        Federated top_k. `fusion="score"` merges on the normalized cosine scores;
+        `fusion="rrf"` uses reciprocal-rank fusion, which ignores score scale differences
+        between models (MiniLM vs mpnet) altogether.
+        """
+        per_corpus_k = per_corpus_k or top_k
+        corpora = list(self.corpora.values())
+        t0 = time.perf_counter()
+
+        models = sorted({c.model_name for c in corpora})
+        encoded = dict(zip(models, self._pool.map(lambda m: self._encode(m, query), models)))
+        t_encode = time.perf_counter() - t0
+
+        per_corpus = list(self._pool.map(
+            lambda c: self._search_one(c, encoded[c.model_name], per_corpus_k), corpora))
+
+        merged = [hit for hits in per_corpus for hit in hits]
+        if fusion == "rrf":
+            for hits in per_corpus:
+                for rank, hit in enumerate(hits):
+                    hit["score"] = 1.0 / (60 + rank + 1)
+        merged.sort(key=lambda h: h["score"], reverse=True)
+
+        self.last_timings["encode"] = t_encode
+        self.last_timings["total"] = time.perf_counter() - t0
+        return merged[:top_k]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+
+# ---------------------------------------------------------
+# CHUNK MAPPINGS OF THE TEAM'S EXISTING ARTIFACTS
+# ---------------------------------------------------------
+def _richa_texts() -> List[Dict[str, Any]]:
+    data = REPO_ROOT / "Richa_Mishra" / "complete_project" / "Data"
+    with open(data / "visa_chunks.json", "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    with open(data / "visa_metadata.json", "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    size = max((int(k) for k in chunks), default=-1) + 1
+    texts = [{} for _ in range(size)]
+    for k, text in chunks.items():
+        texts[int(k)] = {"text": text, "source": metadata.get(k, {}).get("source", "unknown")}
+    return texts
+
+
+def _milestone1_texts() -> List[Dict[str, Any]]:
+    with open(REPO_ROOT / "milestone1" / "models" / "chunks.pkl", "rb") as f:
+        return [{"text": c.get("text", ""), "source": c.get("source", "unknown")} for c in pickle.load(f)]
+
+
+def _aditi_texts() -> List[Dict[str, Any]]:
+    with open(REPO_ROOT / "AditiGaikwad_Milestone1" / "index" / "metadata.pkl", "rb") as f:
+        meta = pickle.load(f)
+    return [{"text": c.get("text", ""), "source": c.get("doc_id", "unknown")} for c in meta["chunks"]]
+
+
+def _dhanalaxmi_texts() -> List[Dict[str, Any]]:
+    # Same (sorted file name) mapping Dhanalaxmi_Milestone2/retrieval.py uses
+    folder = REPO_ROOT / "Dhanalaxmi_Milestone2" / "Chunks"
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".txt"))
+    return [{"text": (folder / f).read_text(encoding="utf-8", errors="ignore"), "source": f} for f in files]
+
+
+def _ushasree_texts() -> List[Dict[str, Any]]:
+    # The mpnet index was saved without its chunks; rebuild them with the builder's own code
+    root = REPO_ROOT / "ushasree_milestone_1"
+    spec = importlib.util.spec_from_file_location("ushasree_main", root / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.INPUT_DIR = str(root / "Data")
+    return [{"text": c, "source": "ushasree_milestone_1"} for c in module.load_and_process_documents()]
+
+
+def team_corpora() -> List[Corpus]:
+    return [
+        Corpus("richa", REPO_ROOT / "Richa_Mishra" / "complete_project" / "Data" / "visa_embeddings.index",
+               "sentence-transformers/all-MiniLM-L6-v2", "ip", _richa_texts),
+        Corpus("milestone1", REPO_ROOT / "milestone1" / "models" / "faiss.index",
+               "sentence-transformers/all-MiniLM-L6-v2", "l2", _milestone1_texts),
+        Corpus("aditi", REPO_ROOT / "AditiGaikwad_Milestone1" / "index" / "faiss_index.bin",
+               "sentence-transformers/all-MiniLM-L6-v2", "ip", _aditi_texts),
+        Corpus("dhanalaxmi", REPO_ROOT / "Dhanalaxmi_Milestone2" / "visa_index.faiss",
+               "sentence-transformers/all-MiniLM-L6-v2", "l2", _dhanalaxmi_texts),
+        Corpus("ushasree", REPO_ROOT / "ushasree_milestone_1" / "faiss_index.bin",
+               "sentence-transformers/all-mpnet-base-v2", "ip", _ushasree_texts),
+    ]
+
+
+def build_team_retriever(names: Optional[List[str]] = None, max_workers: int = 8) -> FederatedRetriever:
+    """FederatedRetriever over the team's artifacts; corpora that fail to load are skipped."""
+    fed = FederatedRetriever(max_workers=max_workers)
+    for corpus in team_corpora():
+        if names and corpus.name not in names:
+            continue
+        try:
+            fed.register(corpus)
+        except Exception as e:
+            print(f"[federated] Skipping corpus '{corpus.name}': {e}")
+    return fed
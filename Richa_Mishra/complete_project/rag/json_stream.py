@@ -0,0 +1,137 @@
+# rag/json_stream.py
+#
+# Incremental reader for the JSON object the decision prompt asks for (see prompt_builder.py).
+# Fed the answer piece by piece as it streams in, it reports each top-level field the moment
+# its value closes, so "eligibility_status" and "confidence" are known while "reason" and
+# "future_steps" are still being generated. Top-level string values are also reported as they
+# grow, for live display. Text before the opening brace (```json fences, preambles) is skipped.
+#
+#   parser = JSONFieldStream()
+#   for piece in stream:
+#       for kind, name, value in parser.feed(piece):
+#           ...   # ("delta", "reason", "new text") or ("field", "confidence", 0.8)
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# The fields a yes/no screening needs (rag.pipeline.stream_rag(decision_only=True))
+DECISION_FIELDS = ("eligibility_status", "confidence")
+
+Event = Tuple[str, str, Any]
+
+
+class JSONFieldStream:
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0               # next character to scan
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = "start"       # start -> key -> colon -> value -> after -> key ... -> done
+        self.key: Optional[str] = None
+        self.key_start = 0
+        self.value_start: Optional[int] = None
+        self.string_value = False  # current top-level value is a string
+        self.sent = 0              # characters of that string already reported as deltas
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        """The top-level object has closed."""
+        return self.state == "done"
+
+    def has(self, *names: str) -> bool:
+        return all(n in self.fields for n in names)
+
+    def feed(self, text: str) -> List[Event]:
+        """Scans the new text; returns ("delta", name, text) and ("field", name, value) events."""
+        events: List[Event] = []
+        if self.done:
+            return events
+        self.buf += text
+        buf = self.buf
+        i = self.pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if self.state == "start":
+                if c == "{":
+                    self.depth, self.state = 1, "key"
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key":
+                        self.key = self._loads(buf[self.key_start:i + 1])
+                        self.state = "colon"
+                    elif self.depth == 1 and self.state == "value":
+                        self._complete(buf[self.value_start:i + 1], events)
+            elif c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.state == "key":
+                    self.key_start = i
+                elif self.depth == 1 and self.state == "value" and self.value_start is None:
+                    self.value_start, self.string_value, self.sent = i, True, 0
+            elif c == ":" and self.depth == 1 and self.state == "colon":
+                self.state, self.value_start, self.string_value = "value", None, False
+            elif c in "{[":
+                if self.depth == 1 and self.state == "value" and self.value_start is None:
+                    self.value_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 1 and self.state == "value":
+                    self._complete(buf[self.value_start:i + 1], events)
+                elif self.depth == 0:
+                    if self.state == "value" and self.value_start is not None:
+                        self._complete(buf[self.value_start:i], events)   # number / true / false / null
+                    self.state = "done"
+            elif c == "," and self.depth == 1:
+                if self.state == "value" and self.value_start is not None:
+                    self._complete(buf[self.value_start:i], events)
+                self.state = "key"
+            elif not c.isspace() and self.depth == 1 and self.state == "value" and self.value_start is None:
+                self.value_start = i
+            i += 1
+        self.pos = i
+
+        if self.in_string and self.string_value and self.depth == 1 and self.state == "value":
+            partial = self._partial_string(buf[self.value_start + 1:i])
+            if len(partial) > self.sent:
+                events.append(("delta", self.key, partial[self.sent:]))
+                self.sent = len(partial)
+        return events
+
+    def _complete(self, raw: str, events: List[Event]):
+        value = self._loads(raw.strip())
+        if self.string_value and isinstance(value, str) and len(value) > self.sent:
+            events.append(("delta", self.key, value[self.sent:]))
+        self.fields[self.key] = value
+        events.append(("field", self.key, value))
+        self.state, self.value_start, self.string_value = "after", None, False
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw   # malformed value (e.g. an unquoted word): keep the text
+
+    @staticmethod
+    def _partial_string(raw: str) -> str:
+        """Decodes an unterminated JSON string body, dropping a trailing incomplete escape."""
+        for cut in range(min(len(raw), 6) + 1):
+            try:
+                return json.loads('"' + raw[:len(raw) - cut] + '"')
+            except ValueError:
+                continue
+        return ""
+
+
+def parse_partial(text: str) -> Dict[str, Any]:
+    """Top-level fields whose values closed in `text`, e.g. an answer cut off by max_output_tokens."""
+    parser = JSONFieldStream()
+    parser.feed(text or "")
+    return parser.fields
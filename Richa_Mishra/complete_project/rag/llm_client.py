@@ -1,18 +1,79 @@
 import os
+import time
+import threading
 import traceback
+from functools import lru_cache
 from dotenv import load_dotenv
-import google.generativeai as genai
-from typing import Any, Optional
+from typing import Any, Dict, Iterator, Optional
 import re
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("GEMINI_API_KEY not set in environment (.env).")
-genai.configure(api_key=GEMINI_API_KEY)
+from .rate_limiter import (get_scheduler, estimate_tokens, classify_error, CircuitOpenError,
+                           QUOTA, SAFETY, FATAL)
 
 DEFAULT_MODEL = "models/gemini-2.5-flash"
 
+# The SDK is imported and configured on the first call, so retrieval-only use
+# (reports, Test_Debug scripts, a missing key) never pays for it or fails on it.
+GEMINI_API_KEY: Optional[str] = None
+_genai = None
+_init_lock = threading.Lock()
+
+# Timing of the most recent call in this thread, see get_last_call_timing()
+_timing = threading.local()
+_totals = {"calls": 0, "total_ms": 0.0, "request_ms": 0.0}
+_totals_lock = threading.Lock()
+
+# Worker threads for the LLM router's blocking calls (rag/llm_router.py). The SDK call blocks on
+# network I/O, so these threads mostly wait; callers cap how many are busy at once
+# (see rag.pipeline.run_rag_async).
+LLM_THREADS = int(os.getenv("SWIFTVISA_LLM_THREADS", "32"))
+
+
+def _client():
+    """Imports and configures google.generativeai once per process; None when no key is set."""
+    global _genai, GEMINI_API_KEY
+    if _genai is None:
+        with _init_lock:
+            if _genai is None:
+                load_dotenv()
+                GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+                if not GEMINI_API_KEY:
+                    return None
+                import google.generativeai as genai
+                # REST transport: one pooled keep-alive HTTP session reused by every model handle
+                genai.configure(api_key=GEMINI_API_KEY, transport="rest")
+                _genai = genai
+    return _genai
+
+
+@lru_cache(maxsize=32)
+def _model_handle(model_name: str, max_output_tokens: int, temperature: float):
+    """One GenerativeModel per (model, generation config), reused across calls."""
+    return _client().GenerativeModel(
+        model_name,
+        generation_config={"max_output_tokens": max_output_tokens, "temperature": temperature},
+    )
+
+
+def get_last_call_timing() -> Dict[str, Any]:
+    """
+    Breakdown of the last call_gemini in this thread (milliseconds):
+    init (SDK import/configure), handle (model lookup), request (provider round trips),
+    total, and overhead = total - request.
+    """
+    return dict(getattr(_timing, "last", {}))
+
+
+def get_call_stats() -> Dict[str, float]:
+    """Process-wide totals: calls, mean total ms, mean request ms, mean client overhead ms."""
+    with _totals_lock:
+        calls = _totals["calls"]
+        total, request = _totals["total_ms"], _totals["request_ms"]
+    if not calls:
+        return {"calls": 0, "mean_total_ms": 0.0, "mean_request_ms": 0.0, "mean_overhead_ms": 0.0}
+    return {"calls": calls, "mean_total_ms": total / calls, "mean_request_ms": request / calls,
+            "mean_overhead_ms": (total - request) / calls}
+
 
 def _extract_text_from_response(resp: Any) -> str:
     """
@@ -86,66 +147,124 @@ def call_gemini(prompt: str,
                 retry_on_empty: bool = True) -> str:
     """
     Call Gemini and return usable text.
-    On first failure (empty/blocked), optionally retries with a simplified prompt.
+    Requests go through the shared RequestScheduler (rag/rate_limiter.py): rate limits,
+    quota/transient retries with backoff, fail-fast while the model's quota is exhausted.
+    An empty answer is optionally retried once with a simplified prompt; blocks and API errors are not.
     Always returns a non-empty string (error message if needed).
+    Per-call timing is available from get_last_call_timing().
     """
-    if not GEMINI_API_KEY:
+    timing = {"model": model_name, "init_ms": 0.0, "handle_ms": 0.0, "request_ms": 0.0, "attempts": 0}
+    _timing.last = timing
+    t_start = time.perf_counter()
+    try:
+        return _call_gemini(prompt, model_name, max_output_tokens, temperature, retry_on_empty, timing)
+    finally:
+        timing["total_ms"] = 1000 * (time.perf_counter() - t_start)
+        timing["overhead_ms"] = timing["total_ms"] - timing["request_ms"]
+        with _totals_lock:
+            _totals["calls"] += 1
+            _totals["total_ms"] += timing["total_ms"]
+            _totals["request_ms"] += timing["request_ms"]
+
+
+def _call_gemini(prompt: str, model_name: str, max_output_tokens: int, temperature: float,
+                 retry_on_empty: bool, timing: Dict[str, Any]) -> str:
+    t0 = time.perf_counter()
+    genai = _client()
+    timing["init_ms"] = 1000 * (time.perf_counter() - t0)
+    if genai is None:
         return "ERROR: GEMINI_API_KEY not configured."
 
+    t0 = time.perf_counter()
     try:
-        model = genai.GenerativeModel(model_name)
+        model = _model_handle(model_name, int(max_output_tokens), float(temperature))
     except Exception as e:
         return f"ERROR: Failed to initialize Gemini model object: {e}"
+    timing["handle_ms"] = 1000 * (time.perf_counter() - t0)
 
-    def _call_once(p: str) -> (str, Any):
-        """Call model.generate_content and return (extracted_text, raw_response)"""
+    scheduler = get_scheduler()
+
+    def _call_once(p: str) -> (str, str):
+        """
+        One scheduled generate_content (rate-limited, with quota/transient retries inside the
+        scheduler). Returns (text, kind): kind is "ok", "empty", or the error class
+        (quota / transient / safety / fatal).
+        """
+        t_req = time.perf_counter()
+        timing["attempts"] += 1
         try:
-            resp = model.generate_content(
-                p,
-                generation_config={
-                    "max_output_tokens": max_output_tokens,
-                    "temperature": temperature
-                }
-            )
+            resp = scheduler.call(model_name, estimate_tokens(p), lambda: model.generate_content(p))
+        except CircuitOpenError as e:
+            return (f"ERROR: Gemini API call failed: {e}", QUOTA)
         except Exception as e:
-            return (f"ERROR: Gemini API call failed: {e}", None)
+            kind, _ = classify_error(e)
+            return (f"ERROR: Gemini API call failed: {e}", kind)
+        finally:
+            timing["request_ms"] += 1000 * (time.perf_counter() - t_req)
 
-        text = _extract_text_from_response(resp)
-        # Attempt to include prompt_feedback info in message if text is empty
-        if not text:
-            try:
-                pf = getattr(resp, "prompt_feedback", None)
-                if pf:
-                    br = getattr(pf, "block_reason", None)
-                    if br:
-                        brname = getattr(br, "name", str(br))
-                        text = f"ERROR: Model blocked output — reason: {brname}"
-                    else:
-                        text = "ERROR: Model returned prompt_feedback without block_reason."
-            except Exception:
-                pass
-
-        return (text or "", resp)
+        try:
+            text = _extract_text_from_response(resp)
+        except Exception as e:
+            text = f"ERROR: Gemini response could not be read: {e}"
+        if text.startswith("ERROR:"):
+            return (text, SAFETY if classify_error(text)[0] == SAFETY else FATAL)
+        return (text, "ok") if text else ("", "empty")
 
     # first attempt
-    text, raw = _call_once(prompt)
-    if text and not text.startswith("ERROR:"):
+    text, kind = _call_once(prompt)
+    if kind == "ok":
         return text
 
-    # If empty/blocked and retry enabled, try simplified prompt
-    if retry_on_empty:
-        try:
-            simple = _simplify_prompt_for_retry(prompt)
-            text2, raw2 = _call_once(simple)
-            if text2 and not text2.startswith("ERROR:"):
-                return text2
-            # If still empty, return the best error string available
-            if text2:
-                return text2
-        except Exception:
-            pass
+    # Only an empty answer is worth a simplified prompt. Quota and transient errors were already
+    # retried by the scheduler (another request would just add load to an exhausted quota), and
+    # safety blocks are final.
+    if kind == "empty" and retry_on_empty:
+        simple = _simplify_prompt_for_retry(prompt)
+        text2, _ = _call_once(simple)
+        if text2:
+            return text2
 
     # If we reach here, return first non-empty error or a generic message.
     if text:
         return text
-    return "ERROR: Model output filtered or empty."
\ No newline at end of file
+    return "ERROR: Model output filtered or empty."
+
+def stream_gemini(prompt: str,
+                  model_name: str = DEFAULT_MODEL,
+                  max_output_tokens: int = 1024,
+                  temperature: float = 0.0) -> Iterator[str]:
+    """
+    Yields the answer in pieces as Gemini generates it (generate_content(stream=True)).
+    The request itself goes through the same scheduler as call_gemini. Failures raise
+    RuntimeError with an "ERROR: ..." message instead of returning it, because text may
+    already have been yielded; there is no simplified-prompt retry.
+    """
+    genai = _client()
+    if genai is None:
+        raise RuntimeError("ERROR: GEMINI_API_KEY not configured.")
+    model = _model_handle(model_name, int(max_output_tokens), float(temperature))
+    try:
+        chunks = get_scheduler().call(model_name, estimate_tokens(prompt),
+                                      lambda: model.generate_content(prompt, stream=True))
+    except Exception as e:
+        raise RuntimeError(f"ERROR: Gemini API call failed: {e}") from e
+
+    produced = False
+    try:
+        for chunk in chunks:
+            # Not stripped: the whitespace between pieces is part of the answer
+            try:
+                text = chunk.text
+            except Exception:
+                text = _extract_text_from_response(chunk)
+                if text.startswith("ERROR:"):
+                    raise RuntimeError(text)
+            if text:
+                produced = True
+                yield text
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"ERROR: Gemini stream failed: {e}") from e
+    if not produced:
+        raise RuntimeError("ERROR: Model output filtered or empty.")
@@ -0,0 +1,470 @@
+# rag/llm_router.py
+#
+# One generate(prompt, config) interface over every LLM the project talks to:
+#   gemini   rag/llm_client.call_gemini (rate limited, see rag/rate_limiter.py)
+#   groq     OpenAI-compatible chat completions, GROQ_API_KEY
+#   mistral  OpenAI-compatible chat completions, MISTRAL_API_KEY
+#   ollama   local model server, see rag/ollama_client.py
+# The router keeps a rolling window of latency and errors per backend, sends each request to
+# the fastest healthy one (p50) and fails over to the next on errors. With hedging on, a
+# duplicate request goes to the runner-up once the primary is slower than its own p95, and
+# whichever answers first wins (the slower answer is discarded). stream() yields the answer as
+# it is generated; it fails over only until the first piece arrives and is never hedged.
+#
+#   SWIFTVISA_LLM_BACKENDS=gemini,groq,ollama   backends to use, in tie-break order
+#   SWIFTVISA_LLM_HEDGE=1                       enable hedged requests
+
+import os
+import json
+import time
+import asyncio
+import threading
+import http.client
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .llm_client import call_gemini, stream_gemini, DEFAULT_MODEL, LLM_THREADS
+
+
+@dataclass(frozen=True)
+class GenerateConfig:
+    max_output_tokens: int = 1024
+    temperature: float = 0.0
+    timeout: float = 60.0
+
+
+class BackendError(RuntimeError):
+    """A backend call failed; `code` is the HTTP status when there was one."""
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class AllBackendsFailed(RuntimeError):
+    """`errors` is a list of (backend name, error message)."""
+
+    def __init__(self, errors: List[Tuple[str, str]]):
+        # With a single backend its own error is the most useful message
+        super().__init__(errors[0][1] if len(errors) == 1 else
+                         "all LLM backends failed: " + " | ".join(f"{n}: {m}" for n, m in errors))
+        self.errors = errors
+
+
+# ------------------------------------------------------------
+# BACKENDS
+# ------------------------------------------------------------
+class LLMBackend:
+    name = "backend"
+
+    def generate(self, prompt: str, config: GenerateConfig) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, config: GenerateConfig) -> Iterator[str]:
+        """Answer text in pieces as it is generated; backends without streaming yield it whole."""
+        yield self.generate(prompt, config)
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, model: str = DEFAULT_MODEL, name: str = "gemini"):
+        self.name = name
+        self.model = model
+
+    def generate(self, prompt: str, config: GenerateConfig) -> str:
+        text = call_gemini(prompt, model_name=self.model, max_output_tokens=config.max_output_tokens,
+                           temperature=config.temperature)
+        if text.startswith("ERROR:"):
+            raise BackendError(text)
+        return text
+
+    def stream(self, prompt: str, config: GenerateConfig) -> Iterator[str]:
+        try:
+            yield from stream_gemini(prompt, model_name=self.model, max_output_tokens=config.max_output_tokens,
+                                     temperature=config.temperature)
+        except RuntimeError as e:
+            raise BackendError(str(e)) from e
+
+
+class HTTPBackend(LLMBackend):
+    """JSON over one keep-alive connection per thread (same pattern as utils/embedding_client.py)."""
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        parts = urlsplit(base_url.rstrip("/"))
+        self.scheme, self.netloc, self.prefix = parts.scheme, parts.netloc, parts.path
+        self._conn = threading.local()
+
+    def _connection(self, timeout: float) -> http.client.HTTPConnection:
+        conn = getattr(self._conn, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = cls(self.netloc, timeout=timeout)
+            self._conn.conn = conn
+        conn.timeout = timeout
+        if conn.sock is not None:
+            # .timeout only applies when http.client connects; a kept-alive socket keeps the
+            # timeout of the request that opened it unless it is set again
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._conn, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._conn.conn = None
+
+    def _post(self, path: str, body: dict, timeout: float, headers: Optional[dict] = None):
+        data = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        for attempt in range(2):
+            conn = self._connection(timeout)
+            reused = conn.sock is not None
+            try:
+                conn.request("POST", self.prefix + path, body=data, headers=headers)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self._drop_connection()
+                # The server closed an idle keep-alive socket before reading the request:
+                # nothing was processed, so send it once more on a fresh connection
+                if reused and attempt == 0:
+                    continue
+                raise BackendError(f"{self.name}: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection()
+                raise BackendError(f"{self.name}: {e}") from e
+        if resp.status != 200:
+            raw = resp.read()
+            raise BackendError(f"{self.name}: HTTP {resp.status} {raw[:300].decode('utf-8', 'replace')}",
+                               code=resp.status)
+        return resp
+
+    def post_json(self, path: str, body: dict, timeout: float, headers: Optional[dict] = None) -> dict:
+        resp = self._post(path, body, timeout, headers)
+        try:
+            raw = resp.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._drop_connection()
+            raise BackendError(f"{self.name}: {e}") from e
+        return json.loads(raw.decode("utf-8"))
+
+    def post_lines(self, path: str, body: dict, timeout: float, headers: Optional[dict] = None) -> Iterator[bytes]:
+        """
+        Streams the response body line by line (NDJSON / server-sent events) as it arrives.
+        The connection is reused afterwards only if the body was read to the end.
+        """
+        resp = self._post(path, body, timeout, headers)
+        finished = False
+        try:
+            for line in resp:
+                line = line.strip()
+                if line:
+                    yield line
+            finished = True
+        except (OSError, http.client.HTTPException) as e:
+            raise BackendError(f"{self.name}: {e}") from e
+        finally:
+            if not finished:
+                self._drop_connection()   # abandoned mid-stream: the rest of the body is still unread
+
+
+class ChatCompletionsBackend(HTTPBackend):
+    """OpenAI-compatible /chat/completions (Groq, Mistral)."""
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str = ""):
+        super().__init__(name, base_url)
+        self.model = model
+        self.api_key = api_key
+
+    def generate(self, prompt: str, config: GenerateConfig) -> str:
+        data = self.post_json("/chat/completions", {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": config.max_output_tokens,
+            "temperature": config.temperature,
+        }, config.timeout, headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else None)
+        try:
+            text = data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise BackendError(f"{self.name}: unexpected response {str(data)[:200]}")
+        if not text.strip():
+            raise BackendError(f"{self.name}: empty response")
+        return text.strip()
+
+    def stream(self, prompt: str, config: GenerateConfig) -> Iterator[str]:
+        """Server-sent events: one `data: {json}` line per delta, then `data: [DONE]`."""
+        produced = False
+        for line in self.post_lines("/chat/completions", {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": config.max_output_tokens,
+            "temperature": config.temperature,
+            "stream": True,
+        }, config.timeout, headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else None):
+            if not line.startswith(b"data:"):
+                continue                      # comments / keep-alive pings
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                continue                      # read on to the end so the connection is reused
+            try:
+                piece = json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+            except (ValueError, KeyError, IndexError, TypeError):
+                raise BackendError(f"{self.name}: unexpected stream event {data[:200]!r}")
+            if piece:
+                produced = True
+                yield piece
+        if not produced:
+            raise BackendError(f"{self.name}: empty response")
+
+
+# ------------------------------------------------------------
+# ROLLING STATS
+# ------------------------------------------------------------
+class BackendStats:
+    """Last `window` outcomes of one backend: latency percentiles of successes, error rate, health."""
+
+    def __init__(self, window: int = 100, failure_limit: int = 3, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_limit = failure_limit
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.last_failure = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self.lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                self.last_failure = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self.lock:
+            values = list(self.latencies)
+        return float(np.percentile(values, q)) if values else None
+
+    @property
+    def error_rate(self) -> float:
+        with self.lock:
+            return (len(self.outcomes) - sum(self.outcomes)) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        """
+        Unhealthy after `failure_limit` failures in a row, or more than half of the window
+        failing; either way it gets one retry per `cooldown` so a recovered backend comes back.
+        """
+        with self.lock:
+            n = len(self.outcomes)
+            failing = (self.consecutive_failures >= self.failure_limit
+                       or (n >= 10 and (n - sum(self.outcomes)) / n > 0.5))
+            return not failing or time.monotonic() - self.last_failure > self.cooldown
+
+    def summary(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {"samples": len(self.outcomes), "p50_ms": None if p50 is None else 1000 * p50,
+                "p95_ms": None if p95 is None else 1000 * p95, "error_rate": self.error_rate,
+                "healthy": self.healthy}
+
+
+# ------------------------------------------------------------
+# ROUTER
+# ------------------------------------------------------------
+class LLMRouter:
+    def __init__(self, backends: List[LLMBackend], hedge: bool = False,
+                 hedge_delay: Optional[float] = None, default_hedge_delay: float = 2.0, window: int = 100):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend")
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay                  # fixed delay; None = primary's p95
+        self.default_hedge_delay = default_hedge_delay  # until the primary has a p95
+        self.stats: Dict[str, BackendStats] = {b.name: BackendStats(window) for b in self.backends}
+        self._pool = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="llm-router")
+        self._last = threading.local()
+
+    def ranked(self) -> List[LLMBackend]:
+        """Healthy backends by p50 (unmeasured ones first, so they get measured), then unhealthy."""
+        def key(item):
+            position, backend = item
+            stats = self.stats[backend.name]
+            p50 = stats.percentile(50)
+            return (not stats.healthy, 0.0 if p50 is None else p50, position)
+        return [b for _, b in sorted(enumerate(self.backends), key=key)]
+
+    def _hedge_after(self, backend: LLMBackend) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        p95 = self.stats[backend.name].percentile(95)
+        return p95 if p95 is not None and len(self.stats[backend.name].latencies) >= 5 else self.default_hedge_delay
+
+    def _timed(self, backend: LLMBackend, prompt: str, config: GenerateConfig) -> str:
+        t0 = time.perf_counter()
+        try:
+            text = backend.generate(prompt, config)
+        except Exception:
+            self.stats[backend.name].record(time.perf_counter() - t0, ok=False)
+            raise
+        self.stats[backend.name].record(time.perf_counter() - t0, ok=True)
+        return text
+
+    @property
+    def cache_id(self) -> str:
+        """The backends and models answers may come from (part of the response cache key)."""
+        return ",".join(f"{b.name}:{getattr(b, 'model', '')}" for b in self.backends)
+
+    def get_last_route(self) -> dict:
+        """Backend that answered the last generate() in this thread, its latency, hedge/failover info."""
+        return dict(getattr(self._last, "route", {}))
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def generate(self, prompt: str, config: Optional[GenerateConfig] = None) -> str:
+        config = config or GenerateConfig()
+        order = self.ranked()
+        t0 = time.perf_counter()
+        if not self.hedge or len(order) == 1:
+            errors = []
+            for backend in order:
+                try:
+                    text = self._timed(backend, prompt, config)
+                except Exception as e:
+                    errors.append((backend.name, str(e)))
+                    continue
+                self._last.route = {"backend": backend.name, "latency_ms": 1000 * (time.perf_counter() - t0),
+                                    "hedged": False, "failovers": len(errors)}
+                return text
+            raise AllBackendsFailed(errors)
+        return self._generate_hedged(prompt, config, order, t0)
+
+    def _generate_hedged(self, prompt: str, config: GenerateConfig, order: List[LLMBackend], t0: float) -> str:
+        errors, pending, owner = [], set(), {}
+        next_up, hedged = 0, False
+
+        def launch():
+            nonlocal next_up
+            backend = order[next_up]
+            next_up += 1
+            future = self._pool.submit(self._timed, backend, prompt, config)
+            owner[future] = backend
+            pending.add(future)
+
+        launch()
+        while pending:
+            timeout = None
+            if not hedged and next_up < len(order) and len(pending) == 1:
+                timeout = self._hedge_after(owner[next(iter(pending))])
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True      # primary is slower than its p95: race the runner-up
+                launch()
+                continue
+            for future in done:
+                pending.discard(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    errors.append((owner[future].name, str(e)))
+                    continue
+                self._last.route = {"backend": owner[future].name, "latency_ms": 1000 * (time.perf_counter() - t0),
+                                    "hedged": hedged, "failovers": len(errors)}
+                return text
+            if not pending and next_up < len(order):
+                launch()           # everything in flight failed: fail over
+        raise AllBackendsFailed(errors)
+
+    def stream(self, prompt: str, config: Optional[GenerateConfig] = None) -> Iterator[str]:
+        """
+        Answer pieces from the fastest healthy backend. A backend that fails before its first
+        piece is skipped for the next one; after that the text is already with the caller, so
+        a failure is raised. get_last_route() adds ttft_ms (time to first piece) once done.
+        """
+        config = config or GenerateConfig()
+        t0 = time.perf_counter()
+        errors = []
+        for backend in self.ranked():
+            started = time.perf_counter()
+            pieces = backend.stream(prompt, config)
+            try:
+                try:
+                    first = next(pieces)
+                except StopIteration:
+                    raise BackendError(f"{backend.name}: empty response")
+            except Exception as e:
+                self.stats[backend.name].record(time.perf_counter() - started, ok=False)
+                errors.append((backend.name, str(e)))
+                continue
+            ttft = time.perf_counter() - t0
+            try:
+                yield first
+                for piece in pieces:
+                    yield piece
+            except GeneratorExit:
+                pieces.close()        # caller stopped reading: not the backend's failure
+                self._last.route = {"backend": backend.name, "latency_ms": 1000 * (time.perf_counter() - t0),
+                                    "ttft_ms": 1000 * ttft, "hedged": False, "failovers": len(errors),
+                                    "stopped": True}
+                raise
+            except Exception:
+                self.stats[backend.name].record(time.perf_counter() - started, ok=False)
+                raise
+            self.stats[backend.name].record(time.perf_counter() - started, ok=True)
+            self._last.route = {"backend": backend.name, "latency_ms": 1000 * (time.perf_counter() - t0),
+                                "ttft_ms": 1000 * ttft, "hedged": False, "failovers": len(errors)}
+            return
+        raise AllBackendsFailed(errors)
+
+    async def generate_async(self, prompt: str, config: Optional[GenerateConfig] = None) -> str:
+        """
+        generate() for asyncio callers. Not natively async: the backends (Gemini SDK, http.client)
+        block, so each in-flight call still holds one _caller_pool thread (plus a router thread)
+        and concurrency is capped at LLM_THREADS; the event loop itself is never blocked.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_caller_pool, self.generate, prompt, config)
+
+
+# Threads that run generate() for asyncio callers; the router's own pool runs the backend calls
+_caller_pool = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="llm-caller")
+
+
+def backend_from_name(name: str) -> Optional[LLMBackend]:
+    """Backend configured from the environment, or None when its key is missing."""
+    name = name.strip().lower()
+    if name == "gemini":
+        return GeminiBackend(os.getenv("GEMINI_MODEL", DEFAULT_MODEL))
+    if name == "groq":
+        key = os.getenv("GROQ_API_KEY")
+        return key and ChatCompletionsBackend("groq", "https://api.groq.com/openai/v1",
+                                              os.getenv("GROQ_MODEL", "llama-3.1-8b-instant"), key)
+    if name == "mistral":
+        key = os.getenv("MISTRAL_API_KEY")
+        return key and ChatCompletionsBackend("mistral", "https://api.mistral.ai/v1",
+                                              os.getenv("MISTRAL_MODEL", "mistral-small-latest"), key)
+    if name == "ollama":
+        from .ollama_client import OllamaBackend, DEFAULT_HOST as OLLAMA_HOST, DEFAULT_MODEL as OLLAMA_MODEL
+        return OllamaBackend(os.getenv("OLLAMA_MODEL", OLLAMA_MODEL), os.getenv("OLLAMA_HOST", OLLAMA_HOST))
+    raise ValueError(f"Unknown LLM backend '{name}' (use gemini, groq, mistral or ollama)")
+
+
+@lru_cache(maxsize=1)
+def get_router() -> LLMRouter:
+    """Router over SWIFTVISA_LLM_BACKENDS (default: gemini only, i.e. plain call_gemini)."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    names = os.getenv("SWIFTVISA_LLM_BACKENDS", "gemini").split(",")
+    backends = [b for b in (backend_from_name(n) for n in names if n.strip()) if b]
+    if not backends:
+        backends = [GeminiBackend()]
+    return LLMRouter(backends, hedge=os.getenv("SWIFTVISA_LLM_HEDGE", "0") == "1")
@@ -25,6 +25,8 @@ def log_decision(query: str, retrieved: list, answer_json: dict, raw_prompt: str
             "final_confidence": answer_json.get("final_confidence"),
             "raw_prompt": raw_prompt is not None
         }
+        if answer_json.get("timing"):
+            entry["timing"] = answer_json["timing"]
         with open(DECISION_LOG_FILE, "a", encoding="utf-8") as f:
             f.write(json.dumps(entry, ensure_ascii=False) + "\n")
     except Exception as e:
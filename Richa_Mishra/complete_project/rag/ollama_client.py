@@ -0,0 +1,98 @@
+# rag/ollama_client.py
+#
+# Local model backend for the LLM router (SWIFTVISA_LLM_BACKENDS=ollama): with it, and the
+# local query encoder, the whole pipeline runs without a single external call.
+#   - one keep-alive HTTP connection per thread instead of a new connection per question
+#   - tokens are streamed from /api/generate as the model produces them (stream())
+#   - keep_alive keeps the model loaded between questions (Ollama unloads it after 5 minutes
+#     by default, and reloading a 3B model takes seconds); preload() loads it up front
+#   - num_ctx sets the context window: Ollama's default (2048 tokens in many versions) silently
+#     drops the start of longer prompts, which is where the policy extracts are
+#   - format: "json" (any JSON object) or "schema" (the decision object extract_info reads,
+#     enforced by Ollama's structured outputs, 0.5+); "" sends free text
+#
+#   OLLAMA_HOST (http://localhost:11434)   OLLAMA_MODEL (llama3.2)   OLLAMA_KEEP_ALIVE (30m)
+#   OLLAMA_NUM_CTX (4096)                  OLLAMA_FORMAT (json)
+
+import os
+import json
+from typing import Iterator, Optional
+
+from .llm_router import HTTPBackend, BackendError, GenerateConfig
+
+DEFAULT_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+FORMAT = os.getenv("OLLAMA_FORMAT", "json")
+
+# The object rag.pipeline.extract_info expects (see prompt_builder.build_prompt); fields are
+# generated in this order, decision first (see rag/json_stream.py)
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "eligibility_status": {"type": "string",
+                               "enum": ["eligible", "not eligible", "partially eligible"]},
+        "confidence": {"type": "number"},
+        "reason": {"type": "string"},
+        "future_steps": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["eligibility_status", "confidence", "reason", "future_steps"],
+}
+
+
+class OllamaBackend(HTTPBackend):
+    def __init__(self, model: str = DEFAULT_MODEL, host: str = DEFAULT_HOST, name: str = "ollama",
+                 keep_alive: Optional[str] = KEEP_ALIVE, num_ctx: Optional[int] = NUM_CTX,
+                 format: str = FORMAT):
+        super().__init__(name, host)
+        self.model = model
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        if format not in ("", "json", "schema"):
+            raise ValueError(f"Unknown Ollama format '{format}' (use json, schema or an empty string)")
+        self.format = format
+
+    def _body(self, prompt: str, config: GenerateConfig, stream: bool) -> dict:
+        options = {"temperature": config.temperature, "num_predict": config.max_output_tokens}
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        body = {"model": self.model, "prompt": prompt, "stream": stream, "options": options}
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        if self.format == "json":
+            body["format"] = "json"
+        elif self.format == "schema":
+            body["format"] = DECISION_SCHEMA
+        return body
+
+    def generate(self, prompt: str, config: GenerateConfig) -> str:
+        data = self.post_json("/api/generate", self._body(prompt, config, stream=False), config.timeout)
+        if data.get("error"):
+            raise BackendError(f"{self.name}: {data['error']}")
+        text = (data.get("response") or "").strip()
+        if not text:
+            raise BackendError(f"{self.name}: empty response")
+        return text
+
+    def stream(self, prompt: str, config: GenerateConfig) -> Iterator[str]:
+        """Yields response pieces as Ollama sends them (one NDJSON line per token or so)."""
+        produced = False
+        for line in self.post_lines("/api/generate", self._body(prompt, config, stream=True), config.timeout):
+            data = json.loads(line)
+            if data.get("error"):
+                raise BackendError(f"{self.name}: {data['error']}")
+            piece = data.get("response") or ""
+            if piece:
+                produced = True
+                yield piece
+        # The "done" line is the last one; reading to the end keeps the connection reusable
+        if not produced:
+            raise BackendError(f"{self.name}: empty response")
+
+    def preload(self, timeout: float = 300.0):
+        """Loads the model into memory (a request without a prompt) so the first question is fast."""
+        body = {"model": self.model}
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        self.post_json("/api/generate", body, timeout)
@@ -1,41 +1,155 @@
 import json
+import os
 import re
-from typing import List, Dict, Any
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional
 import numpy as np
-# Dependency for 384-dimension embeddings
-from sentence_transformers import SentenceTransformer 
+
+from utils.embedding_cache import shared_cache, encode_with_cache
+from utils.embedding_client import get_shared_encoder
+from utils.encoders import get_encoder
+from utils.bundles import current_version, serving_paths, BundleWatcher
+from utils.projection import read_manifest
 
 from .retriever import Retriever
 from .prompt_builder import build_prompt
-from .llm_client import call_gemini
+from .json_stream import JSONFieldStream, DECISION_FIELDS, parse_partial
+from .llm_router import get_router, GenerateConfig
+from .response_cache import get_response_cache, response_key
+from .semantic_cache import get_semantic_cache
+from .single_flight import get_single_flight, flight_key
 from .logger import log_decision
 
-retriever = Retriever()
-
 # --- Embedding Model Setup (384-dim fix) ---
-# NOTE: Ensure 'sentence-transformers' is installed: pip install sentence-transformers
+# Backend (torch / onnx / onnx-int8 / static) is chosen with SWIFTVISA_ENCODER, see utils/encoders.py.
+# Uses the local embedding server (utils/embedding_server.py) when it is running.
+EMBEDDING_DIM = 384
 try:
-    EMBEDDING_MODEL = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    EMBEDDING_DIM = 384
+    EMBEDDING_MODEL = get_shared_encoder()
 except Exception as e:
-    print(f"CRITICAL ERROR: Failed to load Sentence Transformer model. Retrieval will use zero vectors. Error: {e}")
+    print(f"CRITICAL ERROR: Failed to load the query encoder. Retrieval will use zero vectors. Error: {e}")
     EMBEDDING_MODEL = None
-    EMBEDDING_DIM = 384
 
 
-def get_embedding(text: str) -> List[float]:
+# --- Serving index (versioned bundles, see utils/bundles.py and migrate_index.py) ---
+class ServingSnapshot(NamedTuple):
+    """Immutable (version, retriever, query encoder) triple; replaced as a whole, never mutated."""
+    version: Optional[str]
+    retriever: Retriever
+    encoder: Any
+
+
+def _load_serving(version: Optional[str]) -> ServingSnapshot:
+    """Snapshot for bundle `version`, or the legacy Data/ files when version is None."""
+    paths = serving_paths(version=version)
+    encoder = EMBEDDING_MODEL
+    if version is not None:
+        # A bundle built with another model needs queries encoded by that model
+        manifest = read_manifest(paths["index_path"])
+        if manifest.get("cache_id") and (encoder is None or manifest["cache_id"] != encoder.cache_id):
+            encoder = get_encoder(manifest.get("backend"), manifest.get("model"))
+    else:
+        # The static encoder ships its own re-embedded index; every other backend shares the MiniLM one
+        paths["index_path"] = getattr(encoder, "index_path", paths["index_path"])
+        paths["vectors_path"] = getattr(encoder, "vectors_path", paths["vectors_path"])
+    return ServingSnapshot(version, Retriever(**paths), encoder)
+
+
+_serving = _load_serving(current_version())
+last_reload_seconds = None
+
+
+def _reload(version: Optional[str]):
+    """Runs on the watcher thread: build the new snapshot fully, then publish it in one assignment."""
+    global _serving, last_reload_seconds
+    t0 = time.perf_counter()
+    snapshot = _load_serving(version)
+    old = _serving.version
+    _serving = snapshot  # read-copy-update: in-flight queries keep the snapshot they already hold
+    last_reload_seconds = time.perf_counter() - t0
+    print(f"[pipeline] Index bundle {old} -> {version} loaded in {last_reload_seconds:.2f}s")
+
+
+# SWIFTVISA_RELOAD_INTERVAL=0 turns hot reload off (the bundle is then fixed at import)
+RELOAD_INTERVAL = float(os.getenv("SWIFTVISA_RELOAD_INTERVAL", "2"))
+_watcher = BundleWatcher(_reload, _serving.version, RELOAD_INTERVAL).start() if RELOAD_INTERVAL > 0 else None
+
+
+def get_serving() -> ServingSnapshot:
     """
-    Generates a 384-dimensional embedding using the Sentence Transformer model.
+    The current snapshot. Never blocks: a new bundle is loaded on the watcher thread and only
+    becomes visible here once it is complete. Callers should read it once per query.
     """
-    if EMBEDDING_MODEL is None:
-        return [0.0] * EMBEDDING_DIM 
-        
+    return _serving
+
+
+# --- In-process query-vector LRU (in front of the on-disk embedding cache) ---
+QUERY_CACHE_SIZE = 1024
+_query_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {"hits": 0, "misses": 0}
+
+# Batch files repeat the same question with a "(case N)" suffix
+_CASE_SUFFIX = re.compile(r"\s*\(case\s*\d+\)\s*$", re.IGNORECASE)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case-folded, whitespace-collapsed, "(case N)" suffix removed.
+    MiniLM is uncased, so case folding does not change the embedding."""
+    return _CASE_SUFFIX.sub("", " ".join((text or "").split())).lower()
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    with _query_cache_lock:
+        hits, misses = _query_cache_stats["hits"], _query_cache_stats["misses"]
+        size = len(_query_cache)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "size": size,
+            "hit_ratio": hits / total if total else 0.0}
+
+
+def get_embedding(text: str, encoder=None) -> np.ndarray:
+    """
+    Generates a float32 query embedding with `encoder` (default: the configured MiniLM encoder).
+    Vectors are memoized per (encoder, normalized query) and returned as read-only numpy arrays.
+    """
+    encoder = encoder or EMBEDDING_MODEL
+    if encoder is None:
+        return np.zeros(EMBEDDING_DIM, dtype="float32")
+
+    key = normalize_query(text)
+    lru_key = (encoder.cache_id, key)
+    with _query_cache_lock:
+        cached = _query_cache.get(lru_key)
+        if cached is not None:
+            _query_cache.move_to_end(lru_key)
+            _query_cache_stats["hits"] += 1
+            return cached
+        _query_cache_stats["misses"] += 1
+
     try:
-        embedding = EMBEDDING_MODEL.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        # Same on-disk cache as ingestion (utils/embedding.py): repeated queries skip the encoder
+        embedding = encode_with_cache(
+            [key],
+            encoder.encode,
+            shared_cache(encoder.cache_id),
+        )[0]
     except Exception as e:
-        print(f"ERROR: Sentence Transformer encoding failed: {e}. Using zero vector fallback.")
-        return [0.0] * EMBEDDING_DIM
+        print(f"ERROR: Query encoding failed: {e}. Using zero vector fallback.")
+        return np.zeros(EMBEDDING_DIM, dtype="float32")
+
+    embedding = np.ascontiguousarray(embedding, dtype="float32")
+    embedding.setflags(write=False)
+    with _query_cache_lock:
+        _query_cache[lru_key] = embedding
+        _query_cache.move_to_end(lru_key)
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return embedding
 
 
 def compute_confidence_from_scores(scores: List[float]) -> float:
@@ -77,7 +191,12 @@ def extract_info(text: str) -> Dict[str, Any]:
         elif cleaned_text.startswith("```") and cleaned_text.endswith("```"):
             cleaned_text = cleaned_text[len("```"): -len("```")].strip()
         
-        parsed = json.loads(cleaned_text)
+        try:
+            parsed = json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            # Cut off (max_output_tokens) or followed by extra text: keep the fields that closed
+            fields = parse_partial(cleaned_text)
+            parsed = fields if "eligibility_status" in fields else None
         
         if isinstance(parsed, dict):
             # Map LLM output keys to result structure
@@ -126,25 +245,133 @@ def extract_info(text: str) -> Dict[str, Any]:
     return result
 
 
-def run_rag(query: str, top_k: int = 5) -> Dict[str, Any]:
+# Prompt context budget in tokens (rag/prompt_builder.pack_context); 0 = the old 3000-char cut.
+# Off by default: retrieved chunks rarely fit a small budget whole, so packing encodes every
+# sentence of the top-k chunks (~100 per uncached query) on the request path. Turn it on once
+# Test_Debug/context_packer_report.py --llm has been run against the serving encoder.
+CONTEXT_TOKENS = int(os.getenv("SWIFTVISA_CONTEXT_TOKENS", "0"))
+
+
+def _sentence_encoder(encoder):
+    """Batch encoder for the packer's sentence scoring, through the shared on-disk cache."""
+    if encoder is None:
+        return None
+    return lambda texts: encode_with_cache(texts, encoder.encode, shared_cache(encoder.cache_id))
+
+
+class PreparedQuery(NamedTuple):
+    """Everything before the LLM call: corpus id (cache scope), chunks, prompt, query vector."""
+    corpus: str
+    retrieved: List[Dict[str, Any]]
+    prompt: str
+    embedding: np.ndarray
+
+
+def _retrieve_and_prompt(query: str, top_k: int, route_docs: Optional[int],
+                         mmr_lambda: Optional[float]) -> PreparedQuery:
+    """Embedding, retrieval and prompt building: the CPU-bound half of a query."""
+    version, retriever, encoder = get_serving()
+    query_embedding = get_embedding(query, encoder)
+    retrieved = retriever.retrieve(query, top_k=top_k, query_embedding=query_embedding,
+                                   route_docs=route_docs, mmr_lambda=mmr_lambda)
+    # "(case N)" labels from generated batch files are not part of the question; without them
+    # the repeats build the same prompt and are answered from the response cache
+    prompt = build_prompt(_CASE_SUFFIX.sub("", query), retrieved, max_chars=3000, mode="decision",
+                          max_tokens=CONTEXT_TOKENS, query_embedding=query_embedding,
+                          embed=_sentence_encoder(encoder) if CONTEXT_TOKENS else None)
+    return PreparedQuery(_corpus_id(version), retrieved, prompt, query_embedding)
+
+
+# --- Response caches (rag/response_cache.py, rag/semantic_cache.py) ---
+def _corpus_id(version: Optional[str]) -> str:
+    """The bundle version, or for the legacy Data/ files their size and mtime (rebuilt in place)."""
+    if version is not None:
+        return version
+    paths = serving_paths(version=None)
+    parts = []
+    for name in ("index_path", "chunks_path"):
+        try:
+            st = paths[name].stat()
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append("missing")
+    return "legacy:" + ",".join(parts)
+
+
+def _chunk_ids(retrieved: List[Dict[str, Any]]) -> List[Any]:
+    return [r.get("uid") for r in retrieved or []]
+
+
+def _cache_lookup(query: str, prep: PreparedQuery):
     """
-    Fully stateless RAG pipeline for SwiftVisa.
+    (key, cached answer or None, hit info or None): the exact-match cache first, then the
+    semantic one. The key is None when the exact-match cache is off or failing.
     """
-    query_embedding = get_embedding(query)
-    retrieved = retriever.retrieve(query, top_k=top_k, query_embedding=query_embedding)
-    scores = [r.get("score", 0.0) for r in retrieved] if retrieved else []
-    
-    # Check if retrieval confidence is too low to bother LLM
-    retrieval_conf = compute_confidence_from_scores(scores)
-    # The current threshold for model output filter is 0.514, keep confidence high
-    
-    prompt = build_prompt(query, retrieved, max_chars=3000, mode="decision")
-
+    key = None
     try:
-        raw_resp = call_gemini(prompt)
+        cache = get_response_cache()
+        if cache is not None:
+            key = response_key(prep.prompt, get_router().cache_id, GenerateConfig(), prep.corpus)
+            answer = cache.get(key)
+            if answer is not None:
+                return key, answer, {"kind": "exact"}
     except Exception as e:
-        raw_resp = f"ERROR: LLM call failed outside of client wrapper: {e}"
+        print(f"[pipeline] Response cache lookup failed: {e}")
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        hit = semantic.lookup(_CASE_SUFFIX.sub("", query), prep.embedding, _chunk_ids(prep.retrieved), prep.corpus)
+        if hit is not None:
+            return key, hit.answer, {"kind": "semantic", "similarity": hit.similarity,
+                                     "overlap": hit.overlap, "matched_query": hit.matched_query}
+    return key, None, None
+
+
+def _cache_store(query: str, prep: PreparedQuery, key: Optional[str], response: str, gen_ms: float):
+    """Remembers a freshly generated answer in both caches."""
+    if key is not None:
+        try:
+            get_response_cache().put(key, prep.corpus, response, gen_ms)
+        except Exception as e:
+            print(f"[pipeline] Response cache write failed: {e}")
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        semantic.add(_CASE_SUFFIX.sub("", query), prep.embedding, _chunk_ids(prep.retrieved), response, prep.corpus)
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """Hit ratio, stored bytes and generation time saved (see ResponseCache.stats); {} when off."""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {}
+
 
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """Hits, misses, skipped profile-specific questions, entries (SemanticCache.stats); {} when off."""
+    cache = get_semantic_cache()
+    return cache.stats() if cache is not None else {}
+
+
+# --- Request coalescing (rag/single_flight.py) ---
+def _flight_key(query: str, top_k: int, route_docs: Optional[int],
+                mmr_lambda: Optional[float], decision_only: bool) -> str:
+    """Same normalized query and retrieval arguments -> same answer, so one execution."""
+    return flight_key(normalize_query(query), top_k=top_k, route_docs=route_docs,
+                      mmr_lambda=mmr_lambda, decision_only=decision_only)
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    """Executions, coalesced callers, calls in flight (see SingleFlight.stats)."""
+    return get_single_flight().stats()
+
+
+def _build_answer(query: str, retrieved: List[Dict[str, Any]], prompt: str,
+                  raw_resp: str, timing: Optional[Dict[str, Any]] = None,
+                  cached: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Parses the LLM output, blends confidences and logs the decision (with `timing`, if given).
+    `cached` describes the cache hit the answer came from, if any.
+    """
+    scores = [r.get("score", 0.0) for r in retrieved] if retrieved else []
+    retrieval_conf = compute_confidence_from_scores(scores)
     parsed = extract_info(raw_resp)
 
     # Compute blended confidence
@@ -172,10 +399,217 @@ def run_rag(query: str, top_k: int = 5) -> Dict[str, Any]:
         "raw_llm": raw_resp,
         "yes_no": yes_no,
     }
+    if timing is not None:
+        answer_obj["timing"] = timing
+    if cached is not None:
+        answer_obj["cached"] = cached
 
     try:
         log_decision(query, retrieved, answer_obj, raw_prompt=prompt)
     except Exception as e:
         print(f"ERROR: Failed to log decision: {e}")
 
-    return answer_obj
\ No newline at end of file
+    return answer_obj
+
+
+def _llm_error(e: Exception) -> str:
+    """Error text in the "ERROR: ..." form extract_info recognises."""
+    message = str(e)
+    return message if message.startswith("ERROR:") else f"ERROR: LLM call failed: {message}"
+
+
+def run_rag(query: str, top_k: int = 5, route_docs: int = None,
+            mmr_lambda: float = None, decision_only: bool = False) -> Dict[str, Any]:
+    """
+    Fully stateless RAG pipeline for SwiftVisa.
+    `route_docs` limits the chunk search to the best-matching source documents;
+    `mmr_lambda` diversifies the retrieved chunks (see Retriever.retrieve).
+    The answer comes from the LLM router (rag/llm_router.py, SWIFTVISA_LLM_BACKENDS).
+    `decision_only` stops generation once the decision and confidence are known (see stream_rag).
+    Concurrent calls with the same normalized query and arguments share one execution.
+    """
+    return get_single_flight().do(
+        _flight_key(query, top_k, route_docs, mmr_lambda, decision_only),
+        lambda: _run_rag(query, top_k, route_docs, mmr_lambda, decision_only))
+
+
+def _run_rag(query: str, top_k: int, route_docs: Optional[int],
+             mmr_lambda: Optional[float], decision_only: bool) -> Dict[str, Any]:
+    if decision_only:
+        for event in _stream_rag(query, top_k, route_docs, mmr_lambda, decision_only=True):
+            if event["type"] == "final":
+                return event["answer"]
+
+    prep = _retrieve_and_prompt(query, top_k, route_docs, mmr_lambda)
+
+    key, raw_resp, cached = _cache_lookup(query, prep)
+    if raw_resp is None:
+        t0 = time.perf_counter()
+        try:
+            raw_resp = get_router().generate(prep.prompt)
+            _cache_store(query, prep, key, raw_resp, 1000 * (time.perf_counter() - t0))
+        except Exception as e:
+            raw_resp = _llm_error(e)
+
+    return _build_answer(query, prep.retrieved, prep.prompt, raw_resp, cached=cached)
+
+
+# --- Async pipeline (batch evaluation, see process_test_queries.py) ---
+# Retrieval is CPU work (encoder + FAISS) and runs on a small thread pool so it never blocks the
+# event loop; LLM calls are awaited, with an optional semaphore capping how many are in flight.
+RETRIEVAL_THREADS = int(os.getenv("SWIFTVISA_RETRIEVAL_THREADS", "4"))
+_retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+
+async def run_rag_async(query: str, top_k: int = 5, route_docs: int = None,
+                        mmr_lambda: float = None,
+                        llm_limit: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+    """
+    run_rag for asyncio callers: same arguments and result. Pass one `llm_limit` semaphore
+    to every concurrent call to cap in-flight LLM requests. Concurrent calls with the same
+    normalized query and arguments share one execution (also with run_rag callers).
+    Retrieval and the LLM call run on worker threads (router.generate_async), so concurrency
+    is bounded by SWIFTVISA_LLM_THREADS rather than by the event loop.
+    """
+    return await get_single_flight().do_async(
+        _flight_key(query, top_k, route_docs, mmr_lambda, False),
+        lambda: _run_rag_async(query, top_k, route_docs, mmr_lambda, llm_limit))
+
+
+async def _run_rag_async(query: str, top_k: int, route_docs: Optional[int],
+                         mmr_lambda: Optional[float],
+                         llm_limit: Optional[asyncio.Semaphore]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    prep = await loop.run_in_executor(
+        _retrieval_pool, _retrieve_and_prompt, query, top_k, route_docs, mmr_lambda)
+
+    key, raw_resp, cached = _cache_lookup(query, prep)
+    if raw_resp is None:
+        t0 = time.perf_counter()
+        try:
+            if llm_limit is None:
+                raw_resp = await get_router().generate_async(prep.prompt)
+            else:
+                async with llm_limit:
+                    raw_resp = await get_router().generate_async(prep.prompt)
+            _cache_store(query, prep, key, raw_resp, 1000 * (time.perf_counter() - t0))
+        except Exception as e:
+            raw_resp = _llm_error(e)
+
+    return _build_answer(query, prep.retrieved, prep.prompt, raw_resp, cached=cached)
+
+
+# --- Streaming pipeline (query_cli.py, streamlit_app.py) ---
+# Time to first token is what a user waits before anything happens; recent values are kept
+# process-wide for get_stream_stats().
+_ttft_ms: "deque[float]" = deque(maxlen=500)
+_ttft_lock = threading.Lock()
+
+
+def get_stream_stats() -> Dict[str, Any]:
+    """Time to first token over the last 500 streamed queries: count, p50_ms, p95_ms."""
+    with _ttft_lock:
+        values = list(_ttft_ms)
+    if not values:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"count": len(values), "p50_ms": float(p50), "p95_ms": float(p95)}
+
+
+def stream_rag(query: str, top_k: int = 5, route_docs: int = None,
+               mmr_lambda: float = None, decision_only: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    run_rag as a stream of events, in this order:
+      {"type": "retrieval", "retrieved": [...], "retrieval_ms": float}
+      {"type": "token", "text": str}          (zero or more, as the LLM generates)
+      {"type": "final", "answer": {...}}      (the run_rag result plus "timing")
+    Interleaved with the tokens, fields of the JSON answer as soon as they can be read:
+      {"type": "field_delta", "name": "reason", "text": str}   (top-level strings, as they grow)
+      {"type": "field", "name": "eligibility_status", "value": ...}   (once the value closes)
+    timing holds retrieval_ms, ttft_ms (query start to first token, None if none arrived),
+    decision_ms (query start to eligibility_status), total_ms, backend and stopped_early.
+    With `decision_only`, generation is cancelled as soon as eligibility_status and confidence
+    have closed; reason and future_steps are then usually missing from the answer.
+    Concurrent calls with the same normalized query and arguments share one execution (also
+    with run_rag / run_rag_async callers): the first streams, the others wait for its answer
+    and get it replayed as events, with timing["backend"] == "single-flight".
+    """
+    t0 = time.perf_counter()
+    return get_single_flight().do_stream(
+        _flight_key(query, top_k, route_docs, mmr_lambda, decision_only),
+        lambda: _stream_rag(query, top_k, route_docs, mmr_lambda, decision_only),
+        result_of=lambda event: event["answer"] if event["type"] == "final" else None,
+        replay=lambda answer: _replay_answer(answer, t0))
+
+
+def _replay_answer(answer: Dict[str, Any], t0: float) -> Iterator[Dict[str, Any]]:
+    """stream_rag's events for an answer another caller produced (single-flight follower)."""
+    waited_ms = 1000 * (time.perf_counter() - t0)
+    leader = answer.get("timing") or {}
+    yield {"type": "retrieval", "retrieved": answer.get("retrieved", []),
+           "retrieval_ms": leader.get("retrieval_ms", 0.0)}
+    raw = answer.get("raw_llm") or ""
+    yield {"type": "token", "text": raw}
+    for kind, name, value in JSONFieldStream().feed(raw):
+        if kind == "delta":
+            yield {"type": "field_delta", "name": name, "text": value}
+        else:
+            yield {"type": "field", "name": name, "value": value}
+    answer["timing"] = {"retrieval_ms": leader.get("retrieval_ms"), "ttft_ms": waited_ms,
+                        "decision_ms": waited_ms, "total_ms": waited_ms, "backend": "single-flight",
+                        "stopped_early": leader.get("stopped_early", False)}
+    yield {"type": "final", "answer": answer}
+
+
+def _stream_rag(query: str, top_k: int, route_docs: Optional[int], mmr_lambda: Optional[float],
+                decision_only: bool) -> Iterator[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    prep = _retrieve_and_prompt(query, top_k, route_docs, mmr_lambda)
+    retrieval_ms = 1000 * (time.perf_counter() - t0)
+    yield {"type": "retrieval", "retrieved": prep.retrieved, "retrieval_ms": retrieval_ms}
+
+    router = get_router()
+    fields = JSONFieldStream()
+    pieces, ttft_ms, decision_ms, backend, stopped_early = [], None, None, None, False
+    key, cached, hit = _cache_lookup(query, prep)
+    # A cached answer is replayed as a single token; the whole answer is there, so no early stop
+    stream = iter([cached]) if cached is not None else router.stream(prep.prompt)
+    try:
+        for piece in stream:
+            if ttft_ms is None:
+                ttft_ms = 1000 * (time.perf_counter() - t0)
+                with _ttft_lock:
+                    _ttft_ms.append(ttft_ms)
+            pieces.append(piece)
+            yield {"type": "token", "text": piece}
+            for kind, name, value in fields.feed(piece):
+                if kind == "delta":
+                    yield {"type": "field_delta", "name": name, "text": value}
+                    continue
+                if name == "eligibility_status" and decision_ms is None:
+                    decision_ms = 1000 * (time.perf_counter() - t0)
+                yield {"type": "field", "name": name, "value": value}
+            if decision_only and cached is None and fields.has(*DECISION_FIELDS):
+                stopped_early = True
+                stream.close()   # cancels the request; the rest of the answer is never generated
+                break
+        # An early stop leaves the JSON unterminated: hand extract_info the fields that closed
+        raw_resp = json.dumps(fields.fields) if stopped_early else "".join(pieces).strip()
+        if cached is not None:
+            backend = "semantic-cache" if hit["kind"] == "semantic" else "cache"
+        else:
+            backend = router.get_last_route().get("backend")
+            if not stopped_early:
+                _cache_store(query, prep, key, raw_resp, 1000 * (time.perf_counter() - t0) - retrieval_ms)
+    except Exception as e:
+        # Text already shown stays visible; the decision comes from the error
+        raw_resp = _llm_error(e)
+    finally:
+        if cached is None:
+            stream.close()
+
+    timing = {"retrieval_ms": retrieval_ms, "ttft_ms": ttft_ms, "decision_ms": decision_ms,
+              "total_ms": 1000 * (time.perf_counter() - t0),
+              "backend": backend, "stopped_early": stopped_early}
+    yield {"type": "final", "answer": _build_answer(query, prep.retrieved, prep.prompt, raw_resp, timing,
+                                                    cached=hit)}
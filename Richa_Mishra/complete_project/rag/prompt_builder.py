@@ -1,26 +1,138 @@
-from typing import List, Dict, Any
+import re
+from typing import Callable, List, Dict, Any, NamedTuple, Optional
+
+import numpy as np
+
+from utils.token_count import count_tokens, tokenizer_id
+
+SEPARATOR = "\n---\n"
+
+# Sentence ends in extracted PDF text: . ! ? before a capital, digit, quote or bullet; or a bullet
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9•▪*-])|\s+(?=[•▪*]\s)")
+# Longer "sentences" (tables, lists without punctuation) are cut into windows of this many words
+MAX_SENTENCE_WORDS = 60
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int          # estimated while packing (count_tokens(text) is exact)
+    sentences: int       # sentences in the retrieved chunks (0: all chunks fit whole)
+    kept: int            # sentences packed
+    chunks: int          # retrieved chunks with at least one sentence in the context
+
+
+def _header(idx: int, r: Dict[str, Any]) -> str:
+    meta = r.get("meta", {}) or {}
+    uid = r.get("uid", f"uid_{idx}")
+    chunk_id = meta.get("chunk_id", uid)
+    source = meta.get("source", meta.get("doc_id", "unknown"))
+    return f"[{idx}] Source: {source} | chunk_id: {chunk_id}\n"
+
+
+def _chunk_text(r: Dict[str, Any]) -> str:
+    return (r.get("text") or r.get("content") or "").strip()
+
+
+def chunk_tokens(r: Dict[str, Any]) -> int:
+    """Token count stored with the chunk at ingestion, or counted now (older metadata, other tokenizer)."""
+    meta = r.get("meta", {}) or {}
+    if "tokens" in meta and meta.get("tokenizer") == tokenizer_id():
+        return int(meta["tokens"])
+    return count_tokens(_chunk_text(r))
+
+
+def split_sentences(text: str) -> List[str]:
+    words_text = " ".join((text or "").split())
+    sentences = []
+    for sentence in _SENTENCE_END.split(words_text):
+        words = sentence.split()
+        for i in range(0, len(words), MAX_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i:i + MAX_SENTENCE_WORDS]))
+    return [s for s in sentences if s]
+
+
+def pack_context(retrieved: List[Dict[str, Any]], max_tokens: int, query_embedding=None,
+                 embed: Optional[Callable[[List[str]], np.ndarray]] = None) -> PackedContext:
+    """
+    Context of at most `max_tokens` tokens. If the whole chunks fit (stored token counts),
+    they go in as they are. Otherwise every chunk is split into sentences, which are scored
+    against `query_embedding` (vectors from `embed`, a batch encoder) and packed best first
+    under their chunk's citation header, in document order, with "..." where sentences were
+    left out. Without a query vector or encoder, sentences are packed in retrieval order.
+    """
+    retrieved = [r for r in retrieved or [] if _chunk_text(r)]
+    headers = [_header(i + 1, r) for i, r in enumerate(retrieved)]
+    header_tokens = [count_tokens(h) for h in headers]
+    sep_tokens = count_tokens(SEPARATOR)
+
+    whole = sum(header_tokens) + sum(chunk_tokens(r) for r in retrieved) + sep_tokens * max(len(retrieved) - 1, 0)
+    if whole <= max_tokens:
+        text = SEPARATOR.join(h + _chunk_text(r) + "\n" for h, r in zip(headers, retrieved))
+        return PackedContext(text, whole, 0, 0, len(retrieved))
+
+    sentences = [(ci, s) for ci, r in enumerate(retrieved) for s in split_sentences(_chunk_text(r))]
+    if not sentences:
+        return PackedContext("", 0, 0, 0, 0)
+    order = range(len(sentences))
+    if query_embedding is not None and embed is not None:
+        try:
+            vectors = np.asarray(embed([s for _, s in sentences]), dtype="float32")
+            q = np.asarray(query_embedding, dtype="float32").ravel()
+            scores = vectors @ q / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q) + 1e-12)
+            order = np.argsort(-scores, kind="stable")
+        except Exception as e:
+            print(f"[prompt_builder] Sentence scoring failed ({e}); packing in retrieval order.")
+
+    # Greedy: best sentences first; a chunk's header (and separator) is paid with its first sentence
+    chosen: Dict[int, List[int]] = {}
+    used = 0
+    for j in order:
+        ci, sentence = sentences[j]
+        cost = count_tokens(sentence) + 1
+        if ci not in chosen:
+            cost += header_tokens[ci] + (sep_tokens if chosen else 0)
+        if used + cost > max_tokens:
+            continue
+        chosen.setdefault(ci, []).append(int(j))
+        used += cost
+
+    parts = []
+    for ci in sorted(chosen):
+        picked = sorted(chosen[ci])
+        body = sentences[picked[0]][1]
+        for prev, j in zip(picked, picked[1:]):
+            body += (" " if j == prev + 1 else " ... ") + sentences[j][1]
+        parts.append(headers[ci] + body + "\n")
+    return PackedContext(SEPARATOR.join(parts), used, len(sentences),
+                         sum(len(v) for v in chosen.values()), len(chosen))
+
 
 def build_prompt(query: str,
                  retrieved: List[Dict[str, Any]],
                  max_chars: int = 3000,
-                 mode: str = "decision") -> str:
+                 mode: str = "decision",
+                 max_tokens: Optional[int] = None,
+                 query_embedding=None,
+                 embed: Optional[Callable[[List[str]], np.ndarray]] = None) -> str:
     """
     Stateless prompt builder: JSON-first, fallback-safe.
     The primary goal is to get a definitive decision and a confidence score.
+    With `max_tokens`, the context is packed sentence by sentence within that many tokens
+    (see pack_context); otherwise it is cut at `max_chars`.
     """
 
+    if max_tokens:
+        context_text = pack_context(retrieved, max_tokens, query_embedding, embed).text \
+                       or "No context was retrieved. Use NULL where needed."
+        return _render(query, context_text)
+
     # -------- DOCUMENT CONTEXT (trim to max_chars) -------- #
     ctx_parts = []
     total = 0
     for i, r in enumerate(retrieved or []):
         idx = i + 1
-        meta = r.get("meta", {}) or {}
-        uid = r.get("uid", f"uid_{idx}")
-        chunk_id = meta.get("chunk_id", uid)
-        source = meta.get("source", meta.get("doc_id", "unknown"))
-
-        header = f"[{idx}] Source: {source} | chunk_id: {chunk_id}\n"
-        text = (r.get("text") or r.get("content") or "").strip()
+        header = _header(idx, r)
+        text = _chunk_text(r)
         piece = header + text + "\n"
 
         if total + len(piece) > max_chars:
@@ -33,9 +145,12 @@ def build_prompt(query: str,
         ctx_parts.append((idx, piece))
         total += len(piece)
 
-    context_text = "\n---\n".join([p for i, p in ctx_parts]) \
+    context_text = SEPARATOR.join([p for i, p in ctx_parts]) \
                    if ctx_parts else "No context was retrieved. Use NULL where needed."
+    return _render(query, context_text)
+
 
+def _render(query: str, context_text: str) -> str:
     # -------- FINAL PROMPT -------- #
     prompt = f"""
 You are SwiftVisa, an expert immigration assistant.
@@ -53,14 +168,15 @@ Your job is to decide YES or NO based **ONLY** on the policy extracts provided b
 3. **Confidence:** Provide a numerical score from **0.0 (low)** to **1.0 (high)** reflecting the certainty based on the provided context.
 4. **Source:** Use **ONLY** provided context. Set missing data to "NULL" or [].
 5. **Conciseness:** Keep the 'reason' concise (2-4 sentences).
+6. **Order:** Write the fields in the order shown below (decision and confidence first).
 
 **OUTPUT:**
 Return a JSON object with the following mandatory fields:
 {{
   "eligibility_status": "eligible / not eligible / partially eligible",
+  "confidence": 0.0,
   "reason": "2-4 sentences based strictly on context",
-  "future_steps": ["steps based on context or to improve eligibility"],
-  "confidence": 0.0
+  "future_steps": ["steps based on context or to improve eligibility"]
 }}
 """
     return prompt.strip()
\ No newline at end of file
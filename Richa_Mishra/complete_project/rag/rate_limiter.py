@@ -0,0 +1,307 @@
+# rag/rate_limiter.py
+#
+# Quota-aware scheduling of LLM requests, one ModelLane per model:
+#   - token buckets for requests/min and tokens/min, so we stay under the quota instead of
+#     discovering it through 429s
+#   - errors are classified as quota (429 / RESOURCE_EXHAUSTED), transient (5xx, timeouts,
+#     connection resets), safety (blocked prompt or output) or fatal (bad request, auth)
+#   - quota and transient errors are retried with exponential backoff + jitter, never sooner
+#     than the server's own "retry in Ns" / retry_delay; safety and fatal errors are not retried
+#   - a circuit breaker opens when a model's quota is exhausted (repeated 429s, a daily limit,
+#     or a retry delay longer than we are willing to wait) and fails calls fast until it expires
+# Limits come from SWIFTVISA_LLM_RPM / SWIFTVISA_LLM_TPM (defaults: Gemini free tier for flash).
+# An idle lane lets SWIFTVISA_LLM_BURST requests through at once, then paces them at the RPM
+# rate. A burst can exceed the RPM quota over a rolling minute by that many requests; those
+# come back as 429s and go through the backoff above.
+
+import os
+import re
+import time
+import random
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_RPM = float(os.getenv("SWIFTVISA_LLM_RPM", "10"))
+DEFAULT_TPM = float(os.getenv("SWIFTVISA_LLM_TPM", "250000"))
+DEFAULT_BURST = float(os.getenv("SWIFTVISA_LLM_BURST", "3"))
+MAX_ATTEMPTS = int(os.getenv("SWIFTVISA_LLM_ATTEMPTS", "4"))
+# Longest single wait we accept before giving up on a call and opening the breaker
+MAX_WAIT = float(os.getenv("SWIFTVISA_LLM_MAX_WAIT", "30"))
+
+QUOTA, TRANSIENT, SAFETY, FATAL = "quota", "transient", "safety", "fatal"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the provider while a model's breaker is open."""
+
+    def __init__(self, model: str, retry_in: float):
+        super().__init__(f"quota exhausted for {model}; failing fast for another {retry_in:.0f}s")
+        self.model = model
+        self.retry_in = retry_in
+
+
+# ------------------------------------------------------------
+# ERROR CLASSIFICATION
+# ------------------------------------------------------------
+_RETRY_IN = re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY = re.compile(r"retry_?delay\W+(?:seconds\W+)?([\d.]+)", re.IGNORECASE)
+_QUOTA_TEXT = re.compile(r"\b429\b|resource.?exhausted|exceeded your current quota|rate.?limit", re.IGNORECASE)
+_TRANSIENT_TEXT = re.compile(r"\b50[0234]\b|unavailable|deadline|timed? ?out|connection (reset|aborted|refused)"
+                             r"|internal error|overloaded", re.IGNORECASE)
+_SAFETY_TEXT = re.compile(r"block_?reason|blocked|\bSAFETY\b|PROHIBITED_CONTENT")
+
+
+def retry_after_from(error: Any) -> Optional[float]:
+    """Server-requested delay in seconds ("Please retry in 27.6s", retry_delay { seconds: 27 })."""
+    value = getattr(error, "retry_after", None)
+    if value is not None:
+        return float(value)
+    text = str(error)
+    match = _RETRY_IN.search(text) or _RETRY_DELAY.search(text)
+    return float(match.group(1)) if match else None
+
+
+def classify_error(error: Any) -> Tuple[str, Optional[float]]:
+    """(kind, retry_after) for an exception or error string; kind is quota/transient/safety/fatal."""
+    name = type(error).__name__
+    code = getattr(error, "code", None)
+    try:
+        code = int(code) if code is not None and not callable(code) else None
+    except (TypeError, ValueError):
+        code = None
+    text = str(error)
+
+    if name in ("BlockedPromptException", "StopCandidateException") or _SAFETY_TEXT.search(text):
+        return SAFETY, None
+    if code == 429 or name in ("ResourceExhausted", "TooManyRequests") or _QUOTA_TEXT.search(text):
+        return QUOTA, retry_after_from(error)
+    if (code is not None and code >= 500) or isinstance(error, (TimeoutError, ConnectionError)) \
+            or name in ("ServiceUnavailable", "DeadlineExceeded", "InternalServerError") \
+            or _TRANSIENT_TEXT.search(text):
+        return TRANSIENT, retry_after_from(error)
+    return FATAL, None
+
+
+def is_daily_quota(error: Any) -> bool:
+    """A per-day limit will not recover within any retry window worth waiting for."""
+    return bool(re.search(r"PerDay|per.day|daily", str(error), re.IGNORECASE))
+
+
+# ------------------------------------------------------------
+# BUILDING BLOCKS
+# ------------------------------------------------------------
+class TokenBucket:
+    """
+    `per_minute` tokens per minute, bursts up to `capacity` (default a tenth of a minute's worth:
+    providers count over a rolling minute, so a full-minute burst followed by the steady rate
+    would overshoot). acquire() blocks until the tokens are free.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = float(per_minute) / 60.0
+        self.capacity = float(capacity or max(1.0, per_minute / 10.0))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> float:
+        """Takes `n` tokens (capped at capacity) and returns the seconds spent waiting."""
+        n = min(float(n), self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self):
+        """Empties the bucket (the server just told us we are over quota)."""
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive quota failures with no success in between (or
+    force_open: daily limit, retry delay longer than we wait). A per-minute 429 that clears after
+    its retry delay is throttling, not exhaustion, and does not open it on its own. While open every
+    call fails fast. Once the open period ends one probe call is let through (half-open): success
+    closes the breaker, another quota failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.open_until == 0.0:
+                return "closed"
+            return "open" if time.monotonic() < self.open_until else "half-open"
+
+    def allow(self) -> Tuple[bool, float]:
+        """(allowed, seconds until the next probe) for a new call."""
+        with self.lock:
+            if self.open_until == 0.0:
+                return True, 0.0
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                return False, remaining
+            if self.probing:
+                return False, 1.0
+            self.probing = True
+            return True, 0.0
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.open_until = 0.0
+            self.probing = False
+
+    def record_quota_failure(self, retry_after: Optional[float] = None, force_open: bool = False):
+        with self.lock:
+            self.failures += 1
+            if force_open or self.probing or self.failures >= self.threshold:
+                self.open_until = time.monotonic() + max(retry_after or 0.0, self.cooldown)
+            self.probing = False
+
+    def release_probe(self):
+        """The probe ended without telling us anything about the quota (e.g. a safety block)."""
+        with self.lock:
+            self.probing = False
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None,
+                  base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter, but never shorter than the server's retry delay."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        # A little jitter on top so callers released together do not all come back at once
+        delay = max(delay, retry_after + random.uniform(0, 1.0))
+    return delay
+
+
+# ------------------------------------------------------------
+# SCHEDULER
+# ------------------------------------------------------------
+class ModelLane:
+    """Buckets, breaker and counters for one model."""
+
+    def __init__(self, rpm: float, tpm: float, breaker: CircuitBreaker, burst: float = DEFAULT_BURST):
+        # Interactive calls in an idle process go out at once; sustained load is paced at `rpm`
+        self.requests = TokenBucket(rpm, capacity=max(1.0, burst))
+        self.tokens = TokenBucket(tpm)
+        self.breaker = breaker
+        self.stats = {"calls": 0, "sent": 0, "ok": 0, "retries": 0, QUOTA: 0, TRANSIENT: 0,
+                      SAFETY: 0, FATAL: 0, "fast_failures": 0, "throttled_s": 0.0, "backoff_s": 0.0}
+        self.lock = threading.Lock()
+
+    def count(self, key: str, amount: float = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+
+class RequestScheduler:
+    """
+    Runs provider calls through per-model rate limits, retries and circuit breakers:
+
+        scheduler.call("models/gemini-2.5-flash", est_tokens, lambda: model.generate_content(p))
+
+    Returns the call's result or raises its last exception (CircuitOpenError when failing fast).
+    """
+
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM, burst: float = DEFAULT_BURST,
+                 max_attempts: int = MAX_ATTEMPTS, max_wait: float = MAX_WAIT,
+                 limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 60.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rpm, self.tpm, self.burst = rpm, tpm, burst
+        self.limits = dict(limits or {})      # model -> (rpm, tpm) overrides
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.sleep = sleep
+        self._lanes: Dict[str, ModelLane] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, model: str) -> ModelLane:
+        with self._lock:
+            if model not in self._lanes:
+                rpm, tpm = self.limits.get(model, (self.rpm, self.tpm))
+                self._lanes[model] = ModelLane(
+                    rpm, tpm, CircuitBreaker(self.breaker_threshold, self.breaker_cooldown), self.burst)
+            return self._lanes[model]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {m: dict(lane.stats, breaker=lane.breaker.state) for m, lane in lanes.items()}
+
+    def call(self, model: str, est_tokens: int, fn: Callable[[], Any]) -> Any:
+        lane = self.lane(model)
+        lane.count("calls")
+        for attempt in range(self.max_attempts):
+            allowed, retry_in = lane.breaker.allow()
+            if not allowed:
+                lane.count("fast_failures")
+                raise CircuitOpenError(model, retry_in)
+
+            lane.count("throttled_s", lane.requests.acquire(1) + lane.tokens.acquire(est_tokens))
+            lane.count("sent")
+            try:
+                result = fn()
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                lane.count(kind)
+                if kind == QUOTA:
+                    lane.requests.drain()
+                    too_long = retry_after is not None and retry_after > self.max_wait
+                    lane.breaker.record_quota_failure(retry_after, force_open=too_long or is_daily_quota(e))
+                    if lane.breaker.state == "open":
+                        raise
+                elif lane.breaker.probing:
+                    lane.breaker.release_probe()
+                if kind in (SAFETY, FATAL) or attempt == self.max_attempts - 1:
+                    raise
+                delay = backoff_delay(attempt, retry_after)
+                if delay > self.max_wait:
+                    raise
+                lane.count("retries")
+                lane.count("backoff_s", delay)
+                self.sleep(delay)
+                continue
+            lane.breaker.record_success()
+            lane.count("ok")
+            return result
+
+
+_default_scheduler: Optional[RequestScheduler] = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler shared by every LLM call (one quota per API key)."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = RequestScheduler()
+    return _default_scheduler
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough input token count (~4 characters per token) charged against the tokens/min bucket."""
+    return len(prompt) // 4 + 1
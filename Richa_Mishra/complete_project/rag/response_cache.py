@@ -0,0 +1,144 @@
+# rag/response_cache.py
+#
+# Disk-backed exact-match cache of LLM answers (SQLite, shared by the CLI, Streamlit and batch
+# runs, and across restarts). The key is a sha256 of the final prompt, the router's backends
+# and models, the generation settings that change the output, and the corpus the prompt was
+# built from (index bundle version, or a fingerprint of the legacy Data/ files). Entries
+# expire after a TTL; past the size limit the least recently used ones are evicted. Storing
+# an answer for a new corpus deletes every entry of the previous ones, so a rebuilt index
+# never serves stale answers.
+#
+#   SWIFTVISA_RESPONSE_CACHE      database path (Data/response_cache.sqlite), "off" disables
+#   SWIFTVISA_RESPONSE_CACHE_TTL  seconds an answer stays valid (604800 = 7 days)
+#   SWIFTVISA_RESPONSE_CACHE_MB   size limit of the stored answers (64)
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import asdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = Path("Data") / "response_cache.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MB = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key       TEXT PRIMARY KEY,
+    corpus    TEXT NOT NULL,
+    response  TEXT NOT NULL,
+    bytes     INTEGER NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL,
+    gen_ms    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def response_key(prompt: str, model: str, config: Any, corpus: str) -> str:
+    """sha256 over everything that determines the answer; `config` is a GenerateConfig."""
+    settings = asdict(config)
+    settings.pop("timeout", None)   # how long we wait does not change what is generated
+    payload = json.dumps([prompt, model, settings, corpus], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: Path = DEFAULT_PATH, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # One connection shared by all threads (guarded by the lock); WAL lets other
+        # processes (Streamlit next to a batch run) read while one writes
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._corpus: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.saved_ms = 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created, gen_ms FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            self.saved_ms += row[2]
+            return row[0]
+
+    def put(self, key: str, corpus: str, response: str, gen_ms: float):
+        """Stores an answer that took `gen_ms` to generate; drops other corpora, then evicts LRU."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if corpus != self._corpus:
+                self._db.execute("DELETE FROM responses WHERE corpus != ?", (corpus,))
+                self._corpus = corpus
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, corpus, response, size, now, now, gen_ms))
+            total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total - self.max_bytes)
+            self._db.commit()
+
+    def _evict(self, excess: int):
+        freed, victims = 0, []
+        for key, size in self._db.execute("SELECT key, bytes FROM responses ORDER BY last_used"):
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evicted += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits/misses of this process, and what is stored on disk (shared with other processes)."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses").fetchone()
+            hits, misses = self.hits, self.misses
+            return {"hits": hits, "misses": misses,
+                    "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                    "entries": entries, "bytes": size, "saved_ms": self.saved_ms,
+                    "expired": self.expired, "evicted": self.evicted}
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache configured from the environment, or None when it is off."""
+    path = os.getenv("SWIFTVISA_RESPONSE_CACHE", str(DEFAULT_PATH))
+    if path.strip().lower() in ("", "0", "off", "false"):
+        return None
+    return ResponseCache(Path(path),
+                         ttl=float(os.getenv("SWIFTVISA_RESPONSE_CACHE_TTL", str(DEFAULT_TTL))),
+                         max_bytes=int(float(os.getenv("SWIFTVISA_RESPONSE_CACHE_MB", str(DEFAULT_MB))) * 1024 * 1024))
@@ -4,73 +4,166 @@ import numpy as np
 from typing import List, Dict, Any
 from pathlib import Path
 
+from utils.projection import load_projection
+
+from .router import DocumentRouter
+from .entity_matcher import default_matcher, KEYWORD_CATEGORIES
+
 DATA_DIR = Path("Data")
 INDEX_PATH = DATA_DIR / "visa_embeddings.index"
 METADATA_JSON = DATA_DIR / "visa_metadata.json"
 CHUNKS_JSON = DATA_DIR / "visa_chunks.json"
 IDS_NPY = DATA_DIR / "visa_ids.npy"
+VECTORS_NPY = DATA_DIR / "visa_embeddings.npy"
+# Rows projected at a time when a projected index is loaded
+PROJECT_BATCH = 4096
 
 class Retriever:
-    def __init__(self, index_path: Path = INDEX_PATH):
+    def __init__(self, index_path: Path = INDEX_PATH, vectors_path: Path = VECTORS_NPY,
+                 ids_path: Path = IDS_NPY, metadata_path: Path = METADATA_JSON,
+                 chunks_path: Path = CHUNKS_JSON):
         if not index_path.exists():
             raise FileNotFoundError(f"FAISS index not found at {index_path}. Run your build step to create it.")
         self.index = faiss.read_index(str(index_path))
 
+        # Learned projection recorded in the index manifest (None for a full-width index)
+        self.projection = load_projection(index_path)
+
         try:
-            with open(METADATA_JSON, "r", encoding="utf-8") as fh:
+            with open(metadata_path, "r", encoding="utf-8") as fh:
                 self.metadata = json.load(fh)
         except Exception:
             self.metadata = {}
 
         try:
-            with open(CHUNKS_JSON, "r", encoding="utf-8") as fh:
+            with open(chunks_path, "r", encoding="utf-8") as fh:
                 self.chunks = json.load(fh)
         except Exception:
             self.chunks = {}
 
         try:
-            self.ids = np.load(str(IDS_NPY)).astype("int64")
+            self.ids = np.load(str(ids_path)).astype("int64")
         except Exception:
             self.ids = None
 
-        # Expanded keywords
-        self.financial_keywords = [
-            "salary", "income", "annual", "eur", "€", "usd", "rupee", "dollar", "pound",
-            "tuition", "fees", "funds", "bank", "savings", "scholarship", "loan", "financial"
-        ]
-        self.sponsorship_keywords = [
-            "sponsor", "sponsorship", "company", "employer", "job offer", "offer", "parents", "guardian", "host"
-        ]
-        self.study_keywords = [
-            "visa", "f1", "f‑1", "study permit", "acceptance letter", "admission", "program", "university", "college", "school"
-        ]
-
-    def _keyword_match_score(self, text: str, keywords: List[str]) -> float:
+        # Stored (L2-normalized) chunk vectors, row-aligned with self.ids. With a projected
+        # index they are kept in the projected space too (router, MMR), so the full-width
+        # file is only memory-mapped while projecting and never held in memory
+        self.vectors = None
+        self._row_of: Dict[int, int] = {}
+        try:
+            if self.ids is not None:
+                if self.projection is not None:
+                    stored = np.load(str(vectors_path), mmap_mode="r")
+                    self.vectors = np.vstack([self.projection.apply(stored[i:i + PROJECT_BATCH])
+                                              for i in range(0, len(stored), PROJECT_BATCH)])
+                    del stored
+                else:
+                    self.vectors = np.load(str(vectors_path)).astype("float32")
+                self._row_of = {int(rid): row for row, rid in enumerate(self.ids)}
+        except Exception as e:
+            print(f"[retriever] Stored vectors unavailable: {e}")
+
+        # Document router for two-stage (document -> chunk) search over the stored vectors
+        self.router = None
+        try:
+            if self.vectors is not None:
+                self.router = DocumentRouter(self.vectors, self.ids, self.metadata)
+        except Exception as e:
+            print(f"[retriever] Document routing disabled: {e}")
+
+        # Gazetteer matcher (countries, visa codes, finance/sponsorship/study terms), compiled once
+        self.matcher = default_matcher()
+        self._chunk_terms_cache: Dict[str, set] = {}
+
+    def _chunk_terms(self, sid: str, text: str) -> set:
+        """Keyword terms present in a chunk; chunks are static so each one is scanned only once."""
+        terms = self._chunk_terms_cache.get(sid)
+        if terms is None:
+            terms = self.matcher.terms(text, KEYWORD_CATEGORIES)
+            self._chunk_terms_cache[sid] = terms
+        return terms
+
+    def _keyword_match_score(self, text: str, keywords: List[str], sid: str = None) -> float:
         """Calculates a keyword match score as a ratio of keywords present in the text."""
         if not text or not keywords:
             return 0.0
-        text_lower = text.lower()
-        matches = sum(1 for kw in keywords if kw.lower() in text_lower)
+        terms = self._chunk_terms(sid, text) if sid is not None \
+            else self.matcher.terms(text, KEYWORD_CATEGORIES)
+        matches = len(terms.intersection(keywords))
         # Use a score capped at 1.0, based on unique keyword hits
         return min(1.0, matches / 3.0) # Cap keyword score based on an arbitrary number of matches (e.g., 3 hits = 1.0)
 
+    def _mmr_select(self, candidates: List[Dict[str, Any]], top_k: int, mmr_lambda: float) -> List[Dict[str, Any]]:
+        """
+        Maximal marginal relevance over the candidate set, using the stored chunk vectors.
+        Each step picks argmax(lambda * relevance - (1 - lambda) * max_sim_to_selected), so
+        near-identical passages (duplicated sources, .pdf/.txt twins) are pushed down.
+        """
+        rows = [self._row_of.get(int(c["uid"])) for c in candidates]
+        if self.vectors is None or any(r is None for r in rows) or len(candidates) <= 1:
+            return candidates[:top_k]
+
+        vecs = self.vectors[rows]
+        sim = vecs @ vecs.T
+        relevance = np.array([c["score"] for c in candidates], dtype="float32")
+
+        selected = [int(np.argmax(relevance))]
+        max_sim = sim[selected[0]].copy()
+        available = np.ones(len(candidates), dtype=bool)
+        available[selected[0]] = False
+
+        while len(selected) < min(top_k, len(candidates)):
+            mmr = mmr_lambda * relevance - (1.0 - mmr_lambda) * max_sim
+            mmr[~available] = -np.inf
+            pick = int(np.argmax(mmr))
+            selected.append(pick)
+            available[pick] = False
+            np.maximum(max_sim, sim[pick], out=max_sim)
 
-    def retrieve(self, query: str, top_k: int = 5, query_embedding=None) -> List[Dict[str, Any]]:
+        return [candidates[i] for i in selected]
+
+
+    def retrieve(self, query: str, top_k: int = 5, query_embedding=None,
+                 route_docs: int = None, country_routing: bool = False,
+                 mmr_lambda: float = None) -> List[Dict[str, Any]]:
+        """
+        Hybrid vector + keyword retrieval.
+        When `route_docs` is set, the vector search only runs inside the `route_docs`
+        documents whose section centroids are closest to the query. With `country_routing`
+        (opt-in), a query that names a country is searched only inside that country's
+        documents; nationality words count too, so "US visa for an Indian student" searches
+        India + US, which is why it is off by default.
+        `mmr_lambda` (0..1) re-selects the final top_k with maximal marginal relevance;
+        1.0 is pure relevance, lower values trade relevance for diversity.
+        """
         results = []
 
-        # build keyword list from query
-        ql = query.lower()
-        keywords = [kw for kw in (self.financial_keywords + self.sponsorship_keywords + self.study_keywords) if kw.lower() in ql]
+        # one pass over the query: keyword features + countries for partition routing
+        matches = self.matcher.find(query)
+        keywords = sorted({m.canonical for m in matches if m.category in KEYWORD_CATEGORIES})
+        countries = []
+        if country_routing:
+            countries = list(dict.fromkeys(m.canonical for m in matches if m.category == "country"))
 
         if query_embedding is not None:
+            # copy: normalize_L2 works in place and cached query vectors are read-only
             qv = np.array(query_embedding, dtype="float32")
             if qv.ndim == 1:
                 qv = qv.reshape(1, -1)
             # Normalize embedding vector
             faiss.normalize_L2(qv)
             
-            # Search FAISS index
-            scores, ids = self.index.search(qv, top_k * 3)
+            # Index, router and MMR vectors all live in the projected space when there is one
+            if self.projection is not None:
+                qv = self.projection.apply(qv)
+
+            # Search FAISS index (or only the routed documents' chunks)
+            if (route_docs or countries) and self.router is not None:
+                scores, ids = self.router.search(qv[0], top_k * 3, top_docs=route_docs or None,
+                                                 countries=countries)
+            else:
+                scores, ids = self.index.search(qv, top_k * 3)
             
             # Combine vector search with keyword scoring
             for vector_score, rid in zip(scores[0], ids[0]):
@@ -79,7 +172,7 @@ class Retriever:
                 sid = str(int(rid))
                 meta = self.metadata.get(sid, {}) if isinstance(self.metadata, dict) else {}
                 text = self.chunks.get(sid, "") if isinstance(self.chunks, dict) else ""
-                kw_score = self._keyword_match_score(text, keywords) if keywords else 0.0
+                kw_score = self._keyword_match_score(text, keywords, sid) if keywords else 0.0
                 
                 # Combine scores: 60% vector similarity, 40% keyword match
                 combined_score = float(vector_score) * 0.6 + kw_score * 0.4
@@ -96,8 +189,7 @@ class Retriever:
             # simple keyword matching fallback
             # The original logic for no embedding is preserved but is much slower for large datasets
             for sid, text in (self.chunks.items() if isinstance(self.chunks, dict) else []):
-                text_lower = (text or "").lower()
-                kw_score = self._keyword_match_score(text, keywords) if keywords else 0.0
+                kw_score = self._keyword_match_score(text, keywords, sid) if keywords else 0.0
                 if kw_score > 0:
                     results.append({
                         "uid": sid,
@@ -119,7 +211,10 @@ class Retriever:
                 unique_results.append(r)
                 seen_uids.add(r["uid"])
         
-        results = unique_results[:top_k]
+        if mmr_lambda is not None and query_embedding is not None:
+            results = self._mmr_select(unique_results, top_k, float(mmr_lambda))
+        else:
+            results = unique_results[:top_k]
 
         # Ensure at least top_k chunks (fallback if no good matches)
         if len(results) < top_k and self.chunks:
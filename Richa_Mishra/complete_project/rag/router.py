@@ -0,0 +1,121 @@
+import re
+import numpy as np
+from typing import List, Dict, Any, Tuple
+
+# Source file names look like "Canada.pdf", "canada_101.txt", "UK3.pdf", "US_Visa.txt",
+# "ireland_visa2.pdf", "Indian_Visa.txt" - the leading token identifies the country.
+_COUNTRY_PREFIX = re.compile(r"^(canada|uk|us|ireland|schengen|india)", re.IGNORECASE)
+
+
+def country_from_source(source: str) -> str:
+    """Maps a source file name to its country key ('unknown' when no prefix matches)."""
+    m = _COUNTRY_PREFIX.match((source or "").strip())
+    return m.group(1).lower() if m else "unknown"
+
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.clip(norms, 1e-9, None)
+
+
+class DocumentRouter:
+    """
+    Coarse-to-fine search over the stored chunk vectors.
+
+    Every source document is split into sections of consecutive chunks and each section
+    is summarised by its (normalized) centroid. A query is first scored against the small
+    centroid matrix to pick the best documents, then the exact inner-product search runs
+    only over the chunk vectors of those documents. Query cost therefore grows with the
+    size of the routed documents instead of the total corpus.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, metadata: Dict[str, Any],
+                 section_size: int = 16):
+        vectors = np.asarray(vectors, dtype="float32")
+        ids = np.asarray(ids, dtype="int64")
+
+        rows_by_doc: Dict[str, List[int]] = {}
+        for row, rid in enumerate(ids):
+            meta = metadata.get(str(int(rid)), {}) if isinstance(metadata, dict) else {}
+            rows_by_doc.setdefault(meta.get("source", "unknown"), []).append(row)
+
+        self.doc_names: List[str] = []
+        self.doc_vectors: List[np.ndarray] = []
+        self.doc_ids: List[np.ndarray] = []
+        centroids = []
+        section_doc = []
+
+        for doc_idx, (source, rows) in enumerate(sorted(rows_by_doc.items())):
+            rows = np.array(sorted(rows, key=lambda r: ids[r]), dtype="int64")
+            self.doc_names.append(source)
+            # Contiguous per-document copies so the fine search never touches other documents
+            self.doc_vectors.append(np.ascontiguousarray(vectors[rows]))
+            self.doc_ids.append(ids[rows])
+
+            for start in range(0, len(rows), section_size):
+                centroids.append(vectors[rows[start:start + section_size]].mean(axis=0))
+                section_doc.append(doc_idx)
+
+        self.centroids = _normalize_rows(np.array(centroids, dtype="float32")) if centroids \
+            else np.zeros((0, vectors.shape[1] if vectors.ndim == 2 else 0), dtype="float32")
+        self.section_doc = np.array(section_doc, dtype="int64")
+        self.doc_countries = [country_from_source(name) for name in self.doc_names]
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.doc_names)
+
+    def route(self, query_vector: np.ndarray, top_docs: int = 3,
+              countries: List[str] = None) -> List[Tuple[int, float]]:
+        """
+        Returns [(doc_index, score)] for the best documents (score = best section centroid).
+        `countries` restricts routing to documents of those countries; with `top_docs=None`
+        every document of the requested countries is returned.
+        """
+        if not self.doc_names:
+            return []
+        qv = np.asarray(query_vector, dtype="float32").reshape(-1)
+        section_scores = self.centroids @ qv
+
+        doc_scores = np.full(len(self.doc_names), -np.inf, dtype="float32")
+        np.maximum.at(doc_scores, self.section_doc, section_scores)
+
+        if countries:
+            wanted = set(countries)
+            allowed = np.array([c in wanted for c in self.doc_countries])
+            # No documents for the requested countries -> route over the whole corpus
+            if allowed.any():
+                doc_scores[~allowed] = -np.inf
+
+        candidates = int(np.isfinite(doc_scores).sum())
+        n = candidates if top_docs is None else min(top_docs, candidates)
+        if n <= 0:
+            return []
+        best = np.argpartition(-doc_scores, n - 1)[:n]
+        best = best[np.argsort(-doc_scores[best])]
+        return [(int(d), float(doc_scores[d])) for d in best]
+
+    def search(self, query_vector: np.ndarray, top_k: int, top_docs: int = 3,
+               countries: List[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Two-stage search. Returns (scores, ids) shaped (1, top_k) like faiss.Index.search,
+        padded with id -1 when the routed documents hold fewer than top_k chunks.
+        """
+        qv = np.asarray(query_vector, dtype="float32").reshape(-1)
+        routed = self.route(qv, top_docs=top_docs, countries=countries)
+
+        scores_out = np.full((1, top_k), -np.inf, dtype="float32")
+        ids_out = np.full((1, top_k), -1, dtype="int64")
+        if not routed:
+            return scores_out, ids_out
+
+        scores = np.concatenate([self.doc_vectors[d] @ qv for d, _ in routed])
+        cand_ids = np.concatenate([self.doc_ids[d] for d, _ in routed])
+
+        n = min(top_k, len(scores))
+        best = np.argpartition(-scores, n - 1)[:n]
+        best = best[np.argsort(-scores[best])]
+
+        scores_out[0, :n] = scores[best]
+        ids_out[0, :n] = cand_ids[best]
+        return scores_out, ids_out
@@ -0,0 +1,173 @@
+# rag/semantic_cache.py
+#
+# Answer cache for paraphrased questions, consulted after retrieval and before the LLM (the
+# exact-match rag/response_cache.py is tried first). Each answered question is stored as
+# (query vector, retrieved chunk ids, raw LLM answer) in a small in-memory FAISS index. A new
+# question reuses an answer only when both hold:
+#   - cosine similarity of the query vectors >= threshold
+#   - Jaccard overlap of the retrieved chunk ids >= min_overlap (same evidence, same answer)
+# Questions that carry the asker's own facts (amounts, durations, "my salary", "I have ...")
+# are never stored or served: two such questions can be near-identical and need opposite
+# answers. Entries expire after a TTL, the least recently used one is evicted past
+# max_entries, and a new corpus (bundle) empties the cache.
+#
+# Off by default: a false hit returns someone else's eligibility decision. Pick thresholds with
+# Test_Debug/semantic_cache_report.py first.
+#   SWIFTVISA_SEMANTIC_CACHE=1                 enable
+#   SWIFTVISA_SEMANTIC_THRESHOLD (0.92)        SWIFTVISA_SEMANTIC_OVERLAP (0.6)
+#   SWIFTVISA_SEMANTIC_MAX_ENTRIES (2000)      SWIFTVISA_SEMANTIC_TTL (86400 s)
+
+import os
+import re
+import time
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import faiss
+import numpy as np
+
+# Amounts, counts, durations, scores and first-person facts make a question profile-specific.
+# Digits inside visa names (F1, B2, H1B, EB-3, Stamp 1G, Stamp 4) do not count.
+_PROFILE_PATTERNS = re.compile(
+    r"(?<![A-Za-z\-])(?<!stamp )\d+(?![A-Za-z])|[₹£$€¥]|\blakh|\bcrore"
+    r"|\b(?:i|we)\s+(?:have|had|am|was|completed|studied|work|worked|earn|own|hold|booked|want)\b"
+    r"|\b(?:i['’]m|i['’]ve|we['’]re)\b"
+    r"|\bmy\s+(?:salary|income|savings|funds|bank|balance|score|ielts|toefl|degree|experience|age"
+    r"|partner|spouse|wife|husband|parents?|sister|brother|employer|company|college|program"
+    r"|passport|business|documents|offer)\b",
+    re.IGNORECASE)
+
+
+def is_profile_specific(query: str) -> bool:
+    """True when the answer depends on facts about the asker (see _PROFILE_PATTERNS)."""
+    return bool(_PROFILE_PATTERNS.search(query or ""))
+
+
+def chunk_overlap(a: Iterable, b: Iterable) -> float:
+    """Jaccard overlap of two retrieved chunk-id sets."""
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class SemanticHit(NamedTuple):
+    answer: str
+    similarity: float
+    overlap: float
+    matched_query: str
+
+
+class _Entry(NamedTuple):
+    query: str
+    chunk_ids: frozenset
+    answer: str
+    created: float
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.92, min_overlap: float = 0.6,
+                 max_entries: int = 2000, ttl: float = 24 * 3600, candidates: int = 4):
+        self.threshold = threshold
+        self.min_overlap = min_overlap
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self._index = None            # IndexIDMap2(IndexFlatIP), built once the width is known
+        self._entries: Dict[int, _Entry] = {}
+        self._last_used: Dict[int, float] = {}
+        self._next_id = 0
+        self._corpus: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0              # profile-specific questions, neither served nor stored
+        self.evicted = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype="float32").reshape(1, -1).copy()
+        faiss.normalize_L2(v)
+        return v
+
+    def _reset(self, corpus: Optional[str], dim: Optional[int] = None):
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim)) if dim else None
+        self._entries.clear()
+        self._last_used.clear()
+        self._corpus = corpus
+
+    def lookup(self, query: str, vector, chunk_ids: Iterable, corpus: str) -> Optional[SemanticHit]:
+        if is_profile_specific(query):
+            with self._lock:
+                self.skipped += 1
+            return None
+        v = self._unit(vector)
+        chunk_ids = frozenset(chunk_ids)
+        now = time.time()
+        with self._lock:
+            if corpus != self._corpus or self._index is None or self._index.ntotal == 0 \
+                    or self._index.d != v.shape[1]:
+                self.misses += 1
+                return None
+            sims, ids = self._index.search(v, min(self.candidates, self._index.ntotal))
+            expired = []
+            best = None
+            for sim, entry_id in zip(sims[0], ids[0]):
+                if entry_id < 0 or sim < self.threshold:
+                    break                                  # results are sorted by similarity
+                entry = self._entries[int(entry_id)]
+                if now - entry.created > self.ttl:
+                    expired.append(int(entry_id))
+                    continue
+                overlap = chunk_overlap(chunk_ids, entry.chunk_ids)
+                if overlap >= self.min_overlap:
+                    best = (int(entry_id), SemanticHit(entry.answer, float(sim), overlap, entry.query))
+                    break
+            for entry_id in expired:
+                self._remove(entry_id)
+            if best is None:
+                self.misses += 1
+                return None
+            self._last_used[best[0]] = now
+            self.hits += 1
+            return best[1]
+
+    def add(self, query: str, vector, chunk_ids: Iterable, answer: str, corpus: str):
+        if is_profile_specific(query):
+            return
+        v = self._unit(vector)
+        with self._lock:
+            if corpus != self._corpus or self._index is None or self._index.d != v.shape[1]:
+                self._reset(corpus, v.shape[1])
+            while len(self._entries) >= self.max_entries:
+                self._remove(min(self._last_used, key=self._last_used.get))
+                self.evicted += 1
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(v, np.array([entry_id], dtype="int64"))
+            now = time.time()
+            self._entries[entry_id] = _Entry(query, frozenset(chunk_ids), answer, now)
+            self._last_used[entry_id] = now
+
+    def _remove(self, entry_id: int):
+        self._index.remove_ids(np.array([entry_id], dtype="int64"))
+        self._entries.pop(entry_id, None)
+        self._last_used.pop(entry_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            looked_up = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_ratio": self.hits / looked_up if looked_up else 0.0,
+                    "skipped_profile_specific": self.skipped, "entries": len(self._entries),
+                    "evicted": self.evicted}
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """The process-wide semantic cache, or None unless SWIFTVISA_SEMANTIC_CACHE=1."""
+    if os.getenv("SWIFTVISA_SEMANTIC_CACHE", "0") != "1":
+        return None
+    return SemanticCache(threshold=float(os.getenv("SWIFTVISA_SEMANTIC_THRESHOLD", "0.92")),
+                         min_overlap=float(os.getenv("SWIFTVISA_SEMANTIC_OVERLAP", "0.6")),
+                         max_entries=int(os.getenv("SWIFTVISA_SEMANTIC_MAX_ENTRIES", "2000")),
+                         ttl=float(os.getenv("SWIFTVISA_SEMANTIC_TTL", str(24 * 3600))))
@@ -0,0 +1,175 @@
+# rag/single_flight.py
+#
+# Coalesces concurrent identical requests: the first caller with a given key (the leader) runs
+# the work, callers arriving with the same key while it is in flight (followers) wait for it and
+# receive a copy of its result, or its exception. Nothing is kept once the call finishes; repeats
+# after that are the response caches' job. Works for threads (do), asyncio (do_async) and event
+# streams (do_stream), and any of them can follow a leader of another kind on the same key.
+# A streaming leader yields its events as they come and shares only its final result; streaming
+# followers replay that result as events once it is there.
+# A follower on the same thread as an asyncio leader runs the work itself (waiting would block
+# the event loop the leader needs). If an asyncio leader is cancelled, its followers retry.
+#   SWIFTVISA_SINGLE_FLIGHT=0   disables coalescing (every caller runs the work)
+
+import os
+import copy
+import json
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class _Abandoned(Exception):
+    """Set on the shared future when an asyncio leader is cancelled: followers retry."""
+
+
+def flight_key(query: str, profile: Optional[Dict[str, Any]] = None, **filters: Any) -> str:
+    """Key of a request: the normalized query, its filters and a hash of the user profile."""
+    profile_hash = hashlib.sha256(
+        json.dumps(profile, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:16] if profile else ""
+    return json.dumps([query, sorted(filters.items()), profile_hash], default=str)
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Tuple[Future, int]] = {}   # key -> (result, leader thread id)
+        self.leaders = 0
+        self.coalesced = 0
+        self.peak_waiting = 0          # most followers that ever shared one call
+        self._waiting: Dict[str, int] = {}
+
+    def _join(self, key: str) -> Tuple[Future, bool, int]:
+        """(future, is_leader, leader thread id) for `key`, registering a new call if none is in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                future = Future()
+                self._calls[key] = (future, threading.get_ident())
+                self._waiting[key] = 0
+                self.leaders += 1
+                return future, True, threading.get_ident()
+            self.coalesced += 1
+            self._waiting[key] += 1
+            self.peak_waiting = max(self.peak_waiting, self._waiting[key])
+            return call[0], False, call[1]
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            if self._calls.get(key, (None,))[0] is future:
+                del self._calls[key]
+                del self._waiting[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """fn() once per key across concurrent threads; followers block until the leader is done."""
+        if not self.enabled:
+            return fn()
+        while True:
+            future, leader, leader_thread = self._join(key)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    self._finish(key, future)
+                future.set_result(result)
+                return result
+            if leader_thread == threading.get_ident():
+                return fn()              # asyncio leader on this thread: waiting would deadlock
+            try:
+                return copy.deepcopy(future.result())
+            except _Abandoned:
+                continue
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """await fn() once per key across concurrent tasks (and threads)."""
+        if not self.enabled:
+            return await fn()
+        while True:
+            future, leader, _ = self._join(key)
+            if leader:
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    future.set_exception(_Abandoned())
+                    raise
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    self._finish(key, future)
+                future.set_result(result)
+                return result
+            try:
+                # shield: a cancelled follower must not cancel the shared call
+                return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+            except _Abandoned:
+                continue
+
+    def do_stream(self, key: str, fn: Callable[[], Iterable[Any]],
+                  result_of: Callable[[Any], Optional[Any]],
+                  replay: Callable[[Any], Iterable[Any]]) -> Iterator[Any]:
+        """
+        Events of fn() once per key. The leader yields fn()'s events as they arrive; the
+        first event for which result_of(event) is not None is the call's shared result. A
+        follower waits for that result and yields replay(copy of it). If the leader's reader
+        stops early, the call is abandoned and its followers retry.
+        """
+        if not self.enabled:
+            yield from fn()
+            return
+        while True:
+            future, leader, leader_thread = self._join(key)
+            if leader:
+                result = None
+                try:
+                    for event in fn():
+                        if result is None:
+                            result = result_of(event)
+                        yield event
+                except GeneratorExit:
+                    # Closed after the result went out (e.g. at the final event) still counts
+                    if result is None:
+                        future.set_exception(_Abandoned())
+                    else:
+                        future.set_result(result)
+                    raise
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                finally:
+                    self._finish(key, future)
+                if result is None:
+                    future.set_exception(_Abandoned())
+                else:
+                    future.set_result(result)
+                return
+            if leader_thread == threading.get_ident():
+                yield from fn()          # leader is suspended on this thread: waiting would deadlock
+                return
+            try:
+                result = copy.deepcopy(future.result())
+            except _Abandoned:
+                continue
+            yield from replay(result)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {"executions": self.leaders, "coalesced": self.coalesced,
+                    "coalesced_ratio": self.coalesced / total if total else 0.0,
+                    "in_flight": len(self._calls), "peak_followers": self.peak_waiting}
+
+
+@lru_cache(maxsize=1)
+def get_single_flight() -> SingleFlight:
+    """The process-wide coalescer (SWIFTVISA_SINGLE_FLIGHT=0 turns it into a pass-through)."""
+    return SingleFlight(enabled=os.getenv("SWIFTVISA_SINGLE_FLIGHT", "1") != "0")
@@ -2,7 +2,7 @@ import streamlit as st
 import json
 import os
 from dotenv import load_dotenv
-from rag.pipeline import run_rag
+from rag.pipeline import stream_rag
 
 # --- Configuration ---
 load_dotenv()
@@ -344,14 +344,49 @@ def live_query_tab():
             return
 
         try:
-            with st.spinner("🔄 Processing your query and analyzing eligibility..."):
-                result = run_rag(query, top_k=TOP_K_DISPLAY)
+            events = stream_rag(query, top_k=TOP_K_DISPLAY)
+            with st.spinner("🔄 Searching official immigration guidelines..."):
+                next(events)  # retrieval finished
+
+            # The answer fields are shown as they are generated (decision first), then replaced
+            # by the formatted analysis
+            result = {}
+            labels = {"eligibility_status": "Eligibility Status", "confidence": "Confidence Score",
+                      "reason": "Reason for Decision", "future_steps": "Actions to Improve"}
+
+            def answer_tokens():
+                started = set()
+                for event in events:
+                    name = event.get("name")
+                    if event["type"] == "field_delta" and name in labels:
+                        if name not in started:
+                            started.add(name)
+                            yield f"**{labels[name]}:** "
+                        yield event["text"]
+                    elif event["type"] == "field" and name in labels:
+                        if name in started:
+                            yield "\n\n"
+                            continue
+                        started.add(name)
+                        value = event["value"]
+                        if isinstance(value, list):
+                            value = "".join(f"\n- {v}" for v in value) or "None"
+                        yield f"**{labels[name]}:** {value}\n\n"
+                    elif event["type"] == "final":
+                        result.update(event["answer"])
+
+            live = st.empty()
+            with live.container():
+                st.caption("✍️ Analyzing your eligibility...")
+                st.write_stream(answer_tokens())
+            live.empty()
             
             st.success("✅ Analysis completed successfully!")
             
             parsed = result.get("parsed", {})
             retrieved = result.get("retrieved", [])
             final_confidence = result.get('final_confidence', 0.0)
+            ttft_ms = result.get("timing", {}).get("ttft_ms")
 
             # Display results in an attractive layout
             st.markdown("---")
@@ -366,7 +401,7 @@ def live_query_tab():
             # 2. Metrics Display
             st.markdown("<h3 style='color:#1a1a1a;'>📊 Analysis Metrics</h3>", unsafe_allow_html=True)
             
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             
             with col1:
                 confidence_percent = f"{final_confidence * 100:.1f}%"
@@ -386,6 +421,16 @@ def live_query_tab():
                     <div>Official immigration guidelines</div>
                 </div>
                 """, unsafe_allow_html=True)
+
+            with col3:
+                first_token = f"{ttft_ms / 1000:.1f}s" if ttft_ms is not None else "—"
+                st.markdown(f"""
+                <div class="metric-card">
+                    <div class="metric-label">First Response</div>
+                    <div class="metric-value">{first_token}</div>
+                    <div>Time until the answer started</div>
+                </div>
+                """, unsafe_allow_html=True)
             
             # 3. Document References
             if retrieved:
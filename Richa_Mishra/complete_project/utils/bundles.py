@@ -0,0 +1,221 @@
+# utils/bundles.py
+#
+# Versioned index bundles. Each version is a complete, immutable directory:
+#
+#   Data/bundles/<version>/
+#       visa_embeddings.index   visa_embeddings.npy   visa_ids.npy
+#       visa_metadata.json      visa_chunks.json      visa_embeddings.manifest.json
+#
+# Data/bundles/CURRENT holds the name of the serving version. It is only ever replaced with
+# os.replace, so a reader sees either the old or the new name, never a partial write.
+# Data/bundles/HISTORY lists every version that was made current (newest last), for rollback.
+# Without a CURRENT pointer everything falls back to the legacy files directly under Data/;
+# rolling back past the first bundle removes CURRENT to get back there.
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+DATA_DIR = Path("Data")
+BUNDLES_DIR = DATA_DIR / "bundles"
+POINTER = BUNDLES_DIR / "CURRENT"
+HISTORY = BUNDLES_DIR / "HISTORY"
+
+INDEX_FILE = "visa_embeddings.index"
+VECTORS_FILE = "visa_embeddings.npy"
+IDS_FILE = "visa_ids.npy"
+METADATA_FILE = "visa_metadata.json"
+CHUNKS_FILE = "visa_chunks.json"
+
+
+# ------------------------------------------------------------
+# POINTER
+# ------------------------------------------------------------
+def current_version(bundles_dir: Path = BUNDLES_DIR) -> Optional[str]:
+    try:
+        version = (Path(bundles_dir) / "CURRENT").read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def bundle_dir(version: str, bundles_dir: Path = BUNDLES_DIR) -> Path:
+    return Path(bundles_dir) / version
+
+
+def list_versions(bundles_dir: Path = BUNDLES_DIR) -> List[str]:
+    bundles_dir = Path(bundles_dir)
+    if not bundles_dir.exists():
+        return []
+    return sorted(p.name for p in bundles_dir.iterdir() if (p / INDEX_FILE).exists())
+
+
+def history(bundles_dir: Path = BUNDLES_DIR) -> List[str]:
+    path = Path(bundles_dir) / "HISTORY"
+    if not path.exists():
+        return []
+    return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _atomic_write(path: Path, text: str):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def set_current(version: str, bundles_dir: Path = BUNDLES_DIR):
+    """Atomically points CURRENT at `version` and records it in HISTORY."""
+    bundles_dir = Path(bundles_dir)
+    if not (bundle_dir(version, bundles_dir) / INDEX_FILE).exists():
+        raise FileNotFoundError(f"Bundle '{version}' not found in {bundles_dir}")
+    _atomic_write(bundles_dir / "CURRENT", version + "\n")
+    _atomic_write(bundles_dir / "HISTORY", "\n".join(history(bundles_dir) + [version]) + "\n")
+
+
+def rollback(bundles_dir: Path = BUNDLES_DIR, data_dir: Path = DATA_DIR) -> Optional[str]:
+    """
+    Points CURRENT back at the version that was serving before the current one. Before the first
+    bundle the legacy Data/ files were serving: CURRENT is removed and None returned.
+    """
+    bundles_dir = Path(bundles_dir)
+    entries = history(bundles_dir)
+    current = current_version(bundles_dir)
+    previous = [v for v in entries if v != current and (bundle_dir(v, bundles_dir) / INDEX_FILE).exists()]
+    if not previous:
+        if current is None or not (Path(data_dir) / INDEX_FILE).exists():
+            raise RuntimeError("No earlier bundle to roll back to")
+        # Watchers see CURRENT disappear as a change to None and reload from Data/
+        os.remove(bundles_dir / "CURRENT")
+        _atomic_write(bundles_dir / "HISTORY", "")
+        return None
+    target = previous[-1]
+    _atomic_write(bundles_dir / "CURRENT", target + "\n")
+    # Drop the rolled-back version from the tail so a second rollback keeps going back
+    trimmed = entries[:len(entries) - entries[::-1].index(target)] if target in entries else entries
+    _atomic_write(bundles_dir / "HISTORY", "\n".join(trimmed) + "\n")
+    return target
+
+
+_UNSET = object()
+
+
+def serving_paths(bundles_dir: Path = BUNDLES_DIR, data_dir: Path = DATA_DIR,
+                  version=_UNSET) -> Dict[str, Path]:
+    """
+    File paths of the serving bundle (or the legacy Data/ files), as Retriever keyword args.
+    Pass `version` to resolve a version already read from CURRENT instead of re-reading it.
+    """
+    if version is _UNSET:
+        version = current_version(bundles_dir)
+    root = bundle_dir(version, bundles_dir) if version else Path(data_dir)
+    return {
+        "index_path": root / INDEX_FILE,
+        "vectors_path": root / VECTORS_FILE,
+        "ids_path": root / IDS_FILE,
+        "metadata_path": root / METADATA_FILE,
+        "chunks_path": root / CHUNKS_FILE,
+    }
+
+
+class BundleWatcher:
+    """
+    Polls CURRENT on a daemon thread and calls `on_change(version)` there whenever it names a
+    different version. Polling a single small file is portable (Windows included) and costs
+    microseconds per check.
+    """
+
+    def __init__(self, on_change: Callable[[Optional[str]], None], initial: Optional[str],
+                 interval: float = 2.0, bundles_dir: Path = BUNDLES_DIR):
+        self.on_change = on_change
+        self.version = initial
+        self.interval = interval
+        self.bundles_dir = bundles_dir
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bundle-watcher", daemon=True)
+
+    def start(self) -> "BundleWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            version = current_version(self.bundles_dir)
+            if version == self.version:
+                continue
+            try:
+                self.on_change(version)
+                self.version = version
+            except Exception as e:
+                # Keep serving the old snapshot; retry on the next poll
+                print(f"[bundles] Failed to load bundle {version}: {e}")
+
+
+def new_version_name(model_name: str) -> str:
+    slug = model_name.rsplit("/", 1)[-1].replace("#", "-")
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}"
+
+
+# ------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------
+def validate_bundle(root: Path, sample: int = 50) -> List[str]:
+    """
+    Consistency checks on a bundle directory. Returns a list of problems (empty = valid):
+    all files present, row counts agree, ids resolve to chunks, vectors are unit length,
+    manifest dims match the index, and stored vectors retrieve themselves as top-1.
+    """
+    import faiss
+    from utils.projection import read_manifest, load_projection
+
+    root = Path(root)
+    problems = []
+    for name in (INDEX_FILE, VECTORS_FILE, IDS_FILE, METADATA_FILE, CHUNKS_FILE):
+        if not (root / name).exists():
+            problems.append(f"missing {name}")
+    if problems:
+        return problems
+
+    index = faiss.read_index(str(root / INDEX_FILE))
+    vectors = np.load(root / VECTORS_FILE).astype("float32")
+    ids = np.load(root / IDS_FILE).astype("int64")
+    with open(root / METADATA_FILE, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    with open(root / CHUNKS_FILE, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    manifest = read_manifest(root / INDEX_FILE)
+
+    if not (index.ntotal == len(vectors) == len(ids) == len(metadata)):
+        problems.append(f"row counts differ: index={index.ntotal} vectors={len(vectors)} "
+                        f"ids={len(ids)} metadata={len(metadata)}")
+    missing = [int(i) for i in ids if str(int(i)) not in chunks]
+    if missing:
+        problems.append(f"{len(missing)} ids have no chunk text (e.g. {missing[:5]})")
+    norms = np.linalg.norm(vectors, axis=1)
+    if len(norms) and np.abs(norms - 1).max() > 1e-3:
+        problems.append(f"vectors are not unit length (max |norm-1| = {np.abs(norms - 1).max():.3g})")
+    if not manifest:
+        problems.append("missing index manifest")
+    elif manifest.get("index_dim") != index.d:
+        problems.append(f"manifest index_dim {manifest.get('index_dim')} != index dim {index.d}")
+
+    if not problems and len(ids):
+        projection = load_projection(root / INDEX_FILE)
+        rows = np.linspace(0, len(ids) - 1, min(sample, len(ids))).astype(int)
+        probe = vectors[rows] if projection is None else projection.apply(vectors[rows])
+        _, found = index.search(probe, 1)
+        hit_rate = float(np.mean(found[:, 0] == ids[rows]))
+        # Exact duplicates may return a twin first; anything far below 1.0 means a broken build
+        if hit_rate < 0.9:
+            problems.append(f"self-retrieval top-1 = {hit_rate:.2f} (expected >= 0.9)")
+    return problems
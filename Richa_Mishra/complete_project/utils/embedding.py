@@ -1,43 +1,58 @@
 # embedding.py
-import torch
+import os
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
+
+from utils.embedding_cache import shared_cache, encode_with_cache
+from utils.encoders import cache_id_for, get_encoder, MAX_SEQ_LENGTH, INGEST_MAX_LENGTH
 
 # Model: uses sentence-transformers MiniLM; we will do attention-aware mean pooling
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModel.from_pretrained(MODEL_NAME)
-model.eval()
+# "torch" keeps the AutoModel path (utils/encoders.AutoModelEncoder); "onnx" / "onnx-int8" use
+# the query encoders of utils/encoders.py
+ENCODER_BACKEND = os.getenv("SWIFTVISA_ENCODER", "torch").lower()
+
+# The AutoModel path truncates chunks at BERT's 512 positions. SentenceTransformer (query
+# encoder, migrate_index.py) stops at 256, which gives different vectors for most chunks, so
+# this path has its own cache id and its own embedding-server endpoint (/encode/automodel).
+INGEST_BACKEND = "automodel" if ENCODER_BACKEND == "torch" else {"int8": "onnx-int8"}.get(ENCODER_BACKEND, ENCODER_BACKEND)
+
+# On-disk cache keyed by (encoding path, model revision, text hash)
+embedding_cache = shared_cache(cache_id_for(INGEST_BACKEND, MODEL_NAME,
+                                            INGEST_MAX_LENGTH if INGEST_BACKEND == "automodel" else MAX_SEQ_LENGTH))
+
+
+def _encode_batch(texts):
+    """Encode a batch of texts → (n, dim) L2-normalized float32 matrix."""
+    # Through the embedding server's warm model when it runs, otherwise in-process (the
+    # weights are loaded on the first cache miss, so a fully cached run never loads them)
+    from utils.embedding_client import get_shared_encoder
+    return get_shared_encoder(INGEST_BACKEND, lazy=True).encode(texts, batch_size=len(texts))
 
-def mean_pooling(outputs, attention_mask):
+
+def _encode_automodel(texts):
+    """The default ingestion encoder, in-process: AutoModel, 512-token truncation, mean pooling."""
+    return get_encoder("automodel").encode(texts, batch_size=len(texts))
+
+
+def get_embeddings(texts, batch_size=32):
     """
-    Attention-aware mean pooling: sum token embeddings weighted by attention mask, then divide by valid tokens.
+    Return a (len(texts), dim) normalized float32 matrix.
+    Cached texts are read from the embedding cache; only misses run through the model.
     """
-    token_embeddings = outputs.last_hidden_state  # (batch_size, seq_len, hidden)
-    mask = attention_mask.unsqueeze(-1)          # (batch_size, seq_len, 1)
-    summed = (token_embeddings * mask).sum(dim=1)
-    counts = mask.sum(dim=1).clamp(min=1e-9)
-    return (summed / counts)
+    def encode_misses(missing):
+        return np.vstack([_encode_batch(missing[i:i + batch_size])
+                          for i in range(0, len(missing), batch_size)])
+
+    return encode_with_cache(list(texts), encode_misses, embedding_cache)
+
 
 def get_embedding(text_chunk):
     """
     Return a normalized float32 numpy vector for the input text_chunk.
     Normalized so that ||embedding|| == 1 (for inner-product = cosine).
     """
-    # Tokenize single example; keep it simple (not batched here)
-    inputs = tokenizer(text_chunk, return_tensors="pt", truncation=True, padding=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-
-    emb = mean_pooling(outputs, inputs['attention_mask']).squeeze(0).cpu().numpy()
-    # Ensure float32
-    emb = emb.astype("float32")
-    # Normalize (L2) for cosine similarity when using IndexFlatIP
-    norm = np.linalg.norm(emb)
-    if norm > 0:
-        emb = emb / norm
-    return emb
+    return get_embeddings([text_chunk])[0]
 
 def print_embedding_info(embedding):
     print("\n--- EMBEDDING INFORMATION ---")
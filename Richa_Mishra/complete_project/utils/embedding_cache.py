@@ -0,0 +1,313 @@
+# utils/embedding_cache.py
+
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Tuple, Callable
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = Path("Data") / "embedding_cache"
+KEY_BYTES = 32  # sha256 digest
+FLUSH_SECONDS = 30.0  # LRU ticks are written at most this often (and on eviction and exit)
+
+
+# ------------------------------------------------------------
+# MODEL REVISION (part of the cache key)
+# ------------------------------------------------------------
+def resolve_revision(model_name: str) -> str:
+    """
+    Commit hash of the locally cached Hugging Face snapshot for `model_name`,
+    found without loading the model. Returns "unknown" when it cannot be resolved.
+    """
+    repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        path = try_to_load_from_cache(repo_id, "config.json")
+        if isinstance(path, str):
+            return Path(path).parent.name
+    except Exception:
+        pass
+    return "unknown"
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _lock_file(fh):
+    fh.seek(0)
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(fh):
+    fh.seek(0)
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ------------------------------------------------------------
+# ON-DISK CACHE
+# ------------------------------------------------------------
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache for one (model id, model revision).
+
+    Layout inside <cache_dir>/<model>@<revision>/:
+        vectors.f32  fixed-width float32 rows (dim * 4 bytes each)
+        keys.bin     fixed-width 32-byte sha256(text) rows, aligned with vectors.f32
+        access.npy   last-use tick per row (LRU order), written on eviction, every
+                     FLUSH_SECONDS while the cache is in use, and at exit
+        meta.json    model id, revision, dim
+        generation   write counter; another process's writes show up as a new value
+        lock         held (flock / msvcrt) around every read and write
+    Rows of evicted entries are reused in place, so the files never exceed max_rows.
+    Several processes (Streamlit, main.py, migrate_index.py, the embedding server) can share
+    one cache: each takes the file lock and re-reads keys.bin when the generation changed.
+    """
+
+    def __init__(self, model_id: str, revision: str = None, cache_dir: Path = DEFAULT_CACHE_DIR,
+                 max_rows: int = 200_000):
+        self.model_id = model_id
+        self.revision = revision or resolve_revision(model_id)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_id}@{self.revision}")
+        self.dir = Path(cache_dir) / slug
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+
+        self._vectors_path = self.dir / "vectors.f32"
+        self._keys_path = self.dir / "keys.bin"
+        self._access_path = self.dir / "access.npy"
+        self._meta_path = self.dir / "meta.json"
+        self._generation_path = self.dir / "generation"
+        self._lockfile_path = self.dir / "lock"
+        self._lock = threading.Lock()
+        self._generation = None
+
+        self.dim = None
+        self._row_of = {}
+        self._keys: List[bytes] = []
+        self._access = np.zeros(0, dtype="uint64")
+        self._tick = 0
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        with self._locked():
+            pass
+        atexit.register(self._flush_at_exit)
+
+    # ---------------- persistence ---------------- #
+    @contextmanager
+    def _locked(self):
+        """Thread lock plus the cross-process file lock; reloads rows other processes wrote."""
+        with self._lock, open(self._lockfile_path, "a+b") as fh:
+            _lock_file(fh)
+            try:
+                generation = self._read_generation()
+                if generation != self._generation:
+                    self._load()
+                    self._generation = generation
+                yield
+            finally:
+                _unlock_file(fh)
+
+    def _read_generation(self) -> int:
+        try:
+            return int(self._generation_path.read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _bump_generation(self):
+        self._generation = self._read_generation() + 1
+        self._generation_path.write_text(str(self._generation))
+
+    def _load(self):
+        self.dim = None
+        self._keys, self._row_of = [], {}
+        self._access = np.zeros(0, dtype="uint64")
+        if self._meta_path.exists():
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f).get("dim")
+        if self.dim is None or not self._keys_path.exists():
+            return
+
+        raw = self._keys_path.read_bytes()
+        n_rows = min(len(raw) // KEY_BYTES, os.path.getsize(self._vectors_path) // (4 * self.dim))
+        self._keys = [raw[i * KEY_BYTES:(i + 1) * KEY_BYTES] for i in range(n_rows)]
+        self._row_of = {k: i for i, k in enumerate(self._keys)}
+
+        self._access = np.zeros(n_rows, dtype="uint64")
+        if self._access_path.exists():
+            saved = np.load(self._access_path)
+            self._access[:min(n_rows, len(saved))] = saved[:n_rows]
+        self._tick = int(self._access.max()) if n_rows else 0
+
+    def _write_meta(self):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model_id": self.model_id, "revision": self.revision, "dim": self.dim}, f)
+
+    def _save_access(self):
+        np.save(self._access_path, self._access)
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+    def _save_access_if_due(self):
+        """Called under the lock, so a due write costs no extra lock round trip."""
+        if self._dirty and time.monotonic() - self._flushed_at >= FLUSH_SECONDS:
+            self._save_access()
+
+    def flush(self):
+        """Persist LRU ticks (vectors and keys are written as they are added)."""
+        if self._dirty:
+            with self._locked():
+                self._save_access()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except OSError:
+            pass  # cache directory already removed
+
+    # ---------------- lookups ---------------- #
+    def __len__(self):
+        return len(self._row_of)
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Returns (vectors, missing): a (len(texts), dim) float32 matrix with cached rows
+        filled in, and the positions in `texts` that still need encoding.
+        """
+        with self._locked():
+            if self.dim is None:
+                self.misses += len(texts)
+                return np.zeros((len(texts), 0), dtype="float32"), list(range(len(texts)))
+
+            out = np.zeros((len(texts), self.dim), dtype="float32")
+            missing, found = [], []
+            for pos, text in enumerate(texts):
+                row = self._row_of.get(text_key(text))
+                if row is None:
+                    missing.append(pos)
+                else:
+                    found.append((pos, row))
+
+            if found:
+                vecs = np.memmap(self._vectors_path, dtype="float32", mode="r").reshape(-1, self.dim)
+                positions, rows = zip(*found)
+                out[list(positions)] = vecs[list(rows)]
+                self._tick += 1
+                self._access[list(rows)] = self._tick
+                self._dirty = True
+                self._save_access_if_due()
+
+            self.hits += len(found)
+            self.misses += len(missing)
+            return out, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype="float32")
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._write_meta()
+
+            new = {}
+            for text, vec in zip(texts, vectors):
+                key = text_key(text)
+                if key not in self._row_of:
+                    new[key] = vec
+            if not new:
+                return
+
+            size = len(self._keys)
+            rows = self._allocate_rows(len(new))
+            evicted = len(rows) > len(self._keys) - size
+            self._tick += 1
+            with open(self._vectors_path, "r+b" if self._vectors_path.exists() else "w+b") as vf, \
+                 open(self._keys_path, "r+b" if self._keys_path.exists() else "w+b") as kf:
+                for row, (key, vec) in zip(rows, new.items()):
+                    vf.seek(row * 4 * self.dim)
+                    vf.write(vec.tobytes())
+                    kf.seek(row * KEY_BYTES)
+                    kf.write(key)
+                    self._keys[row] = key
+                    self._row_of[key] = row
+                    self._access[row] = self._tick
+            self._dirty = True
+            if evicted:
+                # Other processes choose their victims from these ticks
+                self._save_access()
+            else:
+                self._save_access_if_due()
+            self._bump_generation()
+
+    def _allocate_rows(self, n: int) -> List[int]:
+        """Appends new rows up to max_rows, then recycles the least recently used ones."""
+        n = min(n, self.max_rows)
+        size = len(self._keys)
+        grow = min(n, self.max_rows - size)
+        rows = list(range(size, size + grow))
+        self._keys.extend([b""] * grow)
+        self._access = np.concatenate([self._access, np.zeros(grow, dtype="uint64")])
+
+        reuse = n - grow
+        if reuse > 0:
+            victims = np.argsort(self._access[:size], kind="stable")[:reuse]
+            for row in victims:
+                self._row_of.pop(self._keys[row], None)
+            rows.extend(int(r) for r in victims)
+        return rows
+
+    def stats(self) -> dict:
+        return {"rows": len(self), "hits": self.hits, "misses": self.misses, "dim": self.dim}
+
+
+@lru_cache(maxsize=None)
+def shared_cache(model_id: str, cache_dir: str = str(DEFAULT_CACHE_DIR)) -> EmbeddingCache:
+    """One EmbeddingCache per model and directory, shared by ingestion and query encoders."""
+    return EmbeddingCache(model_id, cache_dir=Path(cache_dir))
+
+
+# ------------------------------------------------------------
+# CACHED ENCODING
+# ------------------------------------------------------------
+def encode_with_cache(texts: List[str], encode_fn: Callable[[List[str]], np.ndarray],
+                      cache: EmbeddingCache = None) -> np.ndarray:
+    """
+    Encodes `texts`, running `encode_fn` (a batch encoder) only on cache misses.
+    Returns a float32 matrix aligned with `texts`.
+    """
+    if cache is None:
+        return np.asarray(encode_fn(list(texts)), dtype="float32")
+
+    vectors, missing = cache.get_many(texts)
+    if missing:
+        fresh = np.asarray(encode_fn([texts[i] for i in missing]), dtype="float32")
+        cache.put_many([texts[i] for i in missing], fresh)
+        if vectors.shape[1] == 0:
+            # empty cache: every text was a miss, the width is only known now
+            vectors = np.zeros((len(texts), fresh.shape[1]), dtype="float32")
+        vectors[missing] = fresh
+    return vectors
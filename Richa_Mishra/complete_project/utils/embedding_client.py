@@ -0,0 +1,137 @@
+# utils/embedding_client.py
+#
+# Client for utils/embedding_server.py with the same interface as utils/encoders.py:
+#     encoder.encode(texts, batch_size=32) -> (n, dim) float32 matrix
+# When the daemon is not running (or stops answering) it falls back to loading the
+# encoder in-process, and tries the daemon again after RETRY_SECONDS.
+
+import os
+import json
+import time
+import threading
+import http.client
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from utils.encoders import get_encoder
+
+DEFAULT_HOST = os.getenv("SWIFTVISA_EMBED_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("SWIFTVISA_EMBED_PORT", "8765"))
+DEFAULT_BACKEND = os.getenv("SWIFTVISA_ENCODER", "torch").lower()
+CONNECT_TIMEOUT = 0.5
+REQUEST_TIMEOUT = 60.0
+RETRY_SECONDS = 30.0
+
+
+class SharedEncoder:
+    """
+    Encodes through the local embedding daemon when one is serving `backend`,
+    otherwise in-process via utils.encoders.get_encoder(backend).
+    With lazy=True the in-process encoder is only loaded on the first encode that needs it.
+    """
+
+    def __init__(self, backend: str = None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 lazy: bool = False):
+        self.backend = (backend or DEFAULT_BACKEND).lower()
+        self.host = host
+        self.port = port
+        self._local = None
+        self._conn = threading.local()
+        self._retry_at = 0.0
+        self.remote = False
+
+        # The static backend searches its own re-embedded index. Its paths are this process's
+        # files, never the daemon's (which may run from another directory)
+        if self.backend == "static":
+            from utils.static_encoder import STATIC_DIR, STATIC_INDEX, STATIC_VECTORS
+            self.index_path = STATIC_DIR / STATIC_INDEX
+            self.vectors_path = STATIC_DIR / STATIC_VECTORS
+
+        if not self.available() and not lazy:
+            self._use_local()
+
+    # ---------------- daemon ---------------- #
+    def _connection(self, timeout: float) -> http.client.HTTPConnection:
+        conn = getattr(self._conn, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            self._conn.conn = conn
+        conn.timeout = timeout
+        if conn.sock is not None:
+            # http.client only applies .timeout when it connects; a kept-alive socket keeps
+            # the timeout it was opened with (the 0.5 s probe) unless it is set again
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._conn, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._conn.conn = None
+
+    def _probe(self) -> Optional[dict]:
+        """Health check; returns the daemon's info if it serves our backend (main or extra endpoint)."""
+        try:
+            conn = self._connection(CONNECT_TIMEOUT)
+            conn.request("GET", "/health")
+            resp = conn.getresponse()
+            info = json.loads(resp.read().decode("utf-8"))
+        except (OSError, http.client.HTTPException, ValueError):
+            self._drop_connection()
+            return None
+        cache_id = info.get("backends", {}).get(self.backend) if resp.status == 200 else None
+        if cache_id is None:
+            return None
+        self.model_name = info["model"]
+        self.cache_id = cache_id
+        return info
+
+    def available(self) -> bool:
+        """True if the daemon is serving; re-checks at most every RETRY_SECONDS after a miss."""
+        if not self.remote and time.monotonic() >= self._retry_at:
+            self.remote = self._probe() is not None
+            self._retry_at = time.monotonic() + RETRY_SECONDS
+        return self.remote
+
+    def _encode_remote(self, texts: List[str]) -> np.ndarray:
+        conn = self._connection(REQUEST_TIMEOUT)
+        body = json.dumps({"texts": texts}).encode("utf-8")
+        conn.request("POST", f"/encode/{self.backend}", body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        data = resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"embedding server error {resp.status}: {data[:200]!r}")
+        rows, dim = int(resp.getheader("X-Rows")), int(resp.getheader("X-Dim"))
+        return np.frombuffer(data, dtype="<f4").reshape(rows, dim).astype("float32")
+
+    # ---------------- in-process fallback ---------------- #
+    def _use_local(self):
+        if self._local is None:
+            self._local = get_encoder(self.backend)
+            self.model_name = self._local.model_name
+            self.cache_id = self._local.cache_id
+        return self._local
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+
+        if self.available():
+            try:
+                return self._encode_remote(texts)
+            except (OSError, http.client.HTTPException, RuntimeError) as e:
+                print(f"[embedding_client] Daemon unavailable ({e}); encoding in-process.")
+                self._drop_connection()
+                self.remote = False
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+
+        return self._use_local().encode(texts, batch_size=batch_size, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_shared_encoder(backend: str = None, lazy: bool = False) -> SharedEncoder:
+    """Process-wide SharedEncoder for `backend`."""
+    return SharedEncoder(backend, lazy=lazy)
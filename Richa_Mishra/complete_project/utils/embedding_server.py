@@ -0,0 +1,187 @@
+# utils/embedding_server.py
+#
+# Long-lived local embedding daemon: one warm encoder (utils/encoders.py backend) shared by
+# every front-end and migrate_index.py run on this machine, plus the 512-token AutoModel encoder
+# used by main.py's default torch ingestion (its vectors differ from the 256-token query ones,
+# so it has its own endpoint and cache; its weights are loaded on its first request).
+#
+#   POST /encode            body: {"texts": [...]}  ->  raw little-endian float32 rows
+#                           (headers X-Rows / X-Dim give the shape)
+#   POST /encode/<backend>  same, for one of the backends listed by /health
+#   GET  /health            {"model", "backend", "cache_id", "dim", "backends": {backend: cache_id}, ...}
+#
+# Requests that arrive together are coalesced into one encoder call by the micro-batcher.
+# Start from the project root:  python -m utils.embedding_server [port]
+
+import os
+import sys
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+from utils.encoders import get_encoder, cache_id_for, INGEST_MAX_LENGTH
+from utils.embedding_cache import shared_cache, encode_with_cache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.getenv("SWIFTVISA_EMBED_PORT", "8765"))
+MAX_BATCH = 64          # texts per coalesced encoder call
+MAX_WAIT_SECONDS = 0.005  # how long the first request waits for company
+
+
+# ------------------------------------------------------------
+# MICRO-BATCHER
+# ------------------------------------------------------------
+class _Job:
+    __slots__ = ("texts", "done", "result", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Single encoder thread; concurrent submit() calls are merged into shared batches."""
+
+    def __init__(self, encode_fn, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT_SECONDS):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> np.ndarray:
+        job = _Job(texts)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            size = len(jobs[0].texts)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                size += len(job.texts)
+
+            texts = [t for job in jobs for t in job.texts]
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype="float32")
+                offset = 0
+                for job in jobs:
+                    job.result = vectors[offset:offset + len(job.texts)]
+                    offset += len(job.texts)
+            except Exception as e:
+                for job in jobs:
+                    job.error = e
+            self.batches += 1
+            self.requests += len(jobs)
+            for job in jobs:
+                job.done.set()
+
+
+# ------------------------------------------------------------
+# HTTP SERVER
+# ------------------------------------------------------------
+class EmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, backend: str = None):
+        self.encoder = get_encoder(backend)
+        cache = shared_cache(self.encoder.cache_id)
+        self.batcher = MicroBatcher(lambda texts: encode_with_cache(texts, self.encoder.encode, cache))
+        self.dim = int(self.encoder.encode(["warm up"]).shape[1])
+        self.batchers = {self.encoder.backend: self.batcher}
+        self.cache_ids = {self.encoder.backend: self.encoder.cache_id}
+        if self.encoder.backend != "automodel":
+            ingest_id = cache_id_for("automodel", self.encoder.model_name, INGEST_MAX_LENGTH)
+            ingest_cache = shared_cache(ingest_id)
+            self.batchers["automodel"] = MicroBatcher(lambda texts: encode_with_cache(
+                texts, get_encoder("automodel", self.encoder.model_name).encode, ingest_cache))
+            self.cache_ids["automodel"] = ingest_id
+        super().__init__((host, port), _Handler)
+
+    def health(self) -> dict:
+        info = {
+            "model": self.encoder.model_name,
+            "backend": self.encoder.backend,
+            "cache_id": self.encoder.cache_id,
+            "dim": self.dim,
+            "backends": self.cache_ids,
+            "batches": sum(b.batches for b in self.batchers.values()),
+            "requests": sum(b.requests for b in self.batchers.values()),
+        }
+        return info
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, clients reuse one connection
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, json.dumps(self.server.health()).encode("utf-8"), "application/json")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        backend = self.server.encoder.backend if self.path == "/encode" else self.path[len("/encode/"):]
+        batcher = self.server.batchers.get(backend) if self.path.startswith("/encode") else None
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)  # read even when refusing, so the kept-alive socket stays in sync
+        if batcher is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        try:
+            texts = json.loads(body.decode("utf-8"))["texts"]
+            vectors = np.ascontiguousarray(batcher.submit(list(texts)), dtype="<f4")
+        except Exception as e:
+            self._send(500, str(e).encode("utf-8"), "text/plain")
+            return
+        self._send(200, vectors.tobytes(), "application/octet-stream",
+                   {"X-Rows": vectors.shape[0], "X-Dim": vectors.shape[1]})
+
+    def log_message(self, format, *args):
+        pass  # one line per query would drown the console
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, backend: str = None):
+    server = EmbeddingServer(host, port, backend)
+    info = server.health()
+    print(f"🧠 Embedding server ready on http://{host}:{port} ({info['model']}, {info['backend']}, dim={info['dim']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
@@ -0,0 +1,250 @@
+# utils/encoders.py
+#
+# Interchangeable MiniLM query/chunk encoders behind one interface:
+#     encoder.encode(texts, batch_size=32) -> (n, 384) L2-normalized float32 matrix
+# Backends: "torch" (sentence-transformers), "onnx" (onnxruntime, fp32), "onnx-int8"
+# (dynamically quantized), "static" (distilled token table, see utils/static_encoder.py),
+# "automodel" (the 512-token ingestion encoder that built the index, see utils/embedding.py).
+# Select with the SWIFTVISA_ENCODER environment variable.
+# onnx/onnxruntime are not in requirements.txt until Test_Debug/encoder_parity.py has passed
+# against the encoder that built the index; install them by hand to try the ONNX backends.
+
+import os
+import time
+import inspect
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256  # sentence-transformers' max_seq_length for all-MiniLM-L6-v2
+INGEST_MAX_LENGTH = 512  # BERT's position limit, where the AutoModel ingestion path truncates
+ONNX_DIR = Path("models") / "onnx"
+DEFAULT_BACKEND = os.getenv("SWIFTVISA_ENCODER", "torch")
+
+
+def cache_id_for(backend, model_name=MODEL_NAME, max_length=MAX_SEQ_LENGTH):
+    """
+    Embedding-cache id of an encoding path: model, backend (pooling implementation) and the
+    token length inputs are truncated to. Paths that produce different vectors for the same
+    text (e.g. 256- vs 512-token truncation of long chunks) must never share a cache.
+    """
+    if backend == "static":
+        return f"{model_name}#static"          # whole text, no truncation
+    return f"{model_name}#{backend}-{max_length}"
+
+
+def _normalize(mat):
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return (mat / np.clip(norms, 1e-12, None)).astype("float32")
+
+
+# ------------------------------------------------------------
+# TORCH (reference) BACKEND
+# ------------------------------------------------------------
+class TorchEncoder:
+    backend = "torch"
+
+    def __init__(self, model_name=MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.cache_id = cache_id_for("torch", model_name, self.model.max_seq_length)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        emb = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+        return _normalize(np.asarray(emb, dtype="float32"))
+
+
+# ------------------------------------------------------------
+# AUTOMODEL (ingestion) BACKEND
+# ------------------------------------------------------------
+def mean_pooling(outputs, attention_mask):
+    """
+    Attention-aware mean pooling: sum token embeddings weighted by attention mask, then divide by valid tokens.
+    """
+    token_embeddings = outputs.last_hidden_state  # (batch_size, seq_len, hidden)
+    mask = attention_mask.unsqueeze(-1)          # (batch_size, seq_len, 1)
+    summed = (token_embeddings * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return (summed / counts)
+
+
+class AutoModelEncoder:
+    """The encoder that built the index: AutoModel, 512-token truncation, mean pooling."""
+    backend = "automodel"
+
+    def __init__(self, model_name=MODEL_NAME, max_length=INGEST_MAX_LENGTH):
+        from transformers import AutoTokenizer, AutoModel
+        self.model_name = model_name
+        self.max_length = max_length
+        self.cache_id = cache_id_for("automodel", model_name, max_length)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    def _encode_batch(self, texts):
+        import torch
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, max_length=self.max_length,
+                                padding=True)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        return _normalize(mean_pooling(outputs, inputs["attention_mask"]).cpu().numpy())
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 384), dtype="float32")
+        return np.vstack([self._encode_batch(texts[i:i + batch_size])
+                          for i in range(0, len(texts), batch_size)])
+
+
+# ------------------------------------------------------------
+# ONNX RUNTIME BACKEND
+# ------------------------------------------------------------
+def _hidden_state_module(model):
+    """Wraps the HF model so tracing sees plain keyword inputs and a single tensor output."""
+    import torch
+
+    class HiddenState(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    return HiddenState(model)
+
+
+def export_onnx(model_name=MODEL_NAME, out_dir=ONNX_DIR, quantize=False):
+    """
+    Export the transformer to ONNX (plus tokenizer.json) once; optionally write a
+    dynamic int8 quantized copy. Returns the path of the requested model file.
+    """
+    out_dir = Path(out_dir)
+    fp32_path = out_dir / "model.onnx"
+    int8_path = out_dir / "model-int8.onnx"
+
+    if not fp32_path.exists():
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+
+        sample = tokenizer(["SwiftVisa export sample"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        dynamic = {n: {0: "batch", 1: "seq"} for n in names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+        export_kwargs = dict(input_names=names, output_names=["last_hidden_state"],
+                             dynamic_axes=dynamic, opset_version=14)
+        # Newer torch defaults to the dynamo exporter (needs onnxscript); keep the TorchScript one
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(_hidden_state_module(model), tuple(sample[n] for n in names),
+                              str(fp32_path), **export_kwargs)
+        # Fast-tokenizer file lets the ONNX backend start without transformers/torch
+        tokenizer.backend_tokenizer.save(str(out_dir / "tokenizer.json"))
+        print(f"📦 Exported ONNX encoder → {fp32_path}")
+
+    if quantize and not int8_path.exists():
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        print(f"📦 Quantized ONNX encoder (int8) → {int8_path}")
+
+    return int8_path if quantize else fp32_path
+
+
+class OnnxEncoder:
+    def __init__(self, model_name=MODEL_NAME, onnx_dir=ONNX_DIR, quantize=False, num_threads=None,
+                 max_length=MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.backend = "onnx-int8" if quantize else "onnx"
+        self.cache_id = cache_id_for(self.backend, model_name, max_length)
+
+        model_path = export_onnx(model_name, onnx_dir, quantize=quantize)
+        self.tokenizer = Tokenizer.from_file(str(Path(onnx_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encs = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encs], dtype="int64")
+        mask = np.array([e.attention_mask for e in encs], dtype="int64")
+        feeds = {"input_ids": ids, "attention_mask": mask,
+                 "token_type_ids": np.array([e.type_ids for e in encs], dtype="int64")}
+        feeds = {k: v for k, v in feeds.items() if k in self._input_names}
+
+        hidden = self.session.run(None, feeds)[0]
+        # Attention-aware mean pooling, same as mean_pooling above
+        m = mask[..., None].astype("float32")
+        pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+        return _normalize(pooled)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 384), dtype="float32")
+        return np.vstack([self._encode_batch(texts[i:i + batch_size])
+                          for i in range(0, len(texts), batch_size)])
+
+
+# ------------------------------------------------------------
+# FACTORY
+# ------------------------------------------------------------
+def load_encoder(backend=None, model_name=None):
+    """
+    Build a fresh encoder for `backend` (defaults to SWIFTVISA_ENCODER or "torch").
+    `model_name` selects another sentence-transformers model (e.g. all-mpnet-base-v2)
+    for the torch, onnx and automodel backends.
+    """
+    backend = (backend or DEFAULT_BACKEND).lower()
+    model_name = model_name or MODEL_NAME
+    onnx_dir = ONNX_DIR if model_name == MODEL_NAME else ONNX_DIR / model_name.rsplit("/", 1)[-1]
+    t0 = time.perf_counter()
+    if backend == "torch":
+        encoder = TorchEncoder(model_name)
+    elif backend == "onnx":
+        encoder = OnnxEncoder(model_name, onnx_dir, quantize=False)
+    elif backend in ("onnx-int8", "int8"):
+        encoder = OnnxEncoder(model_name, onnx_dir, quantize=True)
+    elif backend == "automodel":
+        encoder = AutoModelEncoder(model_name)
+    elif backend == "static":
+        if model_name != MODEL_NAME:
+            raise ValueError("The static encoder is distilled from all-MiniLM-L6-v2 only")
+        from utils.static_encoder import StaticEncoder
+        encoder = StaticEncoder()
+    else:
+        raise ValueError(f"Unknown encoder backend '{backend}' (use torch, onnx, onnx-int8, static or automodel)")
+    encoder.startup_seconds = time.perf_counter() - t0
+    return encoder
+
+
+@lru_cache(maxsize=None)
+def get_encoder(backend=None, model_name=None):
+    """Process-wide encoder for (`backend`, `model_name`), loaded once."""
+    return load_encoder(backend, model_name)
@@ -0,0 +1,100 @@
+# utils/projection.py
+#
+# Learned linear projection of the stored vectors (384 -> 64..192 dims), fitted on the corpus
+# at build time and applied to both the index and every query vector.
+#   "pca"    : top principal directions of the centered corpus
+#   "whiten" : same directions, each scaled to unit variance (PCA whitening). This changes the
+#              similarity itself, so it agrees less with full-width cosine search; compare both
+#              with Test_Debug/projection_report.py before choosing
+# Projected vectors are re-normalized, so the index stays an inner-product (cosine) index.
+# The corpus mean is only used to find the directions; it is not subtracted when projecting,
+# because centering changes which chunks are nearest in cosine terms (recall drops ~15 points).
+
+import json
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class Projection:
+    method: str
+    matrix: np.ndarray    # (in_dim, out_dim)
+
+    @property
+    def in_dim(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def out_dim(self) -> int:
+        return int(self.matrix.shape[1])
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        x = np.asarray(vectors, dtype="float32")
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        y = x @ self.matrix
+        norms = np.linalg.norm(y, axis=1, keepdims=True)
+        return np.ascontiguousarray(y / np.clip(norms, 1e-12, None), dtype="float32")
+
+    def save(self, path: Path) -> str:
+        """Writes the .npz and returns its sha256 (recorded in the index manifest)."""
+        np.savez(str(path), method=self.method, matrix=self.matrix)
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+    @classmethod
+    def load(cls, path: Path) -> "Projection":
+        data = np.load(str(path))
+        return cls(str(data["method"]), data["matrix"].astype("float32"))
+
+
+def fit_projection(vectors: np.ndarray, dim: int, method: str = "pca") -> Projection:
+    x = np.asarray(vectors, dtype="float64")
+    if dim >= x.shape[1]:
+        raise ValueError(f"Projection dim {dim} must be smaller than the vector dim {x.shape[1]}")
+    if method not in ("pca", "whiten"):
+        raise ValueError(f"Unknown projection method '{method}' (use pca or whiten)")
+
+    mean = x.mean(axis=0)
+    _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+    matrix = vt[:dim].T
+    if method == "whiten":
+        std = s[:dim] / np.sqrt(max(len(x) - 1, 1))
+        matrix = matrix / np.clip(std, 1e-6, None)
+    return Projection(method, matrix.astype("float32"))
+
+
+# ------------------------------------------------------------
+# INDEX MANIFEST
+# ------------------------------------------------------------
+def manifest_path_for(index_path: Path) -> Path:
+    """Data/visa_embeddings.index -> Data/visa_embeddings.manifest.json"""
+    index_path = Path(index_path)
+    return index_path.with_name(index_path.stem + ".manifest.json")
+
+
+def read_manifest(index_path: Path) -> dict:
+    path = manifest_path_for(index_path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(index_path: Path, manifest: dict):
+    with open(manifest_path_for(index_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_projection(index_path: Path) -> Optional[Projection]:
+    """Projection recorded in the index's manifest, or None for a full-width index."""
+    info = read_manifest(index_path).get("projection")
+    if not info:
+        return None
+    path = Path(index_path).with_name(info["file"])
+    if hashlib.sha256(path.read_bytes()).hexdigest() != info["sha256"]:
+        raise ValueError(f"Projection file {path} does not match the index manifest")
+    return Projection.load(path)
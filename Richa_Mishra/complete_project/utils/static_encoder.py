@@ -0,0 +1,126 @@
+# utils/static_encoder.py
+#
+# Torch-free static-embedding encoder distilled from all-MiniLM-L6-v2 (model2vec style).
+# Every WordPiece token seen in our visa corpus gets one vector: the MiniLM output for that
+# token on its own, scaled by a SIF frequency weight. Encoding a text is then a table lookup
+# plus a weighted mean - numpy and `tokenizers` only, well under a millisecond per query.
+#
+# Build once (needs torch):  python -m utils.static_encoder
+# Use:                       SWIFTVISA_ENCODER=static
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from utils.encoders import cache_id_for
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+STATIC_DIR = Path("models") / "static"
+TABLE_NPY = "static_minilm.npy"
+TOKENIZER_JSON = "tokenizer.json"
+STATIC_INDEX = "visa_embeddings_static.index"
+STATIC_VECTORS = "visa_embeddings_static.npy"
+SIF_A = 1e-3
+
+
+class StaticEncoder:
+    backend = "static"
+
+    def __init__(self, static_dir=STATIC_DIR):
+        from tokenizers import Tokenizer
+
+        static_dir = Path(static_dir)
+        self.model_name = MODEL_NAME
+        self.cache_id = cache_id_for("static", MODEL_NAME)
+        self.table = np.load(static_dir / TABLE_NPY).astype("float32")
+        self.tokenizer = Tokenizer.from_file(str(static_dir / TOKENIZER_JSON))
+        self.tokenizer.no_padding()
+        self.tokenizer.no_truncation()
+
+        # Index re-embedded with this encoder (same ids/metadata as Data/visa_embeddings.index)
+        self.index_path = static_dir / STATIC_INDEX
+        self.vectors_path = static_dir / STATIC_VECTORS
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        encs = self.tokenizer.encode_batch(list(texts), add_special_tokens=False)
+
+        dim = self.table.shape[1]
+        out = np.zeros((len(encs), dim), dtype="float32")
+        lengths = np.array([len(e.ids) for e in encs])
+        if lengths.sum():
+            ids = np.concatenate([e.ids for e in encs if e.ids]).astype("int64")
+            starts = np.concatenate([[0], np.cumsum(lengths[lengths > 0])[:-1]])
+            out[lengths > 0] = np.add.reduceat(self.table[ids], starts, axis=0)
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.clip(norms, 1e-12, None)
+
+
+# ------------------------------------------------------------
+# DISTILLATION
+# ------------------------------------------------------------
+def distill(texts, out_dir=STATIC_DIR, model_name=MODEL_NAME, batch_size=512):
+    """
+    Build the token table from the vocabulary of `texts`.
+    Tokens that never occur in our corpus keep a zero row (they are ignored at query time).
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    counts = np.zeros(tokenizer.vocab_size, dtype="float64")
+    for text in texts:
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        np.add.at(counts, ids, 1)
+    vocab = np.flatnonzero(counts)
+    print(f"🔤 Distilling {len(vocab)} corpus tokens (of {tokenizer.vocab_size})")
+
+    table = np.zeros((tokenizer.vocab_size, model.config.hidden_size), dtype="float32")
+    cls, sep = tokenizer.cls_token_id, tokenizer.sep_token_id
+    for i in range(0, len(vocab), batch_size):
+        batch = vocab[i:i + batch_size]
+        input_ids = torch.tensor([[cls, int(t), sep] for t in batch])
+        with torch.no_grad():
+            hidden = model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids)).last_hidden_state
+        # Same mean pooling MiniLM applies to a one-token sentence
+        table[batch] = hidden.mean(dim=1).cpu().numpy()
+
+    # SIF weighting: frequent tokens ("the", "visa") contribute less to the mean
+    probs = counts / counts.sum()
+    table *= (SIF_A / (SIF_A + probs))[:, None].astype("float32")
+
+    np.save(out_dir / TABLE_NPY, table.astype("float16"))
+    tokenizer.backend_tokenizer.save(str(out_dir / TOKENIZER_JSON))
+    print(f"📦 Static encoder saved → {out_dir / TABLE_NPY}")
+
+
+def build_static_index(chunks: dict, out_dir=STATIC_DIR):
+    """Re-embed the chunk store with the static encoder into an index with the same ids."""
+    import faiss
+
+    encoder = StaticEncoder(out_dir)
+    ids = np.array([int(k) for k in chunks], dtype="int64")
+    vectors = encoder.encode([chunks[k] for k in chunks]).astype("float32")
+
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+    index.add_with_ids(vectors, ids)
+    faiss.write_index(index, str(encoder.index_path))
+    np.save(encoder.vectors_path, vectors)
+    print(f"📦 Static index saved → {encoder.index_path} ({len(ids)} vectors)")
+
+
+if __name__ == "__main__":
+    with open("Data/visa_chunks.json", "r", encoding="utf-8") as f:
+        chunk_store = json.load(f)
+
+    # Corpus only: user_queries.json is the evaluation set (Test_Debug/static_encoder_report.py)
+    distill(list(chunk_store.values()))
+    build_static_index(chunk_store)
@@ -0,0 +1,46 @@
+# utils/token_count.py
+#
+# Token counts for the prompt context budget (rag/prompt_builder.py) and for the per-chunk
+# counts stored in the index metadata at ingestion. Point SWIFTVISA_TOKENIZER at the
+# tokenizer.json (or Hugging Face repo id) of the model that answers to count its real tokens;
+# without it, counts are estimated at CHARS_PER_TOKEN characters per token (Gemini's documented
+# average for English text). Stored counts record which tokenizer produced them, so a change
+# of tokenizer is noticed and they are recounted.
+#
+#   SWIFTVISA_TOKENIZER   path to tokenizer.json, or a Hugging Face repo id ("" = estimate)
+
+import os
+import math
+from functools import lru_cache
+from pathlib import Path
+
+CHARS_PER_TOKEN = 4.0
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    name = os.getenv("SWIFTVISA_TOKENIZER", "").strip()
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        return Tokenizer.from_file(name) if Path(name).is_file() else Tokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"[token_count] Tokenizer {name} unavailable ({e}); estimating token counts.")
+        return None
+
+
+def tokenizer_id() -> str:
+    """Which counter count_tokens uses: the SWIFTVISA_TOKENIZER name, or "chars/4"."""
+    return os.getenv("SWIFTVISA_TOKENIZER", "").strip() if _tokenizer() is not None \
+        else f"chars/{CHARS_PER_TOKEN:g}"
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` (no special tokens added)."""
+    if not text:
+        return 0
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
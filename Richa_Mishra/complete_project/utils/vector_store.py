@@ -4,6 +4,9 @@ import os
 import json
 import numpy as np
 import faiss
+from pathlib import Path
+
+from utils.projection import fit_projection, write_manifest
 
 
 # ---------------------------------------------------------
@@ -14,17 +17,26 @@ def build_faiss_index(
         index_path="visa_embeddings.index",
         metadata_path="visa_metadata.json",
         vectors_npy="visa_embeddings.npy",
-        ids_npy="visa_ids.npy"
+        ids_npy="visa_ids.npy",
+        model_name=None,
+        projection_dim=None,
+        projection_method="pca",
+        manifest_extra=None
     ):
     """
     Build a FAISS index from SentenceTransformer embeddings.
 
     Parameters:
         embeddings  -> list of dicts {unique_id, chunk_id, source, embedding}
+                       (optionally tokens + tokenizer, kept in the metadata)
         index_path  -> where FAISS index will be stored
         metadata_path -> where metadata JSON will be stored
         vectors_npy  -> npy file for raw vectors
         ids_npy      -> npy file for vector IDs
+        model_name   -> embedding model, recorded in the index manifest
+        projection_dim    -> optional reduced dim (e.g. 128); the index then holds projected vectors
+        projection_method -> "pca" or "whiten" (see utils/projection.py)
+        manifest_extra    -> extra fields for the index manifest (bundle version, query backend, ...)
 
     Returns:
         vectors, metadata, ids
@@ -40,12 +52,20 @@ def build_faiss_index(
     # Normalize for cosine similarity (required for IndexFlatIP)
     faiss.normalize_L2(vectors)
 
+    # Optional learned projection; vectors_npy keeps the full-width vectors
+    projection = None
+    index_vectors = vectors
+    if projection_dim:
+        projection = fit_projection(vectors, int(projection_dim), projection_method)
+        index_vectors = projection.apply(vectors)
+        print(f"🔻 Projected {dim} → {projection.out_dim} dims ({projection_method})")
+
     # Build inner-product index
-    index = faiss.IndexFlatIP(dim)
+    index = faiss.IndexFlatIP(index_vectors.shape[1])
 
     # ID-mapped index (so FAISS returns your chunk IDs)
     id_index = faiss.IndexIDMap(index)
-    id_index.add_with_ids(vectors, ids)
+    id_index.add_with_ids(index_vectors, ids)
 
     # Save FAISS index
     faiss.write_index(id_index, str(index_path))
@@ -58,7 +78,9 @@ def build_faiss_index(
     metadata = {
         str(e["unique_id"]): {
             "source": e["source"],
-            "chunk_id": e["chunk_id"]
+            "chunk_id": e["chunk_id"],
+            # Token count of the chunk text, for the prompt context budget (utils/token_count.py)
+            **({"tokens": e["tokens"], "tokenizer": e["tokenizer"]} if "tokens" in e else {})
         }
         for e in embeddings
     }
@@ -66,6 +88,28 @@ def build_faiss_index(
     with open(str(metadata_path), "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2, ensure_ascii=False)
 
+    # Manifest: what the index holds and how queries must be transformed to search it
+    index_path = Path(index_path)
+    manifest = {
+        "index": index_path.name,
+        "model": model_name,
+        "metric": "ip",
+        "rows": int(vectors.shape[0]),
+        "vector_dim": int(dim),
+        "index_dim": int(index_vectors.shape[1]),
+        "projection": None,
+    }
+    if projection is not None:
+        proj_file = index_path.with_name(index_path.stem + ".projection.npz")
+        manifest["projection"] = {
+            "method": projection.method,
+            "dim": projection.out_dim,
+            "file": proj_file.name,
+            "sha256": projection.save(proj_file),
+        }
+    manifest.update(manifest_extra or {})
+    write_manifest(index_path, manifest)
+
     print(f"📦 FAISS index saved → {index_path}")
     print(f"📄 Metadata saved → {metadata_path}")
 
@@ -1,18 +1,17 @@
 import os
 from pypdf import PdfReader
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from gemini_embed_ingest import embed_texts
 
 # Load .env
 load_dotenv()
 
-# Configure Gemini
+# Gemini key (read by gemini_embed_ingest)
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_KEY is None:
     raise RuntimeError("GEMINI_API_KEY missing in .env")
 
-genai.configure(api_key=GEMINI_KEY)
-
 # ------------------------
 # 1. Read PDF
 # ------------------------
@@ -55,18 +54,12 @@ def generate_embeddings(chunks, output_name):
     save_dir = "embeddings_output"
     os.makedirs(save_dir, exist_ok=True)
 
-    all_embeddings = []
-
-    for idx, chunk in enumerate(chunks):
-        print(f"Embedding chunk {idx+1}/{len(chunks)} ...")
-
-        response = genai.embed_content(
-            model="models/text-embedding-004",
-            content=chunk
-        )
-
-        emb = response["embedding"]
-        all_embeddings.append(emb)
+    # Batched + rate-limited; finished batches are checkpointed so a rerun resumes
+    all_embeddings = embed_texts(
+        chunks,
+        store=os.path.join(save_dir, f"{output_name}_store"),
+        model="models/text-embedding-004",
+    )
 
     # Save to file
     out_path = os.path.join(save_dir, f"{output_name}_embeddings.txt")
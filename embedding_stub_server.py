@@ -0,0 +1,153 @@
+"""
+Local stand-in for the Gemini batchEmbedContents endpoint, for exercising
+gemini_embed_ingest.py without a key or quota.
+
+    python embedding_stub_server.py --port 8090 --latency 0.2 --rpm 60 --error-rate 0.1
+    GEMINI_API_BASE=http://127.0.0.1:8090/v1beta python chunk_pdf.py
+
+- every request sleeps `latency` seconds (plus jitter)
+- more than `rpm` requests in a rolling minute, or a random `error-rate` draw, answers 429
+  with the delay in the body (RetryInfo.retryDelay, no Retry-After header), like the real API
+- vectors are deterministic per text (seeded by its hash), so reruns are comparable
+
+`python embedding_stub_server.py --selftest` runs an ingestion against the stub, kills it
+halfway with a hard quota, and checks that the resumed run only sends the missing rows.
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import numpy as np
+
+DIM = 768
+
+
+def stub_vector(text, dim=DIM):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=8090, latency=0.2, rpm=60, error_rate=0.0, quota=None):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.quota = quota          # total successful requests before every call is a 429
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.served = 0
+        self.texts_served = 0
+        self.throttled = 0
+
+    def admit(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if (self.quota is not None and self.served >= self.quota) or len(self.recent) >= self.rpm \
+                    or random.random() < self.error_rate:
+                self.throttled += 1
+                return False
+            self.recent.append(now)
+            self.served += 1
+            return True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not urlparse(self.path).path.endswith(":batchEmbedContents"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(self.server.latency * (0.5 + random.random()))
+
+        if not self.server.admit():
+            payload = json.dumps({"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED",
+                "message": "Resource has been exhausted. Please retry in 1s.",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "1s"}],
+            }}).encode()
+            self.send_response(429)
+        else:
+            texts = [r["content"]["parts"][0]["text"] for r in body["requests"]]
+            with self.server.lock:
+                self.server.texts_served += len(texts)
+            payload = json.dumps({"embeddings": [{"values": stub_vector(t)} for t in texts]}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def selftest():
+    import os
+    import tempfile
+    from gemini_embed_ingest import embed_texts, embed_batch, RetryableError
+
+    texts = [f"Visa requirement sentence number {i}." for i in range(950)]
+    store = os.path.join(tempfile.mkdtemp(), "selftest")
+
+    # Run 1: the "quota" runs out after 5 successful batches
+    server = StubServer(port=0, latency=0.05, rpm=1000, error_rate=0.1, quota=5)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+    # The delay is only in the 429 body; the client must still pick it up
+    server.quota = 0
+    try:
+        embed_batch(["probe"], api_base=base)
+        raise AssertionError("stub did not throttle")
+    except RetryableError as e:
+        assert e.retry_after == 1.0, f"retry delay from the 429 body: {e.retry_after}"
+    server.quota = 5
+    print("429 body RetryInfo.retryDelay read: 1.0s")
+
+    try:
+        embed_texts(texts, store, api_base=base, max_retries=2, requests_per_minute=600)
+    except RuntimeError as e:
+        print(f"Run 1 stopped as expected: {e}")
+    first = server.texts_served
+    server.quota = None
+
+    # Run 2: resumes and only requests the rows that are missing
+    vectors = embed_texts(texts, store, api_base=base, requests_per_minute=600)
+    resent = server.texts_served - first
+    expected = np.array([stub_vector(t) for t in texts], dtype="float32")
+    server.shutdown()
+
+    print(f"Run 1 stored {first} rows, run 2 sent {resent} (total {len(texts)}), 429s: {server.throttled}")
+    assert first + resent == len(texts), "resumed run re-sent rows that were already stored"
+    assert np.allclose(vectors, expected), "stored rows do not match their texts"
+    print("✅ selftest passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--selftest", action="store_true")
+    args = parser.parse_args()
+
+    if args.selftest:
+        selftest()
+    else:
+        server = StubServer(args.port, args.latency, args.rpm, args.error_rate)
+        print(f"Stub Gemini embeddings on http://127.0.0.1:{args.port}/v1beta")
+        server.serve_forever()
@@ -0,0 +1,243 @@
+"""
+Batched, rate-limited, resumable Gemini embedding ingestion.
+
+    vectors = embed_texts(chunks, store="embeddings_output/canada", model="models/text-embedding-004")
+
+- texts are grouped into batchEmbedContents calls (up to BATCH_SIZE texts each)
+- at most `concurrency` requests are in flight, and all of them draw from one token bucket
+  (requests per minute) so the project quota is never exceeded on purpose
+- 429 / 5xx / timeouts are retried with exponential backoff; a server-requested delay
+  (Retry-After header, or RetryInfo.retryDelay / "retry in Ns" in the error body) is honoured
+- every finished batch is written straight into a binary vector store
+  (<store>.f32 rows + <store>.done mask + <store>.json meta), so a rerun after a crash
+  or a hard quota stop only sends the rows that are still missing
+
+Set GEMINI_API_BASE to point at a local stub (see embedding_stub_server.py) for testing.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+DEFAULT_MODEL = "models/text-embedding-004"
+BATCH_SIZE = 100          # batchEmbedContents limit
+REQUESTS_PER_MINUTE = 150
+CONCURRENCY = 4
+MAX_RETRIES = 6
+
+# "Please retry in 27.6s." in the error message (same pattern as rag/rate_limiter.py)
+_RETRY_IN = re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE)
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ------------------------
+# Token bucket
+# ------------------------
+class TokenBucket:
+    """`rate` tokens per second, bursts of up to `capacity`. acquire() blocks until a token is free."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ------------------------
+# Gemini REST client
+# ------------------------
+def retry_after_from(error):
+    """
+    Server-requested delay in seconds for an HTTPError: the Retry-After header, else the
+    body's RetryInfo detail ({"retryDelay": "27s"}) or a "retry in 27.6s" message; None if absent.
+    """
+    header = error.headers.get("Retry-After") if error.headers else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass  # HTTP-date form; fall through to the body
+    try:
+        body = error.read().decode("utf-8", "replace")
+    except OSError:
+        return None
+    try:
+        for detail in json.loads(body).get("error", {}).get("details", []):
+            if str(detail.get("@type", "")).endswith("RetryInfo") and "retryDelay" in detail:
+                return float(str(detail["retryDelay"]).rstrip("s"))
+    except (ValueError, AttributeError):
+        pass
+    match = _RETRY_IN.search(body)
+    return float(match.group(1)) if match else None
+
+
+def embed_batch(texts, model=DEFAULT_MODEL, api_key=None, api_base=API_BASE, timeout=60):
+    """One batchEmbedContents call → list of vectors (raises RetryableError on 429/5xx/network)."""
+    api_key = api_key or os.getenv("GEMINI_API_KEY", "")
+    body = json.dumps({
+        "requests": [{"model": model, "content": {"parts": [{"text": t}]}} for t in texts]
+    }).encode("utf-8")
+    req = urllib.request.Request(
+        f"{api_base}/{model}:batchEmbedContents?key={api_key}",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        if e.code == 429 or e.code >= 500:
+            raise RetryableError(f"HTTP {e.code}", retry_after_from(e))
+        raise RuntimeError(f"Gemini embedding request failed: HTTP {e.code} {e.read()[:300]!r}")
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        raise RetryableError(str(e))
+
+    return [item["values"] for item in data["embeddings"]]
+
+
+# ------------------------
+# Resumable vector store
+# ------------------------
+class VectorStore:
+    """
+    <path>.f32   float32 rows, row i = texts[i]
+    <path>.done  one byte per row, 1 once the row is written
+    <path>.json  model, dim, rows and a fingerprint of the inputs
+    A store whose fingerprint does not match the current texts/model is started over.
+    """
+
+    def __init__(self, path, texts, model):
+        self.path = path
+        self.n = len(texts)
+        self.model = model
+        digest = hashlib.sha256(model.encode("utf-8"))
+        for t in texts:
+            digest.update(hashlib.sha256(t.encode("utf-8")).digest())
+        self.fingerprint = digest.hexdigest()
+        self.dim = None
+        self.done = np.zeros(self.n, dtype="uint8")
+        self.lock = threading.Lock()
+
+        meta_path = f"{path}.json"
+        if os.path.exists(meta_path) and os.path.exists(f"{path}.done"):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") == self.fingerprint and meta.get("rows") == self.n:
+                self.dim = meta["dim"]
+                self.done = np.fromfile(f"{path}.done", dtype="uint8")[:self.n].copy()
+
+    def pending(self):
+        return [int(i) for i in np.flatnonzero(self.done == 0)]
+
+    def write(self, rows, vectors):
+        vectors = np.asarray(vectors, dtype="float32")
+        with self.lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(f"{self.path}.f32", "wb") as f:
+                    f.truncate(self.n * self.dim * 4)
+                with open(f"{self.path}.json", "w") as f:
+                    json.dump({"model": self.model, "dim": self.dim, "rows": self.n,
+                               "fingerprint": self.fingerprint}, f, indent=2)
+
+            with open(f"{self.path}.f32", "r+b") as f:
+                for row, vec in zip(rows, vectors):
+                    f.seek(row * self.dim * 4)
+                    f.write(vec.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Mark done only after the vectors are on disk; replace the mask atomically
+            self.done[rows] = 1
+            tmp = f"{self.path}.done.tmp"
+            self.done.tofile(tmp)
+            os.replace(tmp, f"{self.path}.done")
+
+    def load(self):
+        return np.fromfile(f"{self.path}.f32", dtype="float32").reshape(self.n, self.dim)
+
+
+# ------------------------
+# Ingestion engine
+# ------------------------
+def _embed_with_retry(texts, model, bucket, max_retries, api_base):
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            return embed_batch(texts, model=model, api_base=api_base)
+        except RetryableError as e:
+            if attempt == max_retries:
+                raise
+            delay = e.retry_after if e.retry_after is not None else min(60.0, 2 ** attempt)
+            delay *= 1 + random.random() * 0.25  # jitter so workers do not retry in lockstep
+            print(f"  ⏳ {e} — retrying batch in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+def embed_texts(texts, store, model=DEFAULT_MODEL, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                requests_per_minute=REQUESTS_PER_MINUTE, max_retries=MAX_RETRIES, api_base=None):
+    """
+    Embed `texts` into the vector store at `store` and return a (len(texts), dim) float32 array.
+    Rows already present from an earlier run are not requested again.
+    """
+    texts = list(texts)
+    api_base = api_base or API_BASE
+    vs = VectorStore(store, texts, model)
+    pending = vs.pending()
+    print(f"🔢 {len(texts)} texts, {len(texts) - len(pending)} already stored, {len(pending)} to embed")
+
+    bucket = TokenBucket(requests_per_minute / 60.0, capacity=concurrency)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(_embed_with_retry, [texts[i] for i in rows], model, bucket, max_retries, api_base): rows
+            for rows in batches
+        }
+        failed = 0
+        for done_count, fut in enumerate(as_completed(futures), 1):
+            rows = futures[fut]
+            try:
+                vs.write(rows, fut.result())
+            except Exception as e:
+                # Keep storing the other batches; the failed rows stay pending for the next run
+                failed += 1
+                print(f"  ❌ batch {done_count}/{len(batches)} failed: {e}")
+                continue
+            print(f"  ✅ batch {done_count}/{len(batches)} ({len(rows)} texts) stored")
+
+    if failed:
+        raise RuntimeError(f"{failed} batch(es) failed; rerun to resume from {store}")
+    if vs.dim is None:
+        return np.zeros((0, 0), dtype="float32")
+    return vs.load()
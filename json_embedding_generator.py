@@ -1,7 +1,8 @@
 import os
 import json
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from gemini_embed_ingest import embed_texts
 
 load_dotenv()
 
@@ -9,8 +10,6 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 if not API_KEY:
     raise RuntimeError("GEMINI_API_KEY missing in .env")
 
-genai.configure(api_key=API_KEY)
-
 CHUNKS_DIR = "chunks"
 OUT_DIR = "embeddings_output"
 os.makedirs(OUT_DIR, exist_ok=True)
@@ -22,22 +21,16 @@ for pdf_folder in os.listdir(CHUNKS_DIR):
     if not os.path.isdir(pdf_path):
         continue
 
-    embeddings = []
-
-    for file in os.listdir(pdf_path):
-        if file.endswith(".txt"):
-            text = open(os.path.join(pdf_path, file)).read()
+    files = sorted(f for f in os.listdir(pdf_path) if f.endswith(".txt"))
+    texts = [open(os.path.join(pdf_path, file)).read() for file in files]
 
-            emb = genai.embed_content(
-                model=model,
-                content=text
-            )["embedding"]
+    # One batched, resumable ingestion per folder (checkpoint next to the JSON output)
+    vectors = embed_texts(texts, store=os.path.join(OUT_DIR, f"{pdf_folder}_store"), model=model)
 
-            embeddings.append({
-                "chunk": file,
-                "text": text,
-                "embedding": emb
-            })
+    embeddings = [
+        {"chunk": file, "text": text, "embedding": emb.tolist()}
+        for file, text, emb in zip(files, texts, vectors)
+    ]
 
     out_file = os.path.join(OUT_DIR, f"{pdf_folder}.json")
     with open(out_file, "w") as f:
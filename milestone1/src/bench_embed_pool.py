@@ -0,0 +1,44 @@
+# src/bench_embed_pool.py
+#
+# Throughput scaling of the multi-process encoder over models/chunks.pkl
+# for 1/2/4/8 workers (threads = cpu_count // workers), against the
+# single-process model.encode baseline used by embed.py.
+# Run from milestone1/: python src/bench_embed_pool.py
+
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from embed import load_chunks, MODEL_NAME
+from embed_pool import WORKER_CHOICES, measure_throughput
+
+
+def main() -> None:
+    texts = [ch["text"] for ch in load_chunks()]
+    cpus = os.cpu_count() or 1
+    print(f"Corpus: {len(texts)} chunks | host: {cpus} CPU(s)\n")
+
+    model = SentenceTransformer(MODEL_NAME)
+    model.encode(texts[:32], batch_size=32)
+    t0 = time.perf_counter()
+    reference = model.encode(texts, batch_size=32, convert_to_numpy=True)
+    base_rate = len(texts) / (time.perf_counter() - t0)
+
+    print(f"{'layout':<22}{'texts/s':>10}{'speed-up':>10}")
+    print(f"{'single process':<22}{base_rate:>10.1f}{1.0:>10.2f}")
+    for workers in WORKER_CHOICES:
+        threads = max(1, cpus // workers)
+        rate = measure_throughput(texts, MODEL_NAME, workers, threads)
+        print(f"{f'{workers} worker(s) × {threads} thr':<22}{rate:>10.1f}{rate / base_rate:>10.2f}")
+
+    # Ordered reassembly check: pooled output must line up with the single-process result
+    from embed_pool import EncodePool
+    with EncodePool(MODEL_NAME, 2, max(1, cpus // 2)) as pool:
+        pooled = pool.encode(texts[:256])
+    print(f"\nmax |pooled - single| over first 256 rows: {np.abs(pooled - reference[:256]).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
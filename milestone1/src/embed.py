@@ -1,12 +1,15 @@
 # src/embed.py
 
+import os
 import pickle
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Union
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from embed_pool import EncodePool, auto_tune
+
 CHUNKS_PATH = Path("models/chunks.pkl")
 EMBEDDINGS_PATH = Path("models/embeddings.pkl")
 
@@ -26,14 +29,29 @@ def load_chunks(chunks_path: Path = CHUNKS_PATH) -> List[Dict]:
 def compute_embeddings(
     chunks: List[Dict],
     model_name: str = MODEL_NAME,
+    workers: Union[int, str] = 1,
+    threads: int = None,
 ) -> np.ndarray:
     """
     Returns a numpy array of shape (num_chunks, embedding_dim)
+
+    workers > 1 encodes in that many processes (see embed_pool.py), each using
+    `threads` torch threads (default: cpu_count // workers). workers="auto" lets
+    the auto-tuner pick both for this host.
     """
+    texts = [ch["text"] for ch in chunks]
+
+    if workers == "auto":
+        workers, threads = auto_tune(texts, model_name)
+    if workers > 1:
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        print(f"🧠 Encoding {len(texts)} chunks with {workers} worker(s) × {threads} thread(s)")
+        with EncodePool(model_name, workers, threads) as pool:
+            return pool.encode(texts, batch_size=32)
+
     print(f"🧠 Loading embedding model: {model_name}")
     model = SentenceTransformer(model_name)
 
-    texts = [ch["text"] for ch in chunks]
     print(f"🔢 Computing embeddings for {len(texts)} chunks...")
 
     embeddings = model.encode(
@@ -50,9 +68,10 @@ def compute_embeddings(
 def build_embeddings(
     chunks_path: Path = CHUNKS_PATH,
     embeddings_path: Path = EMBEDDINGS_PATH,
+    workers: Union[int, str] = 1,
 ) -> None:
     chunks = load_chunks(chunks_path)
-    embeddings = compute_embeddings(chunks)
+    embeddings = compute_embeddings(chunks, workers=workers)
 
     embeddings_path.parent.mkdir(parents=True, exist_ok=True)
     with embeddings_path.open("wb") as f:
@@ -64,4 +83,8 @@ def build_embeddings(
 
 
 if __name__ == "__main__":
-    build_embeddings()
+    import sys
+
+    # python src/embed.py [workers|auto]
+    arg = sys.argv[1] if len(sys.argv) > 1 else "1"
+    build_embeddings(workers=arg if arg == "auto" else int(arg))
@@ -0,0 +1,161 @@
+# src/embed_pool.py
+#
+# Multi-process encoding for large ingestion runs: one SentenceTransformer replica per
+# worker process, each pinned to a fixed number of torch threads. Input is split into
+# contiguous shards and every shard's vectors are written back at its offset in one
+# preallocated output matrix, so the result keeps the input order.
+
+import json
+import os
+import time
+import multiprocessing as mp
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TUNING_PATH = Path("models/embed_pool_tuning.json")
+WORKER_CHOICES = (1, 2, 4, 8)
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Set in each worker by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    # The thread env vars are already set (see EncodePool.__init__): a spawned worker
+    # re-imports the parent's main module, and with it torch, before this runs
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+
+    global _worker_model
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_shard(job: Tuple[int, List[str], int]) -> Tuple[int, np.ndarray]:
+    start, texts, batch_size = job
+    emb = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=False,
+    )
+    return start, emb.astype("float32")
+
+
+class EncodePool:
+    """
+    `workers` processes × `threads` torch threads each. Use as a context manager so the
+    replicas are loaded once and reused across encode() calls.
+    """
+
+    def __init__(self, model_name: str, workers: int, threads: int):
+        self.model_name = model_name
+        self.workers = workers
+        self.threads = threads
+        # spawn: fork would inherit the parent's torch thread pool. Workers copy the
+        # environment when they start, before importing anything, so the OpenMP/BLAS
+        # thread counts are set in the parent around pool creation
+        ctx = mp.get_context("spawn")
+        saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+        os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+        try:
+            self._pool = ctx.Pool(workers, initializer=_init_worker, initargs=(model_name, threads))
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        shard_size: Optional[int] = None,
+    ) -> np.ndarray:
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, 0), dtype="float32")
+
+        # ~4 shards per worker keeps every process busy without tiny tail shards
+        shard_size = shard_size or max(batch_size, -(-n // (self.workers * 4)))
+        jobs = [(s, texts[s:s + shard_size], batch_size) for s in range(0, n, shard_size)]
+
+        out = None
+        for start, emb in self._pool.imap_unordered(_encode_shard, jobs):
+            if out is None:
+                out = np.empty((n, emb.shape[1]), dtype="float32")
+            out[start:start + len(emb)] = emb
+        return out
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> "EncodePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ---------------------------------------------------------
+# AUTO-TUNING
+# ---------------------------------------------------------
+def candidate_layouts(cpus: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(workers, threads) pairs that use every core once: threads = cpus // workers."""
+    cpus = cpus or os.cpu_count() or 1
+    return [(w, max(1, cpus // w)) for w in WORKER_CHOICES if w <= cpus]
+
+
+def measure_throughput(
+    texts: List[str], model_name: str, workers: int, threads: int, batch_size: int = 32
+) -> float:
+    """Texts/second for one layout, after model loading and a warm-up pass."""
+    with EncodePool(model_name, workers, threads) as pool:
+        pool.encode(texts[: workers * batch_size], batch_size=batch_size)
+        t0 = time.perf_counter()
+        pool.encode(texts, batch_size=batch_size)
+        return len(texts) / (time.perf_counter() - t0)
+
+
+def auto_tune(
+    texts: List[str],
+    model_name: str,
+    sample_size: int = 512,
+    tuning_path: Path = TUNING_PATH,
+) -> Tuple[int, int]:
+    """
+    Picks (workers, threads) for this host by timing each candidate layout on a sample.
+    The choice is remembered per (model, cpu count) in `tuning_path`.
+    """
+    cpus = os.cpu_count() or 1
+    key = f"{model_name}|{cpus}"
+
+    saved = {}
+    if tuning_path.exists():
+        saved = json.loads(tuning_path.read_text(encoding="utf-8"))
+        if key in saved:
+            return tuple(saved[key])
+
+    sample = texts[:sample_size]
+    best, best_rate = (1, cpus), 0.0
+    for workers, threads in candidate_layouts(cpus):
+        rate = measure_throughput(sample, model_name, workers, threads)
+        print(f"⏱️  {workers} worker(s) × {threads} thread(s): {rate:.1f} texts/s")
+        if rate > best_rate:
+            best, best_rate = (workers, threads), rate
+
+    saved[key] = list(best)
+    tuning_path.parent.mkdir(parents=True, exist_ok=True)
+    tuning_path.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+    return best
@@ -1,12 +1,18 @@
 # src/rag_pipeline.py
 
+import copy
+import hashlib
 import json
 import os
 import sys
 import pickle
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 
 import faiss
 import numpy as np
@@ -24,6 +30,9 @@ USER_PROFILE_PATH = Path("user_profile.json")
 # Embedding model
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
 
+# What the strict prompt must answer when the policy chunks do not cover the question
+NO_DATA_ANSWER = "No data found in the provided visa policy."
+
 # Load .env
 # Load .env
 # Search for .env in current directory and parent directories
@@ -217,6 +226,12 @@ FINAL ANSWER:
     return prompt.strip()
 
 
+@lru_cache(maxsize=8)
+def _gemini_model(model_name: str) -> "genai.GenerativeModel":
+    """Model handles are reused across questions instead of rebuilt per call."""
+    return genai.GenerativeModel(model_name)
+
+
 def call_gemini(
     prompt: str,
     model_name: str = "gemini-2.5-flash",
@@ -226,15 +241,74 @@ def call_gemini(
             "GEMINI_API_KEY is not set. Please add it to your .env file."
         )
 
-    model = genai.GenerativeModel(model_name)
+    model = _gemini_model(model_name)
     response = model.generate_content(prompt)
     # response.text usually gives the concatenated text
     return response.text
 
 
+def stream_gemini(
+    prompt: str,
+    model_name: str = "gemini-2.5-flash",
+) -> Iterator[str]:
+    """call_gemini, yielding the answer in pieces as Gemini generates it."""
+    if not GEMINI_API_KEY:
+        raise RuntimeError(
+            "GEMINI_API_KEY is not set. Please add it to your .env file."
+        )
+
+    model = _gemini_model(model_name)
+    for chunk in model.generate_content(prompt, stream=True):
+        if chunk.text:
+            yield chunk.text
+
+
 # ----- Answer + Logging -----
 
 
+# Concurrent identical questions (same normalized text, profile and options) share one run:
+# the first caller does the work, the others wait for it and get a copy of its result. Streaming
+# (stream_answer) and non-streaming callers share the same runs.
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+_coalescing_stats = {"executions": 0, "coalesced": 0}
+
+
+class _Abandoned(Exception):
+    """Set on a shared run whose streaming reader stopped early: its followers retry."""
+
+
+def _question_key(question: str, user_profile: Dict, top_k: int, save_result: bool) -> str:
+    profile_hash = hashlib.sha256(
+        json.dumps(user_profile, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return json.dumps([" ".join(question.split()).lower(), profile_hash, top_k, save_result])
+
+
+def _join_flight(key: str) -> Tuple[Future, bool]:
+    """(shared future, is_leader) for `key`, registering a new run if none is in flight."""
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+            _coalescing_stats["executions"] += 1
+        else:
+            _coalescing_stats["coalesced"] += 1
+    return future, leader
+
+
+def _leave_flight(key: str) -> None:
+    with _in_flight_lock:
+        del _in_flight[key]
+
+
+def get_coalescing_stats() -> Dict:
+    """How many answer_question calls ran and how many joined an identical one in flight."""
+    with _in_flight_lock:
+        return dict(_coalescing_stats, in_flight=len(_in_flight))
+
+
 def answer_question(
     question: str,
     user_profile: Optional[Dict] = None,
@@ -243,10 +317,35 @@ def answer_question(
 ) -> Dict:
     """
     Full RAG pipeline: retrieve → prompt → Gemini → build result dict.
+    Concurrent calls with the same question, profile and options share one run.
     """
     if user_profile is None:
         user_profile = load_user_profile()
 
+    key = _question_key(question, user_profile, top_k, save_result)
+    while True:
+        future, leader = _join_flight(key)
+        if leader:
+            break
+        try:
+            shared = copy.deepcopy(future.result())
+        except _Abandoned:
+            continue
+        shared["question"] = question
+        return shared
+
+    try:
+        result = _answer_question(question, user_profile, top_k, save_result)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _leave_flight(key)
+    future.set_result(result)
+    return result
+
+
+def _answer_question(question: str, user_profile: Dict, top_k: int, save_result: bool) -> Dict:
     retrieved_chunks = retrieve_relevant_chunks(question, top_k=top_k)
 
     # If no chunks were retrieved, allow Gemini to answer from general knowledge.
@@ -259,7 +358,7 @@ def answer_question(
         prompt = build_prompt(question, retrieved_chunks, user_profile, strict=True)
         answer = call_gemini(prompt)
         # If strict response indicates no data found, fallback to a permissive prompt
-        if isinstance(answer, str) and answer.strip() == "No data found in the provided visa policy.":
+        if isinstance(answer, str) and answer.strip() == NO_DATA_ANSWER:
             prompt = build_prompt(question, retrieved_chunks, user_profile, strict=False)
             answer = call_gemini(prompt)
             fallback_used = True
@@ -281,6 +380,117 @@ def answer_question(
     return result
 
 
+def stream_answer(
+    question: str,
+    user_profile: Optional[Dict] = None,
+    top_k: int = 3,
+    save_result: bool = True,
+    result: Optional[Dict] = None,
+) -> Iterator[str]:
+    """
+    answer_question, yielding the answer text as it is generated (e.g. for st.write_stream).
+    When the stream ends, `result` (if given) is filled with the dict answer_question returns,
+    plus "ttft_ms": milliseconds from the call to the first piece of answer.
+
+    The strict answer is held back only while it could still be NO_DATA_ANSWER; if it turns
+    out to be exactly that, the fallback answer is streamed instead.
+    Concurrent calls with the same question, profile and options (also answer_question calls)
+    share one run: the first streams, the others wait for it and yield its answer in one piece.
+    """
+    t0 = time.perf_counter()
+    if user_profile is None:
+        user_profile = load_user_profile()
+
+    key = _question_key(question, user_profile, top_k, save_result)
+    while True:
+        future, leader = _join_flight(key)
+        if leader:
+            break
+        try:
+            shared = copy.deepcopy(future.result())
+        except _Abandoned:
+            continue
+        shared["question"] = question
+        if shared["answer"]:
+            yield shared["answer"]
+        if result is not None:
+            result.update(shared, ttft_ms=1000 * (time.perf_counter() - t0))
+        return
+
+    answer: Dict = {}
+    try:
+        yield from _stream_answer(question, user_profile, top_k, save_result, answer, t0)
+    except GeneratorExit:
+        future.set_exception(_Abandoned())   # reader stopped early: followers run it themselves
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _leave_flight(key)
+    ttft_ms = answer.pop("ttft_ms")
+    future.set_result(answer)
+    if result is not None:
+        result.update(answer, ttft_ms=ttft_ms)
+
+
+def _stream_answer(
+    question: str,
+    user_profile: Dict,
+    top_k: int,
+    save_result: bool,
+    result: Dict,
+    t0: float,
+) -> Iterator[str]:
+    retrieved_chunks = retrieve_relevant_chunks(question, top_k=top_k)
+    pieces: List[str] = []
+    ttft_ms = None
+
+    def emit(stream):
+        nonlocal ttft_ms
+        for piece in stream:
+            if ttft_ms is None:
+                ttft_ms = 1000 * (time.perf_counter() - t0)
+            pieces.append(piece)
+            yield piece
+
+    fallback_used = True
+    if retrieved_chunks:
+        strict = stream_gemini(build_prompt(question, retrieved_chunks, user_profile, strict=True))
+        held = ""
+        for piece in strict:
+            held += piece
+            if not NO_DATA_ANSWER.startswith(held.strip()):
+                # Not the "no data" sentence: release what was held back and stream the rest
+                fallback_used = False
+                yield from emit([held])
+                yield from emit(strict)
+                break
+        else:
+            if held.strip() != NO_DATA_ANSWER:
+                fallback_used = False
+                if held:
+                    yield from emit([held])
+
+    if fallback_used:
+        yield from emit(stream_gemini(build_prompt(question, retrieved_chunks, user_profile, strict=False)))
+
+    answer = {
+        "question": question,
+        "answer": "".join(pieces),
+        "retrieved_chunks": retrieved_chunks,
+        "fallback_used": fallback_used,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "user_profile": user_profile,
+    }
+
+    if save_result:
+        save_result_to_file(answer)
+
+    if result is not None:
+        result.update(answer, ttft_ms=ttft_ms)
+
+
 def save_result_to_file(
     result: Dict,
     results_path: Path = RESULTS_PATH,
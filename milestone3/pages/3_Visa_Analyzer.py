@@ -1,12 +1,11 @@
 import streamlit as st
-import time
 import sys
 import os
 
 # Add src to path to allow imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.rag_pipeline import answer_question
+from src.rag_pipeline import stream_answer
 
 st.set_page_config(page_title="Visa Analyzer AI", layout="wide")
 
@@ -187,16 +186,8 @@ if st.button("Analyze Query ⚡"):
         # ----------------- PROGRESS INDICATORS -----------------
         status_container = st.empty()
         
-        # Step 1: Embedding
-        status_container.info("🧠 Embedding your question...")
-        time.sleep(0.8) # Simulate processing
-        
-        # Step 2: Searching
-        status_container.info(f"🔍 Searching {country_filter if country_filter != 'Global / General' else 'global'} visa documents...")
-        time.sleep(1.0) # Simulate processing
-        
-        # Step 3: Generating
-        status_container.info("✨ Generating intelligent answer...")
+        # Shown until the first words of the answer arrive
+        status_container.info(f"🔍 Searching {country_filter if country_filter != 'Global / General' else 'global'} visa documents and generating your answer...")
         
         # ----------------- REAL RAG PIPELINE -----------------
         try:
@@ -208,11 +199,23 @@ if st.button("Analyze Query ⚡"):
             if country_filter != "Global / General":
                 final_query = f"For {country_filter}: {user_question}"
 
-            # Call Backend (imported from src)
-            result = answer_question(final_query, user_profile=user_profile)
+            # Call Backend (imported from src): the answer is shown while it is generated,
+            # then replaced by the result card below
+            result = {}
+
+            def answer_tokens():
+                for i, piece in enumerate(stream_answer(final_query, user_profile=user_profile, result=result)):
+                    if i == 0:
+                        status_container.empty()
+                    yield piece
+
+            live_answer = st.empty()
+            with live_answer.container():
+                st.write_stream(answer_tokens())
             
             # success!
             status_container.empty()
+            live_answer.empty()
             
             # Display Result
             st.markdown(f"""
@@ -221,6 +224,7 @@ if st.button("Analyze Query ⚡"):
                 <p>{result['answer']}</p>
                 <div style="margin-top: 20px; font-size: 0.8rem; opacity: 0.6;">
                     Context used: {len(result['retrieved_chunks'])} document chunks
+                    · First words after {(result['ttft_ms'] or 0) / 1000:.1f}s
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -1,4 +1,5 @@
 import os
+import re
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
@@ -73,7 +74,18 @@ else:
     print(" DB saved successfully")
 
 # ================= QUERY LOOP =================
-country_list = ["canada", "us", "ireland", "schengen", "uk"]
+# Query words -> country key (matched against chunk source names), compiled once.
+# Word boundaries stop "us" firing inside "business"/"status"; the bare "US" is matched
+# case-sensitively, so the pronoun in "can you help us" is not a country.
+COUNTRY_ALIASES = {
+    "canada": "canada", "ireland": "ireland", "schengen": "schengen",
+    "uk": "uk", "united kingdom": "uk", "britain": "uk",
+    "usa": "us", "u.s.a.": "us", "u.s.": "us", "united states": "us", "america": "us",
+}
+COUNTRY_PATTERN = re.compile(
+    r"(?i:\b(" + "|".join(re.escape(a) for a in sorted(COUNTRY_ALIASES, key=len, reverse=True)) + r")(?!\w))"
+    r"|\b(US)\b"
+)
 
 while True:
     query = input("\nEnter query (or type 'exit'): ").strip()
@@ -82,11 +94,10 @@ while True:
         break
 
     # Detect country from query
+    match = COUNTRY_PATTERN.search(query)
     selected_country = None
-    for c in country_list:
-        if c in query.lower():
-            selected_country = c
-            break
+    if match:
+        selected_country = COUNTRY_ALIASES[match.group(1).lower()] if match.group(1) else "us"
 
     # Filter only relevant country chunks
     if selected_country:
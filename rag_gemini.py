@@ -1,4 +1,5 @@
 import os
+import re
 import google.generativeai as genai
 import json
 
@@ -18,6 +19,12 @@ COUNTRY_FILES = {
 
 CHUNKS_FOLDER = "chunked_output"
 
+# One compiled word-boundary pattern over all country keys (longest first),
+# so "uk"/"usa" never match inside other words
+COUNTRY_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(COUNTRY_FILES, key=len, reverse=True)) + r")\b"
+)
+
 # ---------------- LOAD CHUNKS FROM ONE FILE ----------------
 def load_country_chunks(filename):
     path = os.path.join(CHUNKS_FOLDER, filename)
@@ -67,11 +74,8 @@ def flatten_json_chunk(chunk_text):
 # ---------------- USER QUERY ----------------
 query = input("\nEnter your eligibility query: ").lower()
 
-selected_file = None
-for key in COUNTRY_FILES:
-    if key in query:
-        selected_file = COUNTRY_FILES[key]
-        break
+match = COUNTRY_PATTERN.search(query)
+selected_file = COUNTRY_FILES[match.group(1)] if match else None
 
 if not selected_file:
     raise ValueError(" Country not detected in query (use USA/Canada/UK/Ireland/Schengen)")
@@ -80,11 +80,33 @@ def load_and_process_documents():
 
 # 3. EMBEDDING
 
-def generate_embeddings(chunks, model_name=EMBED_MODEL_NAME):
+def generate_embeddings(chunks, model_name=EMBED_MODEL_NAME, workers=1):
     model = SentenceTransformer(model_name)
     print(f"[+] Embedding {len(chunks)} chunks...")
 
-    emb = model.encode(chunks, batch_size=16, show_progress_bar=True)
+    if workers > 1:
+        # One model replica per process; output order matches `chunks`. Each process gets
+        # an equal share of the cores: the spawned workers read these thread counts from
+        # the environment they inherit, before they import torch
+        threads = str(max(1, (os.cpu_count() or 1) // workers))
+        thread_vars = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+        saved = {var: os.environ.get(var) for var in thread_vars}
+        os.environ.update({var: threads for var in thread_vars})
+        try:
+            pool = model.start_multi_process_pool(["cpu"] * workers)
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+        try:
+            emb = model.encode(chunks, batch_size=16, pool=pool,
+                               chunk_size=max(16, len(chunks) // (workers * 4)))
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        emb = model.encode(chunks, batch_size=16, show_progress_bar=True)
     emb = emb / np.linalg.norm(emb, axis=1, keepdims=True)
 
     np.save(OUTPUT_EMB_TEST, emb)
@@ -126,7 +148,7 @@ if __name__ == "__main__":
     print(f"Total chunks extracted: {len(chunks)}")
 
     print("\n2. Embedding Chunks")
-    embeddings = generate_embeddings(chunks)
+    embeddings = generate_embeddings(chunks, workers=int(os.getenv("EMBED_WORKERS", "1")))
 
     print("\n3. Building FAISS Index")
     index = build_faiss_index(embeddings)
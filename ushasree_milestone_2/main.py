@@ -98,8 +98,19 @@ def retrieve_top_k(query, k=TOP_K, model_name=EMBED_MODEL_NAME):
     retrieved = [chunks[i] for i in indices[0]]
     return retrieved
 
+_client = None
+
+
+def get_client():
+    # One client (and its HTTP connection pool) for the whole session
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=API_KEY)
+    return _client
+
+
 def ask_gemini(query, retrieved_docs):
-    client = genai.Client(api_key=API_KEY)
+    client = get_client()
     context = "\n\n".join(retrieved_docs)
     final_prompt = f"""
 You are an experienced US Visa Officer with deep knowledge of: